@@ -0,0 +1,39 @@
+import json
+from rest_framework.exceptions import ValidationError
+from jobs.queue import PermanentJobError, task
+from user_accounts.models import User
+from user_accounts.serializers import AdminTenantRegistrationSerializer
+from .tenants import delete_tenant_and_vacate_shops, register_tenants as register_tenant_batch, registration_response
+
+
+@task('register_tenant', one_time_keys=('temp_password',))
+def register_tenant(payload):
+    # Validated again: the email or a shop may have been taken since the job was queued
+    serializer = AdminTenantRegistrationSerializer(data=payload)
+    if not serializer.is_valid():
+        raise PermanentJobError(f'Registration failed: {json.dumps(serializer.errors)}')
+    try:
+        return registration_response(serializer.save())
+    except ValidationError as e:
+        # A shop was taken between validation and locking it
+        raise PermanentJobError(f'Registration failed: {json.dumps(e.detail)}')
+
+
+@task('register_tenants', one_time_keys=('temp_password',))
+def register_tenants(payload):
+    report = register_tenant_batch(payload['tenants'])
+    return {'message': f"Registered {report['created']} tenants, rejected {report['rejected']}", **report}
+
+
+@task('delete_tenant')
+def delete_tenant(payload):
+    try:
+        tenant = User.objects.get(id=payload['tenant_id'], user_type='tenant', deleted_at__isnull=True)
+    except User.DoesNotExist:
+        raise PermanentJobError('Tenant not found')
+    shops_vacated, archive_job = delete_tenant_and_vacate_shops(tenant)
+    return {
+        'message': 'Tenant deleted successfully',
+        'shops_vacated': shops_vacated,
+        'archive_job_id': archive_job.id
+    }
@@ -0,0 +1,205 @@
+"""
+Tenant registration and deletion, shared by the admin views and the
+background jobs that run them when a client asks for async processing.
+
+Deleting a tenant is a soft delete; their payments move to the archive in
+the background (see shops.archive).
+
+Batch onboarding checks every entry's fields first, then its emails,
+usernames and shop numbers against the batch and the database with one
+__in query each, so the number of queries does not grow with the batch.
+Temporary passwords are hashed in parallel before any shop is locked; the
+target shops are then locked once, re-checked, and the valid tenants are
+written with one bulk_create and their shops with one bulk_update. Entries
+that fail are reported per tenant and do not stop the others.
+"""
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from jobs.queue import enqueue
+from shops.aging import invalidate_aging_report
+from shops.cache import invalidate_available_shops
+from shops.models import Shop
+from user_accounts.models import User
+from user_accounts.serializers import TenantDetailsSerializer, assign_shops, shop_assignment_error
+
+
+def registration_response(result):
+    """Response body for a tenant created by AdminTenantRegistrationSerializer.save()"""
+    user = result['user']
+    return {
+        'message': 'Tenant registered successfully',
+        'tenant': {
+            'id': user.id,
+            'email': user.email,
+            'full_name': user.full_name,
+            'username': user.username,
+            'phone_number': user.phone_number
+        },
+        'assigned_shops': [
+            {
+                'shop_number': shop.shop_number,
+                'monthly_rent': float(shop.monthly_rent),
+                'shop_type': shop.shop_type,
+                'floor_number': shop.floor_number
+            }
+            for shop in result['assigned_shops']
+        ],
+        'temp_password': result['temp_password'],  # Admin should communicate this to tenant
+        'note': 'Tenant should change password on first login'
+    }
+
+
+def released_identifier(user_id, value, max_length):
+    """A removed user's email or username, renamed so it can be registered again"""
+    return f'deleted-{user_id}-{value}'[:max_length]
+
+
+def delete_tenant_and_vacate_shops(tenant):
+    """
+    Remove a tenant: vacate their shops with one UPDATE, soft-delete the
+    account (renaming its email and username so both can be reused) and
+    queue their payments for archiving in batches. Returns the vacated shop
+    numbers and the archive job.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tenant_shops = Shop.objects.filter(tenant=tenant)
+        shop_numbers = list(tenant_shops.order_by('shop_number').values_list('shop_number', flat=True))
+        tenant_shops.update(tenant=None, is_occupied=False, updated_at=now)
+        
+        tenant.is_active = False
+        tenant.deleted_at = now
+        # Free the email and username for a new account; the id keeps the
+        # renamed values unique
+        tenant.email = released_identifier(tenant.id, tenant.email, User._meta.get_field('email').max_length)
+        tenant.username = released_identifier(tenant.id, tenant.username, User._meta.get_field('username').max_length)
+        tenant.save(update_fields=['is_active', 'deleted_at', 'email', 'username', 'updated_at'])
+        Token.objects.filter(user=tenant).delete()
+        
+        job = enqueue('archive_tenant_payments', {'tenant_id': tenant.id})
+    
+    # update() sends no signals: drop the caches the shop signals would
+    invalidate_aging_report()
+    invalidate_available_shops()
+    transaction.on_commit(invalidate_available_shops)
+    return shop_numbers, job
+
+
+def _hash_passwords(passwords):
+    # hashlib releases the GIL, so threads hash in parallel
+    workers = settings.PASSWORD_HASHING_WORKERS or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-hashing') as pool:
+        return list(pool.map(make_password, passwords))
+
+
+def register_tenants(entries):
+    """
+    Register a batch of tenants. Returns per-entry results in input order
+    plus created/rejected counts; each rejected entry carries its errors
+    keyed by field like the single registration endpoint.
+    """
+    results = [None] * len(entries)
+    valid = {}
+    for index, entry in enumerate(entries):
+        serializer = TenantDetailsSerializer(data=entry)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            results[index] = {'index': index, 'status': 'rejected', 'errors': serializer.errors}
+
+    def reject(index, field, message):
+        valid.pop(index, None)
+        results[index] = {'index': index, 'status': 'rejected', 'errors': {field: [message]}}
+
+    # Emails, usernames and shops claimed by an earlier entry of the batch
+    seen = {'email': set(), 'username': set(), 'shop_numbers': set()}
+    for index, data in list(valid.items()):
+        for field in ('email', 'username'):
+            if data[field] in seen[field]:
+                reject(index, field, f'Another tenant in this batch has this {field}')
+                break
+        else:
+            claimed = next((number for number in data['shop_numbers'] if number in seen['shop_numbers']), None)
+            if claimed:
+                reject(index, 'shop_numbers', f'Shop {claimed} is assigned to another tenant in this batch')
+                continue
+            seen['email'].add(data['email'])
+            seen['username'].add(data['username'])
+            seen['shop_numbers'].update(data['shop_numbers'])
+
+    taken = User.objects.filter(
+        Q(email__in=seen['email']) | Q(username__in=seen['username'])
+    ).values_list('email', 'username')
+    taken_emails, taken_usernames = set(), set()
+    for email, username in taken:
+        taken_emails.add(email)
+        taken_usernames.add(username)
+    for index, data in list(valid.items()):
+        if data['email'] in taken_emails:
+            reject(index, 'email', 'A user with this email already exists')
+        elif data['username'] in taken_usernames:
+            reject(index, 'username', 'A user with this username already exists')
+
+    temp_passwords = {index: secrets.token_urlsafe(16) for index in valid}
+    hashes = dict(zip(temp_passwords, _hash_passwords(temp_passwords.values())))
+
+    with transaction.atomic():
+        # Lock every target shop once, in id order like the statement import
+        shops = Shop.objects.select_for_update(of=('self',)).filter(
+            shop_number__in=seen['shop_numbers']
+        ).select_related('tenant').order_by('id')
+        shops_by_number = {shop.shop_number: shop for shop in shops}
+        for index, data in list(valid.items()):
+            error = shop_assignment_error(data['shop_numbers'], shops_by_number)
+            if error:
+                reject(index, 'shop_numbers', error)
+
+        users = []
+        for index, data in valid.items():
+            user = User(
+                email=data['email'],
+                username=data['username'],
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                phone_number=data.get('phone_number', ''),
+                user_type='tenant',
+                is_active=True,
+                password=hashes[index],
+                has_temporary_password=True
+            )
+            if data.get('join_date'):
+                user.date_joined = timezone.make_aware(datetime.combine(data['join_date'], datetime.min.time()))
+            users.append(user)
+        User.objects.bulk_create(users)
+
+        assignments = []
+        for (index, data), user in zip(valid.items(), users):
+            shops = [shops_by_number[number] for number in data['shop_numbers']]
+            assignments.append((user, shops))
+            details = registration_response({
+                'user': user, 'assigned_shops': shops, 'temp_password': temp_passwords[index]
+            })
+            results[index] = {
+                'index': index,
+                'status': 'created',
+                'tenant': details['tenant'],
+                'assigned_shops': details['assigned_shops'],
+                'temp_password': details['temp_password']
+            }
+        if assignments:
+            assign_shops(assignments)
+
+    created = sum(1 for result in results if result['status'] == 'created')
+    return {
+        'created': created,
+        'rejected': len(results) - created,
+        'results': results
+    }
@@ -1,3 +1,1010 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import re
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from backend.request_metrics import request_metrics
+from user_accounts.models import User
+from shops.models import Shop, Payment, PaymentArchive, MonthlyRevenue, DailyRevenue
+from jobs.models import Job
+from jobs.queue import run_pending
+from shops.aging import get_aging_report
+from shops.forecast import build_forecast
+from shops.management.commands.seed_mall import seed_email
 
-# Create your tests here.
+
+class EnhancedAnalyticsTests(TestCase):
+    """Test suite for the enhanced analytics endpoint"""
+
+    def setUp(self):
+        """Set up test client and a couple of tenants with shops"""
+        self.client = APIClient()
+        self.url = '/api/admin/enhanced-analytics/'
+        self.shop_counter = 0
+
+    def create_tenant(self, index, shop_count=2, paid=Decimal('0')):
+        """Create a tenant with occupied shops and an optional payment"""
+        tenant = User.objects.create(
+            email=f'tenant{index}@example.com',
+            username=f'tenant{index}',
+            first_name='Tenant',
+            last_name=str(index),
+            user_type='tenant'
+        )
+        for _ in range(shop_count):
+            self.shop_counter += 1
+            shop = Shop.objects.create(
+                shop_number=f'S{self.shop_counter:04d}',
+                tenant=tenant,
+                monthly_rent=Decimal('500000.00'),
+                balance=Decimal('500000.00'),
+                is_occupied=True
+            )
+        if paid:
+            payment = Payment.objects.create(
+                shop=shop,
+                tenant=tenant,
+                amount=paid,
+                payment_method='cash',
+                payment_month=timezone.localdate().strftime('%Y-%m'),
+                status='completed'
+            )
+            MonthlyRevenue.record_payment(payment)
+        return tenant
+
+    def test_tenant_breakdown_totals(self):
+        """Test that per-tenant totals match the tenant's occupied shops"""
+        tenant = self.create_tenant(1, shop_count=2, paid=Decimal('200000.00'))
+        # A vacant shop must not count towards the tenant or the summary
+        Shop.objects.create(shop_number='V0001', monthly_rent=Decimal('100.00'))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        summary = response.data['summary']
+        self.assertEqual(summary['total_expected_monthly'], 1000000.0)
+        self.assertEqual(summary['total_collected_this_month'], 200000.0)
+        self.assertEqual(summary['total_occupied_shops'], 2)
+        self.assertEqual(summary['total_tenants'], 1)
+
+        row = response.data['tenant_breakdown'][0]
+        self.assertEqual(row['tenant_id'], tenant.id)
+        self.assertEqual(row['total_monthly_rent'], 1000000.0)
+        self.assertEqual(row['total_balance'], 1000000.0)
+        self.assertEqual(row['paid_this_month'], 200000.0)
+        self.assertEqual(row['shop_count'], 2)
+        self.assertEqual([s['shop_number'] for s in row['shops']], ['S0001', 'S0002'])
+
+    def test_tenant_without_shops(self):
+        """Test that a tenant with no shops reports zero totals"""
+        self.create_tenant(1, shop_count=0)
+
+        response = self.client.get(self.url)
+        row = response.data['tenant_breakdown'][0]
+        self.assertEqual(row['total_monthly_rent'], 0.0)
+        self.assertEqual(row['shop_count'], 0)
+        self.assertEqual(row['shops'], [])
+
+    def test_query_count_is_constant(self):
+        """Test that the number of queries does not depend on the tenant count"""
+        self.create_tenant(1, paid=Decimal('1000.00'))
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+
+        for index in range(2, 12):
+            self.create_tenant(index, paid=Decimal('1000.00'))
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['tenant_breakdown']), 11)
+
+
+class ExportPaymentsTests(TestCase):
+    """Test suite for the streaming payment ledger export"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create(
+            email='admin@example.com', username='admin', user_type='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.url = '/api/admin/payments/export/'
+        self.tenant = User.objects.create(
+            email='tenant@example.com', username='tenant', first_name='Tenant', last_name='One'
+        )
+        self.shop = Shop.objects.create(
+            shop_number='A001', tenant=self.tenant, monthly_rent=Decimal('500000.00'), is_occupied=True
+        )
+        for amount, method in [('1000.50', 'cash'), ('2000.00', 'mobile_money'), ('3000.00', 'cash')]:
+            Payment.objects.create(
+                shop=self.shop, tenant=self.tenant, amount=Decimal(amount),
+                payment_method=method, payment_month='2025-01'
+            )
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        """Test that the CSV export streams a header and one row per payment"""
+        rows = list(csv.DictReader(self.read(self.client.get(self.url)).splitlines()))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['shop_number'], 'A001')
+        self.assertEqual(rows[0]['amount'], '1000.50')
+
+    def test_ndjson_export_with_filters(self):
+        """Test that NDJSON output honours the method and date filters"""
+        today = timezone.localdate().isoformat()
+        content = self.read(self.client.get(self.url, {
+            'output': 'ndjson', 'method': 'cash', 'from': today, 'to': today
+        }))
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([r['amount'] for r in records], ['1000.50', '3000.00'])
+
+    def test_invalid_filters(self):
+        """Test that bad formats and filters are rejected"""
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'from': '2025-13-45'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'method': 'cheque'}).status_code, 400)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(user=self.tenant)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class ImportPaymentsTests(TestCase):
+    """Test suite for the bulk payment import endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create(
+            email='admin@example.com', username='admin', user_type='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.url = '/api/admin/payments/import/'
+        tenant = User.objects.create(
+            email='tenant@example.com', username='tenant', first_name='Tenant', last_name='One'
+        )
+        Shop.objects.create(
+            shop_number='A001', tenant=tenant, monthly_rent=Decimal('500000.00'),
+            balance=Decimal('500000.00'), is_occupied=True
+        )
+
+    def test_csv_upload(self):
+        """Test importing an uploaded CSV statement"""
+        statement = SimpleUploadedFile(
+            'statement.csv',
+            b'shop_number,amount,payment_method,reference\n'
+            b'A001,200000,mobile_money,MM123\n'
+            b'B999,100,cash,\n'
+        )
+        response = self.client.post(self.url, {'file': statement}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['rejected'], 1)
+        self.assertEqual(response.data['results'][0]['balance_after'], 300000.0)
+
+    def test_json_body(self):
+        """Test importing a JSON batch"""
+        response = self.client.post(self.url, {'payments': [
+            {'shop_number': 'A001', 'amount': 1000, 'payment_method': 'cash'}
+        ]}, format='json')
+        self.assertEqual(response.data['created'], 1)
+
+    def test_unreadable_statement(self):
+        response = self.client.post(self.url, {'payments': 'nope'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_admin(self):
+        tenant = User.objects.get(email='tenant@example.com')
+        self.client.force_authenticate(user=tenant)
+        response = self.client.post(self.url, {'payments': []}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class TenantListTests(TestCase):
+    """Test suite for the paginated tenant list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/admin/tenants/'
+        names = ['Alice', 'Bob', 'Carol', 'Dan', 'Eve']
+        for index, name in enumerate(names):
+            tenant = User.objects.create(
+                email=f'{name.lower()}@example.com', username=name.lower(),
+                first_name=name, last_name='Tenant', user_type='tenant'
+            )
+            for shop_index in range(index):
+                Shop.objects.create(
+                    shop_number=f'{name[0]}{shop_index:03d}', tenant=tenant,
+                    monthly_rent=Decimal('1000.00'), is_occupied=True
+                )
+        User.objects.create(email='admin@example.com', username='admin', is_staff=True, user_type='admin')
+
+    def collect(self, **params):
+        names, cursor = [], None
+        while True:
+            query = dict(params, page_size=2)
+            if cursor:
+                query['cursor'] = cursor
+            response = self.client.get(self.url, query)
+            self.assertEqual(response.status_code, 200)
+            names.extend(t['full_name'].split()[0] for t in response.data['tenants'])
+            cursor = response.data['next_cursor']
+            if not cursor:
+                return names
+
+    def test_sorting_across_pages(self):
+        """Test that cursor pages follow the requested sort order"""
+        self.assertEqual(self.collect(sort='name'), ['Alice', 'Bob', 'Carol', 'Dan', 'Eve'])
+        self.assertEqual(self.collect(sort='-shop_count'), ['Eve', 'Dan', 'Carol', 'Bob', 'Alice'])
+
+    def test_shop_count_and_shops(self):
+        response = self.client.get(self.url, {'search': 'carol'})
+        tenant, = response.data['tenants']
+        self.assertEqual(tenant['shop_count'], 2)
+        self.assertEqual([s['shop_number'] for s in tenant['shops']], ['C000', 'C001'])
+
+    def test_search_matches_name_and_email(self):
+        self.assertEqual(self.collect(search='dan@example'), ['Dan'])
+        self.assertEqual(self.collect(search='ALICE'), ['Alice'])
+        self.assertEqual(self.collect(search='eve tenant'), ['Eve'])
+        self.assertEqual(len(self.collect(search='tenant')), 5)
+
+    def test_invalid_sort(self):
+        self.assertEqual(self.client.get(self.url, {'sort': 'password'}).status_code, 400)
+
+    def test_invalid_cursor(self):
+        cursor = base64.urlsafe_b64encode(json.dumps(['many', '1']).encode()).decode()
+        response = self.client.get(self.url, {'sort': 'shop_count', 'cursor': cursor})
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_is_constant(self):
+        """Test that a page costs two queries however many tenants and shops there are"""
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        for index in range(30):
+            tenant = User.objects.create(
+                email=f'extra{index}@example.com', username=f'extra{index}', first_name='Extra', last_name=str(index)
+            )
+            Shop.objects.create(shop_number=f'X{index:03d}', tenant=tenant, monthly_rent=Decimal('1.00'))
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['tenants']), 35)
+
+
+class RequestMetricsTests(TestCase):
+    """Test suite for the query timing middleware and its admin endpoint"""
+
+    def setUp(self):
+        """Set up test client, a staff user and empty metrics"""
+        self.client = APIClient()
+        self.url = '/api/admin/request-metrics/'
+        self.admin = User.objects.create(
+            email='admin@example.com',
+            username='admin',
+            user_type='admin',
+            is_staff=True
+        )
+        request_metrics.reset()
+
+    def test_server_timing_header(self):
+        """Every response reports DB, render and total time"""
+        response = self.client.get('/api/admin/stats/')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_aggregates_per_view(self):
+        """Samples are grouped under the view name with query counts"""
+        for _ in range(3):
+            self.client.get('/api/admin/stats/')
+        summary = request_metrics.summary()
+        stats = summary['dashboard_stats']
+        self.assertEqual(stats['requests'], 3)
+        self.assertGreater(stats['queries'], 0)
+        self.assertIsNotNone(stats['slowest_query'])
+        self.assertIsNotNone(stats['duration_ms']['p95'])
+
+    async def test_async_requests_are_timed(self):
+        """Under ASGI the middleware runs async and still sees the view's queries"""
+        response = await self.async_client.get('/api/admin/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        stats = request_metrics.summary()['dashboard_stats']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries'], 0)
+
+    def test_streaming_responses_are_timed_when_exhausted(self):
+        """Queries run while a streaming body is iterated are recorded once it ends"""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/admin/payments/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('export_payments', request_metrics.summary())
+
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(response.streaming_content)
+        stats = request_metrics.summary()['export_payments']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreaterEqual(stats['queries'], len(queries))
+        self.assertGreater(len(queries), 0)
+
+    def test_requires_staff(self):
+        """The metrics endpoint is not public"""
+        response = self.client.get(self.url)
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_staff_can_read_metrics(self):
+        """Staff users get the per-view summary"""
+        self.client.get('/api/admin/stats/')
+        token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('dashboard_stats', response.json()['views'])
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Each list and analytics endpoint declares a maximum number of queries.
+    Endpoints are measured against a small and a large seeded mall; the
+    count must stay within budget and must not grow with the data.
+    """
+
+    SMALL = 10
+    LARGE = 1000
+
+    # name: (path, max queries); paths are formatted with the seeded tenant's id
+    BUDGETS = {
+        'dashboard_stats': ('/api/admin/stats/', 5),
+        'tenant_list': ('/api/admin/tenants/', 2),
+        'profile_requests': ('/api/admin/profile-requests/', 1),
+        'payment_history': ('/api/admin/payment-history/', 1),
+        'enhanced_analytics': ('/api/admin/enhanced-analytics/', 4),
+        'tenant_shops': ('/api/shops/tenant/{tenant_id}/shops/', 3),
+        'tenant_payment_history': ('/api/shops/tenant/{tenant_id}/payment-history/', 2),
+        'overdue_shops': ('/api/shops/overdue/', 1),
+        'aging_report': ('/api/admin/aging-report/', 1),
+        'aging_report_tenant': ('/api/admin/aging-report/?tenant={tenant_id}', 2),
+        'revenue_series': ('/api/admin/revenue-series/?granularity=month&from=2020-01-01', 1),
+        'cash_flow_forecast': ('/api/admin/cash-flow-forecast/', 2),
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def seed(self, tenants):
+        call_command(
+            'seed_mall', '--tenants', str(tenants), '--shops', str(tenants * 3 // 2),
+            '--payments', str(tenants * 5), '--profile-requests', str(tenants),
+            '--months', '2', '--clear', stdout=StringIO()
+        )
+
+    def measure(self):
+        """Queries run by each endpoint against the current data"""
+        tenant = User.objects.get(email=seed_email(0))
+        # Measure the queries behind cached endpoints too
+        cache.clear()
+        queries = {}
+        for name, (path, _) in self.BUDGETS.items():
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(path.format(tenant_id=tenant.id))
+            self.assertEqual(response.status_code, 200, name)
+            queries[name] = [query['sql'] for query in context.captured_queries]
+        return queries
+
+    def describe(self, queries):
+        """Statements with literals stripped and how often each ran, most repeated first"""
+        counts = Counter(re.sub(r"'[^']*'|\b\d+\b", '?', sql) for sql in queries)
+        return '\n'.join(f'{count:>5}x {sql}' for sql, count in counts.most_common())
+
+    def test_query_budgets(self):
+        self.seed(self.SMALL)
+        small = self.measure()
+        self.seed(self.LARGE)
+        large = self.measure()
+
+        for name, (_, budget) in self.BUDGETS.items():
+            with self.subTest(endpoint=name):
+                self.assertLessEqual(
+                    len(large[name]), budget,
+                    f'{name} ran {len(large[name])} queries, budget is {budget}:\n{self.describe(large[name])}'
+                )
+                self.assertEqual(
+                    len(small[name]), len(large[name]),
+                    f'{name} ran {len(small[name])} queries with {self.SMALL} tenants but '
+                    f'{len(large[name])} with {self.LARGE}:\n{self.describe(large[name])}'
+                )
+
+
+class AgingReportTests(TestCase):
+    """Test suite for the receivables aging report"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/admin/aging-report/'
+        self.today = timezone.localdate()
+        self.shop_counter = 0
+        cache.clear()
+        self.tenant = self.create_tenant(1)
+        self.other = self.create_tenant(2)
+        # (tenant, floor, type, days overdue, balance)
+        for tenant, floor, shop_type, days, balance in [
+            (self.tenant, 1, 'Clothing', 10, '100.00'),
+            (self.tenant, 1, 'Clothing', 45, '200.00'),
+            (self.other, 1, 'Clothing', 30, '50.00'),
+            (self.other, 2, 'Salon', 75, '300.00'),
+            (self.other, 2, 'Salon', 120, '400.00'),
+            (self.other, 2, 'Salon', -5, '500.00'),
+            (self.other, 3, 'Salon', 20, '0.00'),
+        ]:
+            self.create_shop(tenant, floor, shop_type, days, Decimal(balance))
+
+    def create_tenant(self, index):
+        return User.objects.create(
+            email=f'tenant{index}@example.com',
+            username=f'tenant{index}',
+            first_name='Tenant',
+            last_name=str(index),
+            user_type='tenant'
+        )
+
+    def create_shop(self, tenant, floor, shop_type, days_overdue, balance):
+        self.shop_counter += 1
+        return Shop.objects.create(
+            shop_number=f'S{self.shop_counter:03d}',
+            tenant=tenant,
+            monthly_rent=Decimal('500.00'),
+            shop_type=shop_type,
+            floor_number=floor,
+            is_occupied=True,
+            balance=balance,
+            next_due_date=self.today - timedelta(days=days_overdue)
+        )
+
+    def test_buckets_by_floor_and_type(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['as_of'], self.today.isoformat())
+        rows = {(row['floor_number'], row['shop_type']): row for row in data['rows']}
+        self.assertEqual(list(rows), [(1, 'Clothing'), (2, 'Salon')])
+
+        clothing = rows[(1, 'Clothing')]['buckets']
+        self.assertEqual(clothing['0-30'], {'shops': 2, 'balance': 150.0})
+        self.assertEqual(clothing['31-60'], {'shops': 1, 'balance': 200.0})
+        salon = rows[(2, 'Salon')]['buckets']
+        self.assertEqual(salon['61-90'], {'shops': 1, 'balance': 300.0})
+        self.assertEqual(salon['90+'], {'shops': 1, 'balance': 400.0})
+
+        self.assertEqual(data['totals']['total_shops'], 5)
+        self.assertEqual(data['totals']['total_balance'], 1050.0)
+
+    def test_cached_until_a_shop_changes(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+        shop = Shop.objects.get(shop_number='S001')
+        shop.balance = Decimal('0.00')
+        shop.save()
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['totals']['total_balance'], 950.0)
+
+    def test_tenant_drill_down(self):
+        response = self.client.get(self.url, {'tenant': self.tenant.id})
+        data = response.json()
+        self.assertEqual(data['tenant_id'], self.tenant.id)
+        self.assertEqual(data['totals']['total_shops'], 2)
+        self.assertEqual(
+            [(shop['shop_number'], shop['days_overdue'], shop['bucket']) for shop in data['shops']],
+            [('S002', 45, '31-60'), ('S001', 10, '0-30')]
+        )
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {'output': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(response.content.decode().splitlines()))
+        self.assertEqual(rows[0][:4], ['floor_number', 'shop_type', '0-30 shops', '0-30 balance'])
+        self.assertEqual(rows[1][:4], ['1', 'Clothing', '2', '150.00'])
+        self.assertEqual(rows[-1][0], 'Total')
+        self.assertEqual(rows[-1][-2:], ['5', '1050.00'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'tenant': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'tenant': '0'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+
+    def test_tenant_report_is_cached_apart_from_mall_report(self):
+        mall = get_aging_report()
+        self.assertEqual(get_aging_report(0)['totals']['total_shops'], 0)
+        self.assertEqual(get_aging_report()['totals'], mall['totals'])
+
+
+class RevenueSeriesTests(TestCase):
+    """Test suite for the revenue time series"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/admin/revenue-series/'
+        # (day, method, amount, count); 2026-03-02 is a Monday
+        for day, method, amount, count in [
+            (date(2026, 2, 27), 'cash', '100.00', 1),
+            (date(2026, 3, 2), 'cash', '200.00', 2),
+            (date(2026, 3, 2), 'mobile_money', '300.00', 3),
+            (date(2026, 3, 8), 'bank_transfer', '400.00', 1),
+            (date(2026, 3, 9), 'cash', '50.00', 1),
+        ]:
+            DailyRevenue.objects.create(
+                day=day, payment_method=method, total_amount=Decimal(amount), payment_count=count
+            )
+
+    def get(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_daily_series_is_dense(self):
+        with self.assertNumQueries(1):
+            data = self.get(granularity='day', **{'from': '2026-03-01', 'to': '2026-03-03'})
+        self.assertEqual([point['period'] for point in data['series']], ['2026-03-01', '2026-03-02', '2026-03-03'])
+        empty, busy, _ = data['series']
+        self.assertEqual((empty['total_amount'], empty['payment_count']), (0.0, 0))
+        self.assertEqual((busy['total_amount'], busy['payment_count']), (500.0, 5))
+        self.assertEqual(busy['by_method']['mobile_money'], {'amount': 300.0, 'count': 3})
+        self.assertEqual(busy['by_method']['bank_transfer'], {'amount': 0.0, 'count': 0})
+
+    def test_weekly_series_starts_on_monday(self):
+        data = self.get(granularity='week', **{'from': '2026-02-25', 'to': '2026-03-09'})
+        self.assertEqual(data['from'], '2026-02-23')
+        self.assertEqual(
+            [(point['period'], point['total_amount']) for point in data['series']],
+            [('2026-02-23', 100.0), ('2026-03-02', 900.0), ('2026-03-09', 50.0)]
+        )
+
+    def test_monthly_series(self):
+        data = self.get(granularity='month', **{'from': '2026-01-15', 'to': '2026-03-31'})
+        self.assertEqual(
+            [(point['period'], point['payment_count']) for point in data['series']],
+            [('2026-01-01', 0), ('2026-02-01', 1), ('2026-03-01', 7)]
+        )
+        self.assertEqual(data['total_amount'], 1050.0)
+        self.assertEqual(data['payment_count'], 8)
+
+    def test_default_range(self):
+        data = self.get(granularity='month')
+        self.assertEqual(len(data['series']), 24)
+        self.assertEqual(data['to'], timezone.localdate().isoformat())
+
+    def test_invalid_parameters(self):
+        for params in [
+            {'granularity': 'year'},
+            {'from': '2026-13-01'},
+            {'from': '2026-03-10', 'to': '2026-03-01'},
+            {'granularity': 'day', 'from': '1990-01-01', 'to': '2026-01-01'},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class CashFlowForecastTests(TestCase):
+    """Test suite for the receivables cash-flow forecast"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/admin/cash-flow-forecast/'
+        self.today = date(2026, 3, 10)
+        cache.clear()
+        self.prompt = self.create_tenant(1)
+        self.late = self.create_tenant(2)
+        # Both owe 100 on 2026-03-20 and 100 a month after that
+        self.create_shop(self.prompt, 'S001', date(2026, 3, 20))
+        self.create_shop(self.late, 'S002', date(2026, 3, 20))
+
+    def create_tenant(self, index):
+        return User.objects.create(
+            email=f'tenant{index}@example.com',
+            username=f'tenant{index}',
+            first_name='Tenant',
+            last_name=str(index),
+            user_type='tenant'
+        )
+
+    def create_shop(self, tenant, shop_number, next_due_date, balance='100.00'):
+        return Shop.objects.create(
+            shop_number=shop_number,
+            tenant=tenant,
+            monthly_rent=Decimal('100.00'),
+            shop_type='Clothing',
+            floor_number=1,
+            is_occupied=True,
+            balance=Decimal(balance),
+            next_due_date=next_due_date
+        )
+
+    def pay_history(self, tenant, days_late, count):
+        shop = Shop.objects.get(tenant=tenant)
+        for _ in range(count):
+            payment = Payment.objects.create(
+                shop=shop,
+                tenant=tenant,
+                amount=Decimal('100.00'),
+                payment_method='cash',
+                payment_month='2025-06',
+                due_date=date(2025, 6, 1)
+            )
+            Payment.objects.filter(id=payment.id).update(
+                payment_date=timezone.make_aware(datetime(2025, 6, 1, 12)) + timedelta(days=days_late)
+            )
+
+    def forecast(self, months):
+        return build_forecast(months, today=self.today)
+
+    def test_scheduled_dues_without_history(self):
+        data = self.forecast(3)
+        self.assertEqual(data['shops'], 2)
+        self.assertEqual(
+            [(point['month'], point['scheduled'], point['expected']) for point in data['series']],
+            [('2026-03', 200.0, 200.0), ('2026-04', 200.0, 200.0), ('2026-05', 200.0, 200.0)]
+        )
+        self.assertEqual(data['arrears'], 0.0)
+
+    def test_late_payers_shift_expected_inflows(self):
+        # 95 payments a day late and 95 two months late; the mall-wide
+        # prior is then even between the two buckets
+        self.pay_history(self.prompt, 1, 95)
+        self.pay_history(self.late, 65, 95)
+        data = self.forecast(3)
+        march, april, may = data['series']
+        # prompt: 0.975 on time, 0.025 two months late; late: the reverse
+        self.assertAlmostEqual(march['expected'], 100.0)
+        self.assertAlmostEqual(april['expected'], 100.0)
+        self.assertAlmostEqual(may['expected'], 200.0)
+        self.assertAlmostEqual(data['expected_after_horizon'], 200.0)
+        self.assertEqual(data['total_scheduled'], 600.0)
+
+    def test_missed_months_are_arrears_due_now(self):
+        Shop.objects.filter(tenant=self.prompt).update(next_due_date=date(2026, 1, 20), balance=Decimal('50.00'))
+        data = self.forecast(2)
+        # 50 from January and 100 from February are overdue
+        self.assertEqual(data['arrears'], 150.0)
+        self.assertEqual(data['series'][0]['scheduled'], 350.0)
+
+    def test_prepaid_shops_owe_nothing_until_their_due_date(self):
+        Shop.objects.filter(tenant=self.prompt).update(next_due_date=date(2026, 6, 1))
+        data = self.forecast(3)
+        self.assertEqual([point['scheduled'] for point in data['series']], [100.0, 100.0, 100.0])
+
+    def test_endpoint(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'months': 6})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['series']), 6)
+        # The delay histogram is reused
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, {'months': 0}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'months': 'x'}).status_code, 400)
+
+
+class BackgroundTenantJobTests(TestCase):
+    """Test suite for queuing tenant registration and deletion as background jobs"""
+
+    def setUp(self):
+        self.client = APIClient()
+        admin = User.objects.create(
+            email='jobs-admin@example.com', username='jobs-admin', user_type='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        self.shop = Shop.objects.create(
+            shop_number='J001', monthly_rent=Decimal('500.00'), shop_type='Clothing', floor_number=1
+        )
+        self.registration = {
+            'email': 'queued@example.com',
+            'username': 'queued',
+            'first_name': 'Queued',
+            'last_name': 'Tenant',
+            'shop_numbers': ['J001'],
+            'join_date': '2026-01-15'
+        }
+
+    def test_register_tenant_in_background(self):
+        response = self.client.post(
+            '/api/admin/register-tenant/', self.registration, format='json', HTTP_PREFER='respond-async'
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        self.assertEqual(response['Location'], f'/api/jobs/{job_id}/')
+        self.assertFalse(User.objects.filter(email='queued@example.com').exists())
+
+        self.assertEqual(run_pending(), 1)
+        job = self.client.get(f'/api/jobs/{job_id}/').json()
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        self.assertEqual(job['result']['assigned_shops'][0]['shop_number'], 'J001')
+        user = User.objects.get(email='queued@example.com')
+        self.assertTrue(user.check_password(job['result']['temp_password']))
+        # The temporary password is only handed out once
+        job = self.client.get(f'/api/jobs/{job_id}/').json()
+        self.assertIsNone(job['result']['temp_password'])
+        self.assertIsNone(Job.objects.get(id=job_id).result['temp_password'])
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.tenant, user)
+
+    def test_invalid_registration_is_rejected_before_queueing(self):
+        response = self.client.post(
+            '/api/admin/register-tenant/', {**self.registration, 'shop_numbers': ['NOPE']},
+            format='json', HTTP_PREFER='respond-async'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+    def test_registration_conflicting_after_queueing_fails_without_retry(self):
+        response = self.client.post(
+            '/api/admin/register-tenant/', self.registration, format='json', HTTP_PREFER='respond-async'
+        )
+        # Another admin takes the shop before the job runs
+        self.client.post('/api/admin/register-tenant/', {
+            **self.registration, 'email': 'first@example.com', 'username': 'first'
+        }, format='json')
+
+        run_pending()
+        job = Job.objects.get(id=response.json()['job_id'])
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertIn('already occupied', job.error)
+
+    def test_delete_tenant_in_background(self):
+        result = self.client.post('/api/admin/register-tenant/', self.registration, format='json').json()
+        tenant_id = result['tenant']['id']
+
+        response = self.client.delete(f'/api/admin/tenants/{tenant_id}/delete/', HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(User.objects.filter(id=tenant_id).exists())
+
+        run_pending(limit=1)
+        job = Job.objects.get(id=response.json()['job_id'])
+        self.assertEqual(job.result['shops_vacated'], ['J001'])
+        self.assertIsNotNone(User.objects.get(id=tenant_id).deleted_at)
+        self.shop.refresh_from_db()
+        self.assertFalse(self.shop.is_occupied)
+
+
+# Hashing dozens of temporary passwords with the production hasher would dominate the run
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BatchTenantRegistrationTests(TestCase):
+    """Test suite for batch tenant onboarding"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create(
+            email='batch-admin@example.com', username='batch-admin', user_type='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.url = '/api/admin/register-tenants/'
+        cache.clear()
+        self.existing = User.objects.create(
+            email='existing@example.com', username='existing', first_name='Existing', last_name='Tenant',
+            user_type='tenant'
+        )
+        for index in range(1, 61):
+            Shop.objects.create(
+                shop_number=f'W{index:03d}', monthly_rent=Decimal('400.00'), shop_type='Clothing', floor_number=2
+            )
+        Shop.objects.filter(shop_number='W060').update(tenant=self.existing, is_occupied=True)
+
+    def entry(self, index, **overrides):
+        return {
+            'email': f'wing{index}@example.com',
+            'username': f'wing{index}',
+            'first_name': 'Wing',
+            'last_name': str(index),
+            'shop_numbers': [f'W{index:03d}'],
+            **overrides
+        }
+
+    def test_requires_admin(self):
+        client = APIClient()
+        for headers in ({}, {'HTTP_PREFER': 'respond-async'}):
+            response = client.post(self.url, {'tenants': [self.entry(1)]}, format='json', **headers)
+            self.assertIn(response.status_code, (401, 403))
+        client.force_authenticate(user=self.existing)
+        response = client.post(self.url, {'tenants': [self.entry(1)]}, format='json', HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(User.objects.filter(email='wing1@example.com').exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_reports_errors_per_tenant(self):
+        response = self.client.post(self.url, {'tenants': [
+            self.entry(1, shop_numbers=['W001', 'W002'], join_date='2026-01-15'),
+            self.entry(3, email='existing@example.com'),
+            self.entry(4, username='wing1'),
+            self.entry(5, shop_numbers=['W002']),
+            self.entry(6, shop_numbers=['NOPE']),
+            self.entry(7, shop_numbers=['W060']),
+            self.entry(8, email='not-an-email'),
+            self.entry(9),
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['created'], data['rejected']), (2, 6))
+
+        results = data['results']
+        self.assertEqual([result['status'] for result in results], ['created'] + ['rejected'] * 6 + ['created'])
+        self.assertEqual(results[1]['errors'], {'email': ['A user with this email already exists']})
+        self.assertIn('in this batch', results[2]['errors']['username'][0])
+        self.assertIn('Shop W002 is assigned to another tenant in this batch', results[3]['errors']['shop_numbers'])
+        self.assertEqual(results[4]['errors'], {'shop_numbers': ['Shop NOPE does not exist']})
+        self.assertIn('already occupied by Existing Tenant', results[5]['errors']['shop_numbers'][0])
+        self.assertIn('email', results[6]['errors'])
+
+        user = User.objects.get(email='wing1@example.com')
+        self.assertTrue(user.check_password(results[0]['temp_password']))
+        self.assertTrue(user.has_temporary_password)
+        self.assertEqual(user.user_type, 'tenant')
+        shops = Shop.objects.filter(tenant=user).order_by('shop_number')
+        self.assertEqual([shop.shop_number for shop in shops], ['W001', 'W002'])
+        self.assertTrue(all(shop.is_occupied for shop in shops))
+        self.assertEqual(shops[0].balance, Decimal('400.00'))
+        self.assertEqual(shops[0].next_due_date, date(2026, 2, 15))
+        self.assertFalse(User.objects.filter(email='wing5@example.com').exists())
+
+    def test_query_count_does_not_grow_with_batch(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, {'tenants': [self.entry(index) for index in range(1, 3)]}, format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(self.url, {'tenants': [self.entry(index) for index in range(3, 53)]}, format='json')
+        self.assertEqual(response.json()['created'], 50)
+        self.assertEqual(len(large), len(small))
+
+    def test_assigned_shops_leave_the_available_listing(self):
+        self.client.get('/api/shops/available-shops/')
+        self.client.post(self.url, {'tenants': [self.entry(1)]}, format='json')
+        listed = [shop['shop_number'] for shop in self.client.get('/api/shops/available-shops/').json()['shops']]
+        self.assertNotIn('W001', listed)
+        self.assertIn('W002', listed)
+
+    def test_batch_in_background(self):
+        response = self.client.post(
+            self.url, {'tenants': [self.entry(1), self.entry(2)]}, format='json', HTTP_PREFER='respond-async'
+        )
+        self.assertEqual(response.status_code, 202)
+        run_pending()
+        job = Job.objects.get(id=response.json()['job_id'])
+        self.assertEqual((job.status, job.result['created']), (Job.SUCCEEDED, 2))
+
+    def test_invalid_body(self):
+        self.assertEqual(self.client.post(self.url, {'tenants': []}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'tenants': 'x'}, format='json').status_code, 400)
+        with self.settings(TENANT_BATCH_LIMIT=2):
+            response = self.client.post(self.url, {'tenants': [self.entry(index) for index in range(1, 4)]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class DeleteTenantTests(TestCase):
+    """Test suite for removing a tenant and archiving their payments"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.tenant = User.objects.create(
+            email='leaving@example.com', username='leaving', first_name='Leaving', last_name='Tenant',
+            user_type='tenant'
+        )
+        self.other = User.objects.create(
+            email='staying@example.com', username='staying', first_name='Staying', last_name='Tenant',
+            user_type='tenant'
+        )
+        self.shops = [
+            Shop.objects.create(
+                shop_number=f'D{index:03d}', tenant=self.tenant, monthly_rent=Decimal('300.00'),
+                shop_type='Salon', floor_number=1, is_occupied=True, balance=Decimal('300.00'),
+                next_due_date=timezone.localdate()
+            )
+            for index in range(1, 4)
+        ]
+        self.other_shop = Shop.objects.create(
+            shop_number='K001', tenant=self.other, monthly_rent=Decimal('300.00'),
+            shop_type='Salon', floor_number=1, is_occupied=True
+        )
+        Payment.objects.bulk_create([
+            Payment(
+                shop=self.shops[index % 3], tenant=self.tenant, amount=Decimal('100.00'),
+                payment_method='cash', payment_month='2026-01', month=date(2026, 1, 1),
+                status='completed' if index % 5 else 'failed'
+            )
+            for index in range(25)
+        ] + [
+            Payment(
+                shop=self.other_shop, tenant=self.other, amount=Decimal('50.00'),
+                payment_method='cash', payment_month='2026-01', month=date(2026, 1, 1)
+            )
+        ])
+        self.url = f'/api/admin/tenants/{self.tenant.id}/delete/'
+
+    def test_vacates_shops_in_one_update_and_soft_deletes(self):
+        token = Token.objects.create(user=self.tenant)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['shops_vacated'], ['D001', 'D002', 'D003'])
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "shops_shop"')]
+        self.assertEqual(len(updates), 1)
+
+        self.assertFalse(Shop.objects.filter(tenant=self.tenant).exists())
+        self.assertFalse(Shop.objects.filter(shop_number__in=['D001', 'D002', 'D003'], is_occupied=True).exists())
+        self.tenant.refresh_from_db()
+        self.assertFalse(self.tenant.is_active)
+        self.assertIsNotNone(self.tenant.deleted_at)
+        self.assertFalse(Token.objects.filter(key=token.key).exists())
+
+        # Removed tenants drop out of the admin lists and cannot be deleted twice
+        emails = [tenant['email'] for tenant in self.client.get('/api/admin/tenants/').json()['tenants']]
+        self.assertEqual(emails, ['staying@example.com'])
+        self.assertEqual(self.client.delete(self.url).status_code, 404)
+
+        # Payments stay in the ledger until the archive job runs
+        self.assertEqual(Payment.objects.filter(tenant=self.tenant).count(), 25)
+        self.assertEqual(Job.objects.get(id=data['archive_job_id']).name, 'archive_tenant_payments')
+
+    def test_email_and_username_can_be_registered_again(self):
+        self.client.delete(self.url)
+        self.tenant.refresh_from_db()
+        self.assertEqual(self.tenant.email, f'deleted-{self.tenant.id}-leaving@example.com')
+
+        response = self.client.post('/api/admin/register-tenant/', {
+            'email': 'leaving@example.com', 'username': 'leaving', 'first_name': 'Returning',
+            'last_name': 'Tenant', 'shop_numbers': ['D001']
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        returning = User.objects.get(email='leaving@example.com')
+        self.assertNotEqual(returning.id, self.tenant.id)
+        self.assertIsNone(returning.deleted_at)
+
+    def test_payments_are_archived_in_batches(self):
+        self.client.delete(self.url)
+        with self.settings(PAYMENT_ARCHIVE_BATCH_SIZE=10):
+            self.assertEqual(run_pending(), 3)
+
+        results = [job.result for job in Job.objects.filter(name='archive_tenant_payments').order_by('id')]
+        self.assertEqual([result['archived'] for result in results], [10, 10, 5])
+        self.assertEqual(results[-1]['total_archived'], 25)
+        self.assertNotIn('next_job_id', results[-1])
+
+        self.assertFalse(Payment.objects.filter(tenant=self.tenant).exists())
+        self.assertEqual(Payment.objects.filter(tenant=self.other).count(), 1)
+        archived = PaymentArchive.objects.filter(tenant_id=self.tenant.id)
+        self.assertEqual(archived.count(), 25)
+        self.assertEqual(archived.filter(status='completed').aggregate(total=Sum('amount'))['total'], Decimal('2000.00'))
+
+    def test_rollup_rebuild_includes_archived_payments(self):
+        call_command('rebuild_monthly_revenue', stdout=StringIO())
+        call_command('rebuild_daily_revenue', stdout=StringIO())
+        fields = ('month', 'tenant_id', 'shop_id', 'payment_method', 'total_amount', 'payment_count')
+        monthly = sorted(MonthlyRevenue.objects.values_list(*fields))
+        daily = sorted(DailyRevenue.objects.values_list('day', 'payment_method', 'total_amount', 'payment_count'))
+
+        self.client.delete(self.url)
+        run_pending()
+        call_command('rebuild_monthly_revenue', stdout=StringIO())
+        call_command('rebuild_daily_revenue', stdout=StringIO())
+        self.assertEqual(sorted(MonthlyRevenue.objects.values_list(*fields)), monthly)
+        self.assertEqual(
+            sorted(DailyRevenue.objects.values_list('day', 'payment_method', 'total_amount', 'payment_count')), daily
+        )
@@ -5,10 +5,17 @@ urlpatterns = [
     path('stats/', views.dashboard_stats, name='dashboard_stats'),
     path('tenants/', views.tenant_list, name='tenant_list'),
     path('register-tenant/', views.register_tenant, name='register_tenant'),
+    path('register-tenants/', views.register_tenants, name='register_tenants'),
     path('profile-requests/', views.profile_change_requests, name='profile_requests'),
     path('profile-requests/<int:request_id>/approve/', views.approve_profile_request, name='approve_request'),
     path('profile-requests/<int:request_id>/reject/', views.reject_profile_request, name='reject_request'),
     path('payment-history/', views.payment_history, name='payment_history'),
+    path('payments/export/', views.export_payments, name='export_payments'),
+    path('payments/import/', views.import_payments, name='import_payments'),
     path('tenants/<int:tenant_id>/delete/', views.delete_tenant, name='delete_tenant'),
+    path('aging-report/', views.aging_report, name='aging_report'),
+    path('revenue-series/', views.revenue_series, name='revenue_series'),
+    path('cash-flow-forecast/', views.cash_flow_forecast, name='cash_flow_forecast'),
     path('enhanced-analytics/', views.enhanced_analytics, name='enhanced_analytics'),
+    path('request-metrics/', views.request_metrics_view, name='request_metrics'),
 ]
\ No newline at end of file
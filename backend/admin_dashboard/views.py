@@ -1,29 +1,39 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from user_accounts.models import User
-from shops.models import Shop, Payment
+from user_accounts.serializers import AdminTenantRegistrationSerializer
+from jobs.queue import enqueue
+from jobs.views import accepted, wants_async
+from shops.models import Shop, Payment, MonthlyRevenue
+from shops.exports import EXPORT_FORMATS, filter_payments, iter_export
+from shops.imports import parse_statement, import_payments as import_statement
+from shops.aging import get_aging_report, iter_aging_csv
+from shops.forecast import MAX_MONTHS, build_forecast
+from shops.revenue import GRANULARITIES, MAX_POINTS, build_revenue_series, count_periods, default_start
 from .models import ProfileChangeRequest
-from django.db.models import Sum, Count
+from .tenants import delete_tenant_and_vacate_shops, register_tenants as register_tenant_batch, registration_response
+from django.db.models import Sum, Count, Q, Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
 from datetime import datetime, timedelta
+from django.conf import settings
+from django.utils import timezone
+from backend.pagination import KeysetPagination, InvalidCursor
+from backend.request_metrics import request_metrics
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def dashboard_stats(request):
     """Get dashboard statistics"""
-    total_tenants = User.objects.filter(user_type='tenant', is_staff=False).count()
+    total_tenants = User.objects.filter(user_type='tenant', is_staff=False, deleted_at__isnull=True).count()
     total_shops = Shop.objects.count()
     occupied_shops = Shop.objects.filter(is_occupied=True).count()
     
-    # Payment statistics
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    monthly_revenue = Payment.objects.filter(
-        payment_date__month=current_month,
-        payment_date__year=current_year,
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Payment statistics, read from the monthly rollup
+    monthly_revenue = MonthlyRevenue.objects.filter(
+        month=MonthlyRevenue.current_month()
+    ).aggregate(total=Sum('total_amount'))['total'] or 0
     
     pending_requests = ProfileChangeRequest.objects.filter(status='pending').count()
     
@@ -36,27 +46,60 @@ def dashboard_stats(request):
         'pending_requests': pending_requests
     })
 
+TENANT_SORT_FIELDS = {
+    'name': ('first_name', 'last_name'),
+    'email': ('email',),
+    'created_at': ('created_at',),
+    'shop_count': ('shop_count',),
+}
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def tenant_list(request):
-    """Get all tenants (exclude admins/staff)"""
+    """
+    Get all tenants (exclude admins/staff)
+    Cursor-paginated; optional ?search= (name or email) and
+    ?sort=name|email|created_at|shop_count (prefix with - for descending)
+    """
+    sort = request.query_params.get('sort', 'created_at')
+    descending = sort.startswith('-')
+    if sort.lstrip('-') not in TENANT_SORT_FIELDS:
+        return Response({'message': 'Invalid sort field'}, status=status.HTTP_400_BAD_REQUEST)
+    prefix = '-' if descending else ''
+    ordering = [prefix + field for field in TENANT_SORT_FIELDS[sort.lstrip('-')]] + [prefix + 'id']
+    
     # Only get users who are tenants (not staff/admin)
-    tenants = User.objects.filter(user_type='tenant', is_staff=False)
-    tenant_data = []
+    tenants = User.objects.filter(user_type='tenant', is_staff=False, deleted_at__isnull=True).annotate(
+        shop_count=Count('shops')
+    ).prefetch_related(
+        Prefetch('shops', queryset=Shop.objects.only('id', 'tenant_id', 'shop_number', 'monthly_rent'))
+    )
     
-    for tenant in tenants:
-        shops = Shop.objects.filter(tenant=tenant)
-        tenant_data.append({
+    for term in request.query_params.get('search', '').split():
+        tenants = tenants.filter(
+            Q(first_name__icontains=term) | Q(last_name__icontains=term) | Q(email__icontains=term)
+        )
+    
+    paginator = KeysetPagination(ordering=ordering, page_size=settings.TENANT_LIST_PAGE_SIZE, max_page_size=500)
+    try:
+        page = paginator.paginate_queryset(tenants, request)
+    except InvalidCursor as e:
+        return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    tenant_data = [
+        {
             'id': tenant.id,
             'full_name': tenant.full_name,
             'email': tenant.email,
             'phone_number': tenant.phone_number,
-            'shop_count': shops.count(),
-            'shops': [{'shop_number': s.shop_number, 'monthly_rent': float(s.monthly_rent)} for s in shops],
+            'shop_count': tenant.shop_count,
+            'shops': [{'shop_number': s.shop_number, 'monthly_rent': float(s.monthly_rent)} for s in tenant.shops.all()],
             'created_at': tenant.created_at
-        })
+        }
+        for tenant in page
+    ]
     
-    return Response({'tenants': tenant_data})
+    return Response({'tenants': tenant_data, 'next_cursor': paginator.next_cursor})
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -64,72 +107,75 @@ def register_tenant(request):
     """
     Admin registers a new tenant with shop assignments
     Admin provides basic info, tenant will set password on first login
+    With "Prefer: respond-async" the registration runs as a background job
+    and the response is 202 with the job to poll
     """
-    from user_accounts.serializers import AdminTenantRegistrationSerializer
-    
     serializer = AdminTenantRegistrationSerializer(data=request.data)
     
     if serializer.is_valid():
-        # Create tenant and assign shops
-        result = serializer.save()
-        user = result['user']
-        assigned_shops = result['assigned_shops']
-        temp_password = result['temp_password']
+        if wants_async(request):
+            payload = dict(serializer.validated_data)
+            if payload.get('join_date'):
+                payload['join_date'] = payload['join_date'].isoformat()
+            job = enqueue('register_tenant', payload)
+            return accepted(job, 'Tenant registration queued')
         
-        # Prepare shop information for response
-        shops_info = [
-            {
-                'shop_number': shop.shop_number,
-                'monthly_rent': float(shop.monthly_rent),
-                'shop_type': shop.shop_type,
-                'floor_number': shop.floor_number
-            }
-            for shop in assigned_shops
-        ]
-        
-        return Response({
-            'message': 'Tenant registered successfully',
-            'tenant': {
-                'id': user.id,
-                'email': user.email,
-                'full_name': user.full_name,
-                'username': user.username,
-                'phone_number': user.phone_number
-            },
-            'assigned_shops': shops_info,
-            'temp_password': temp_password,  # Admin should communicate this to tenant
-            'note': 'Tenant should change password on first login'
-        }, status=status.HTTP_201_CREATED)
+        # Create tenant and assign shops
+        return Response(registration_response(serializer.save()), status=status.HTTP_201_CREATED)
     
     return Response({
         'message': 'Registration failed',
         'errors': serializer.errors
     }, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def register_tenants(request):
+    """
+    Register many tenants at once: {"tenants": [<register-tenant body>, ...]}
+    Valid tenants are created even when others in the batch are rejected;
+    results lists each entry's outcome in order.
+    With "Prefer: respond-async" the batch runs as a background job
+    """
+    entries = request.data.get('tenants') if isinstance(request.data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return Response({'message': 'Expected a non-empty list of tenants'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(entries) > settings.TENANT_BATCH_LIMIT:
+        return Response({
+            'message': f'At most {settings.TENANT_BATCH_LIMIT} tenants per batch'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if wants_async(request):
+        job = enqueue('register_tenants', {'tenants': entries})
+        return accepted(job, f'Registration of {len(entries)} tenants queued')
+    
+    report = register_tenant_batch(entries)
+    return Response({
+        'message': f"Registered {report['created']} tenants, rejected {report['rejected']}",
+        **report
+    }, status=status.HTTP_200_OK)
+
 @api_view(['DELETE'])
 @permission_classes([AllowAny])
 def delete_tenant(request, tenant_id):
     """
     Delete a tenant and mark their shops as vacant
+    The account is kept but deactivated, and the tenant's payments are moved
+    to the archive by a background job (archive_job_id)
+    With "Prefer: respond-async" the deletion itself runs as a background job
     """
     try:
-        tenant = User.objects.get(id=tenant_id, user_type='tenant')
-        
-        # Get all shops assigned to this tenant
-        tenant_shops = Shop.objects.filter(tenant=tenant)
-        
-        # Mark shops as vacant before deleting tenant
-        for shop in tenant_shops:
-            shop.tenant = None
-            shop.is_occupied = False
-            shop.save()
+        tenant = User.objects.get(id=tenant_id, user_type='tenant', deleted_at__isnull=True)
         
-        # Delete the tenant
-        tenant.delete()
+        if wants_async(request):
+            job = enqueue('delete_tenant', {'tenant_id': tenant.id})
+            return accepted(job, 'Tenant deletion queued')
         
+        shops_vacated, archive_job = delete_tenant_and_vacate_shops(tenant)
         return Response({
             'message': 'Tenant deleted successfully',
-            'shops_vacated': [shop.shop_number for shop in tenant_shops]
+            'shops_vacated': shops_vacated,
+            'archive_job_id': archive_job.id
         }, status=status.HTTP_200_OK)
         
     except User.DoesNotExist:
@@ -145,7 +191,7 @@ def delete_tenant(request, tenant_id):
 @permission_classes([AllowAny])
 def profile_change_requests(request):
     """Get all profile change requests"""
-    requests_list = ProfileChangeRequest.objects.all()
+    requests_list = ProfileChangeRequest.objects.select_related('tenant')
     data = []
     
     for req in requests_list:
@@ -201,7 +247,7 @@ def reject_profile_request(request, request_id):
 @permission_classes([AllowAny])
 def payment_history(request):
     """Get payment history for analytics"""
-    payments = Payment.objects.all().order_by('-payment_date')[:50]
+    payments = Payment.objects.select_related('tenant', 'shop').order_by('-payment_date')[:50]
     
     data = []
     for payment in payments:
@@ -217,6 +263,139 @@ def payment_history(request):
     
     return Response({'payments': data})
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_payments(request):
+    """
+    Stream the whole payment ledger for accounting.
+    ?output=csv|ndjson (default csv), optional from/to (YYYY-MM-DD, inclusive),
+    shop (shop number), tenant (tenant id) and method filters.
+    """
+    export_format = request.query_params.get('output', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response({'message': 'Invalid output format'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        payments = filter_payments(
+            date_from=request.query_params.get('from'),
+            date_to=request.query_params.get('to'),
+            shop=request.query_params.get('shop'),
+            tenant=request.query_params.get('tenant'),
+            method=request.query_params.get('method')
+        )
+    except ValueError as e:
+        return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    content_type = 'application/x-ndjson' if export_format == 'ndjson' else 'text/csv'
+    response = StreamingHttpResponse(iter_export(payments, export_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="payments-{datetime.now():%Y%m%d}.{export_format}"'
+    return response
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_payments(request):
+    """
+    Import a batch of payments from a bank or mobile-money statement.
+    Accepts a JSON body {"payments": [...]} or an uploaded CSV/JSON file
+    with shop_number, amount, payment_method and reference columns.
+    Returns a per-row report of created and rejected payments.
+    """
+    upload = request.FILES.get('file')
+    try:
+        if upload:
+            file_format = 'json' if upload.name.lower().endswith('.json') else 'csv'
+            rows = parse_statement(upload.read().decode('utf-8-sig'), file_format)
+        else:
+            rows = request.data.get('payments') if isinstance(request.data, dict) else request.data
+            if not isinstance(rows, list):
+                raise ValueError('Expected a list of payments')
+    except (ValueError, UnicodeDecodeError) as e:
+        return Response({'message': f'Could not read statement: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    report = import_statement(rows)
+    return Response({
+        'message': f"Imported {report['created']} payments, rejected {report['rejected']}",
+        **report
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def aging_report(request):
+    """
+    Receivables aging: arrears of occupied shops in 0-30/31-60/61-90/90+ day
+    buckets per floor and shop type. ?tenant=<id> narrows it to one tenant and
+    lists their shops; ?output=csv downloads the table.
+    """
+    tenant_id = request.query_params.get('tenant')
+    if tenant_id is not None:
+        try:
+            tenant_id = int(tenant_id)
+        except ValueError:
+            tenant_id = 0
+        if tenant_id < 1:
+            return Response({'message': 'Invalid tenant id'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    export_format = request.query_params.get('output', 'json')
+    if export_format not in ('json', 'csv'):
+        return Response({'message': 'Invalid output format'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    report = get_aging_report(tenant_id)
+    
+    if export_format == 'csv':
+        response = HttpResponse(''.join(iter_aging_csv(report)), content_type='text/csv')
+        suffix = f'-tenant-{tenant_id}' if tenant_id is not None else ''
+        response['Content-Disposition'] = f'attachment; filename="aging-{report["as_of"]}{suffix}.csv"'
+        return response
+    
+    return Response(report)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def revenue_series(request):
+    """
+    Completed payments per day, week or month between ?from= and ?to=
+    (YYYY-MM-DD, inclusive), with amount and count per payment method.
+    Read from the daily revenue rollup, so long ranges cost the same as
+    short ones.
+    """
+    granularity = request.query_params.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return Response({'message': 'Invalid granularity'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        end = request.query_params.get('to')
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else timezone.localdate()
+        start = request.query_params.get('from')
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else default_start(end, granularity)
+    except ValueError:
+        return Response({'message': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if start > end:
+        return Response({'message': 'from must not be after to'}, status=status.HTTP_400_BAD_REQUEST)
+    if count_periods(start, end, granularity) > MAX_POINTS[granularity]:
+        return Response({
+            'message': f'Range too long: at most {MAX_POINTS[granularity]} points per {granularity}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(build_revenue_series(granularity, start, end))
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def cash_flow_forecast(request):
+    """
+    Rent expected over the next ?months= months (default 12): what falls
+    due each month, and when it is likely to arrive given each tenant's
+    pay-delay history.
+    """
+    try:
+        months = int(request.query_params.get('months', 12))
+    except ValueError:
+        return Response({'message': 'months must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= months <= MAX_MONTHS:
+        return Response({'message': f'months must be between 1 and {MAX_MONTHS}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(build_forecast(months))
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def enhanced_analytics(request):
@@ -226,50 +405,43 @@ def enhanced_analytics(request):
     - Total collected this month
     - Total outstanding balance
     - Per-tenant breakdown
+
+    The breakdown is built from a fixed number of grouped queries so the
+    cost does not grow with the number of tenants.
     """
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    
-    # Get all occupied shops
-    occupied_shops = Shop.objects.filter(is_occupied=True).select_related('tenant')
-    
-    # Calculate totals
-    total_expected_monthly = occupied_shops.aggregate(
-        total=Sum('monthly_rent')
-    )['total'] or 0
+    # Totals over all occupied shops in a single aggregate
+    shop_totals = Shop.objects.filter(is_occupied=True).aggregate(
+        total_expected_monthly=Sum('monthly_rent'),
+        total_outstanding_balance=Sum('balance'),
+        total_occupied_shops=Count('id')
+    )
+    total_expected_monthly = shop_totals['total_expected_monthly'] or 0
+    total_outstanding_balance = shop_totals['total_outstanding_balance'] or 0
     
-    total_outstanding_balance = occupied_shops.aggregate(
-        total=Sum('balance')
-    )['total'] or 0
+    # Payments made this month, grouped per tenant from the monthly rollup
+    monthly_paid_by_tenant = dict(
+        MonthlyRevenue.objects.filter(
+            month=MonthlyRevenue.current_month()
+        ).order_by().values('tenant_id').annotate(
+            total=Sum('total_amount')
+        ).values_list('tenant_id', 'total')
+    )
+    monthly_collected = sum(monthly_paid_by_tenant.values()) or 0
     
-    # Get payments made this month
-    monthly_collected = Payment.objects.filter(
-        payment_date__month=current_month,
-        payment_date__year=current_year,
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Per-tenant rent, balance and shop count come from one GROUP BY,
+    # and the occupied shops themselves from one prefetch query
+    occupied = Q(shops__is_occupied=True)
+    tenants = User.objects.filter(user_type='tenant', is_staff=False, deleted_at__isnull=True).annotate(
+        total_monthly_rent=Sum('shops__monthly_rent', filter=occupied, default=0),
+        total_balance=Sum('shops__balance', filter=occupied, default=0),
+        shop_count=Count('shops', filter=occupied)
+    ).prefetch_related(
+        Prefetch('shops', queryset=Shop.objects.filter(is_occupied=True), to_attr='occupied_shops')
+    ).order_by('id')
     
     # Get tenant-wise breakdown
     tenant_breakdown = []
-    tenants = User.objects.filter(user_type='tenant', is_staff=False).prefetch_related('shops')
-    
     for tenant in tenants:
-        tenant_shops = tenant.shops.filter(is_occupied=True)
-        
-        # Calculate tenant's total monthly rent
-        tenant_monthly_rent = sum(shop.monthly_rent for shop in tenant_shops)
-        
-        # Calculate tenant's total balance
-        tenant_balance = sum(shop.balance for shop in tenant_shops)
-        
-        # Get tenant's payments this month
-        tenant_monthly_paid = Payment.objects.filter(
-            tenant=tenant,
-            payment_date__month=current_month,
-            payment_date__year=current_year,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
         # Get shop details for this tenant
         shops_detail = [
             {
@@ -280,7 +452,7 @@ def enhanced_analytics(request):
                 'next_due_date': shop.next_due_date.isoformat() if shop.next_due_date else None,
                 'payment_status': shop.get_payment_status()
             }
-            for shop in tenant_shops
+            for shop in tenant.occupied_shops
         ]
         
         tenant_breakdown.append({
@@ -288,10 +460,10 @@ def enhanced_analytics(request):
             'tenant_name': tenant.full_name,
             'email': tenant.email,
             'phone_number': tenant.phone_number,
-            'total_monthly_rent': float(tenant_monthly_rent),
-            'paid_this_month': float(tenant_monthly_paid),
-            'total_balance': float(tenant_balance),
-            'shop_count': tenant_shops.count(),
+            'total_monthly_rent': float(tenant.total_monthly_rent),
+            'paid_this_month': float(monthly_paid_by_tenant.get(tenant.id, 0)),
+            'total_balance': float(tenant.total_balance),
+            'shop_count': tenant.shop_count,
             'shops': shops_detail
         })
     
@@ -304,9 +476,18 @@ def enhanced_analytics(request):
             'total_collected_this_month': float(monthly_collected),
             'total_outstanding_balance': float(total_outstanding_balance),
             'collection_percentage': round((monthly_collected / total_expected_monthly * 100), 2) if total_expected_monthly > 0 else 0,
-            'total_tenants': tenants.count(),
-            'total_occupied_shops': occupied_shops.count()
+            'total_tenants': len(tenant_breakdown),
+            'total_occupied_shops': shop_totals['total_occupied_shops']
         },
         'tenant_breakdown': tenant_breakdown,
         'month': datetime.now().strftime('%B %Y')
-    })
\ No newline at end of file
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def request_metrics_view(request):
+    """
+    Per-view query counts, DB/render/total time percentiles and slowest
+    query recorded by QueryTimingMiddleware in this worker process
+    """
+    return Response({'views': request_metrics.summary()})
@@ -3,6 +3,10 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The async login/register endpoints (/api/auth/async/...) only free up the
+server while passwords hash when served through this module, e.g. with
+gunicorn -k uvicorn.workers.UvicornWorker backend.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,54 @@
+import threading
+from .metrics import CACHE_REQUESTS
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for one cache, kept per process"""
+
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+        CACHE_REQUESTS.inc(cache=self.name, result='hit')
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+        CACHE_REQUESTS.inc(cache=self.name, result='miss')
+
+    def snapshot(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None
+        }
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+def get_cache_stats(name):
+    """Return the counters registered under name, creating them on first use"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = CacheStats(name)
+        return _registry[name]
+
+
+def all_cache_stats():
+    with _registry_lock:
+        stats = list(_registry.values())
+    return {cache_stats.name: cache_stats.snapshot() for cache_stats in stats}
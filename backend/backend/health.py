@@ -0,0 +1,154 @@
+"""
+Readiness probing.
+
+Load balancers probe every worker often. /health/ready/ must stay cheap, so
+it only returns the latest result of a background prober. The prober
+checks the database (SELECT 1), unapplied migrations and the default cache
+every HEALTH_CHECK_INTERVAL seconds. A check fails when it errors or is
+slower than its latency threshold. The prober thread is started by the
+first readiness request in each worker, so it also works after gunicorn
+forks a preloaded app.
+"""
+import logging
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(check, threshold_ms):
+    """Run check() and report ok, latency and any error"""
+    started = time.perf_counter()
+    try:
+        detail = check()
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    result = {'ok': True, 'latency_ms': latency_ms}
+    if detail:
+        result.update(detail)
+    if threshold_ms is not None and latency_ms > threshold_ms:
+        result['ok'] = False
+        result['error'] = f'Slower than {threshold_ms} ms'
+    return result
+
+
+class ReadinessProber:
+
+    def __init__(self, interval, db_threshold_ms, cache_threshold_ms, cache_alias='default'):
+        self.interval = interval
+        self.db_threshold_ms = db_threshold_ms
+        self.cache_threshold_ms = cache_threshold_ms
+        self.cache_alias = cache_alias
+        self._result = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def check_database(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def check_migrations(self):
+        executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if plan:
+            pending = [f'{migration.app_label}.{migration.name}' for migration, _ in plan]
+            raise RuntimeError(f"Unapplied migrations: {', '.join(pending)}")
+
+    def check_cache(self):
+        cache = caches[self.cache_alias]
+        key = f'health:ready:{uuid.uuid4().hex}'
+        cache.set(key, 1, 10)
+        if cache.get(key) != 1:
+            raise RuntimeError('Cache did not return the value just written')
+        cache.delete(key)
+
+    def probe(self):
+        """Run every check now and keep the result"""
+        checks = {
+            'database': _timed(self.check_database, self.db_threshold_ms),
+            'migrations': _timed(self.check_migrations, None),
+            'cache': _timed(self.check_cache, self.cache_threshold_ms),
+        }
+        result = {
+            'ready': all(check['ok'] for check in checks.values()),
+            'checks': checks,
+            'checked_at': timezone.now().isoformat(),
+            'monotonic': time.monotonic(),
+        }
+        with self._lock:
+            previous, self._result = self._result, result
+        # Log changes of state only, not every probe
+        if previous is None or previous['ready'] != result['ready']:
+            if result['ready']:
+                logger.info('Readiness check passing')
+            else:
+                failing = {name: check.get('error') for name, check in checks.items() if not check['ok']}
+                logger.warning(f'Readiness check failing: {failing}')
+        return result
+
+    def result(self):
+        """Latest result, marked not ready if the prober has stopped updating it"""
+        with self._lock:
+            result = self._result
+        if result is None:
+            return None
+        age = time.monotonic() - result['monotonic']
+        if age > max(3 * self.interval, 1):
+            return {**result, 'ready': False, 'error': f'Last check ran {age:.0f}s ago'}
+        return result
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='readiness-prober', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                close_old_connections()
+                self.probe()
+                self._stopped.wait(self.interval)
+        finally:
+            # The prober thread has its own connection; don't leak it
+            connection.close()
+
+
+_prober = None
+_prober_lock = threading.Lock()
+
+
+def get_prober():
+    """This worker's prober, started on first use"""
+    global _prober
+    with _prober_lock:
+        if _prober is None:
+            _prober = ReadinessProber(
+                interval=settings.HEALTH_CHECK_INTERVAL,
+                db_threshold_ms=settings.HEALTH_DB_LATENCY_THRESHOLD_MS,
+                cache_threshold_ms=settings.HEALTH_CACHE_LATENCY_THRESHOLD_MS
+            )
+            _prober.start()
+        return _prober
+
+
+def stop_prober():
+    global _prober
+    with _prober_lock:
+        prober, _prober = _prober, None
+    if prober is not None:
+        prober.stop()
@@ -1,7 +1,10 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.db import connection
 from django.utils import timezone
 import logging
+from .cache_stats import all_cache_stats
+from .health import get_prober
+from .metrics import generate_latest
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +15,7 @@ def health_check(request):
         with connection.cursor() as cursor:
             cursor.execute("SELECT 1")
         
-        logger.info("Health check passed - system healthy")
+        logger.debug("Health check passed - system healthy")
         return JsonResponse({
             'status': 'healthy',
             'timestamp': timezone.now().isoformat(),
@@ -24,4 +27,34 @@ def health_check(request):
             'status': 'unhealthy',
             'error': str(e),
             'timestamp': timezone.now().isoformat()
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+def liveness(request):
+    """Liveness probe: the process is serving requests. Never touches the DB"""
+    return JsonResponse({'status': 'alive'})
+
+
+def readiness(request):
+    """Readiness probe: latest result of the background DB/migrations/cache checks"""
+    prober = get_prober()
+    result = prober.result()
+    if result is None:
+        # First probe in this worker, before the background thread reported
+        result = prober.probe()
+    body = {key: value for key, value in result.items() if key != 'monotonic'}
+    body['status'] = 'ready' if result['ready'] else 'not ready'
+    return JsonResponse(body, status=200 if result['ready'] else 503)
+
+
+def cache_stats(request):
+    """Hit/miss counters for the application caches in this worker"""
+    return JsonResponse({
+        'caches': all_cache_stats(),
+        'timestamp': timezone.now().isoformat()
+    })
+
+
+def metrics(request):
+    """Prometheus scrape endpoint (all workers when METRICS_MULTIPROC_DIR is set)"""
+    return HttpResponse(generate_latest(), content_type='text/plain; version=0.0.4; charset=utf-8')
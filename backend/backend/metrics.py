@@ -0,0 +1,357 @@
+"""
+Prometheus metrics.
+
+A small thread-safe registry of counters, gauges and histograms, rendered
+in the Prometheus text format at /metrics.
+
+Each gunicorn worker only sees its own requests. When METRICS_MULTIPROC_DIR
+is set, every worker writes its values to <dir>/<pid>-<random id>.json at
+most every METRICS_FLUSH_INTERVAL seconds, and /metrics merges the files of
+all workers:
+- counters and histograms are summed, including those of workers that
+  have exited, so totals never go backwards. The random id is drawn per
+  process, so a new worker that gets a dead worker's pid writes a file of
+  its own instead of overwriting the dead worker's counters;
+- gauges are reported per live worker with a pid label. When several files
+  share a pid, only the most recently written one is the live worker's.
+Empty the directory whenever the server is restarted (see
+gunicorn.conf.py).
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    def _copy(self, value):
+        return value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Values are [per-bucket counts, sum, count]; buckets are cumulated when rendered"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+
+class Registry:
+    """Metrics by name; declaring a metric twice returns the existing one"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, documentation, labelnames=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, metric_class) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f'Metric {name} is already registered differently')
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def snapshot(self):
+        """JSON-serialisable copy of every metric and its values"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        data = {}
+        for metric in metrics:
+            data[metric.name] = {
+                'type': metric.type,
+                'help': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', [])),
+                'values': [[list(key), value] for key, value in metric.snapshot().items()],
+            }
+        return data
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+def merge_snapshots(snapshots):
+    """
+    Combine (pid, alive, snapshot) triples from several processes into one
+    snapshot: counters and histograms summed, gauges kept per live pid
+    """
+    merged = {}
+    for pid, alive, snapshot in snapshots:
+        for name, family in snapshot.items():
+            is_gauge = family['type'] == 'gauge'
+            if is_gauge and not alive:
+                continue
+            target = merged.setdefault(name, {
+                **family,
+                'labelnames': family['labelnames'] + (['pid'] if is_gauge else []),
+                'values': {},
+            })
+            for key, value in family['values']:
+                key = tuple(key) + ((str(pid),) if is_gauge else ())
+                existing = target['values'].get(key)
+                if existing is None or is_gauge:
+                    target['values'][key] = value
+                elif family['type'] == 'histogram':
+                    target['values'][key] = [
+                        [a + b for a, b in zip(existing[0], value[0])],
+                        existing[1] + value[1],
+                        existing[2] + value[2]
+                    ]
+                else:
+                    target['values'][key] = existing + value
+    for family in merged.values():
+        family['values'] = [[list(key), value] for key, value in family['values'].items()]
+    return merged
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def render(snapshot):
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name in sorted(snapshot):
+        family = snapshot[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for key, value in sorted(family['values']):
+            if family['type'] == 'histogram':
+                bucket_counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(family['buckets'], bucket_counts):
+                    cumulative += bucket_count
+                    labels = _labels(family['labelnames'], key, [('le', _number(bound))])
+                    lines.append(f'{name}_bucket{labels} {_number(cumulative)}')
+                labels = _labels(family['labelnames'], key, [('le', '+Inf')])
+                lines.append(f'{name}_bucket{labels} {_number(count)}')
+                lines.append(f"{name}_sum{_labels(family['labelnames'], key)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(family['labelnames'], key)} {_number(count)}")
+            else:
+                lines.append(f"{name}{_labels(family['labelnames'], key)} {_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by view, method and status',
+    ['view', 'method', 'status']
+)
+DB_QUERIES = registry.counter('db_queries_total', 'Database queries run, by view', ['view'])
+DB_QUERY_TIME = registry.counter('db_query_duration_seconds_total', 'Time spent in database queries, by view', ['view'])
+DB_CONNECTION_AGE = registry.gauge(
+    'db_connection_age_seconds', 'Age of the database connection that served the last request', ['alias']
+)
+CACHE_REQUESTS = registry.counter('cache_requests_total', 'Application cache lookups, by cache and result', ['cache', 'result'])
+
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def _new_process_file():
+    global _process_file
+    _process_file = f'{os.getpid()}-{uuid.uuid4().hex[:12]}.json'
+
+
+_new_process_file()
+# Workers forked from a master that imported this module get their own file
+os.register_at_fork(after_in_child=_new_process_file)
+
+
+def flush(force=False):
+    """Write this process's values to the shared directory, if one is configured"""
+    global _last_flush
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return
+    now = time.monotonic()
+    with _flush_lock:
+        if not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        _last_flush = now
+        path = os.path.join(directory, _process_file)
+        try:
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(registry.snapshot(), f)
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            logger.warning(f'Could not write metrics to {path}: {e}')
+
+
+def collect():
+    """Snapshot of this process, or of every worker when running multi-process"""
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return merge_snapshots([(os.getpid(), True, registry.snapshot())])
+
+    flush(force=True)
+    files = []
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            files.append((int(filename.split('-', 1)[0].removesuffix('.json')), os.path.getmtime(path), path))
+        except (OSError, ValueError) as e:
+            logger.warning(f'Skipping metrics file {filename}: {e}')
+
+    # A reused pid is only alive for the newest of its files
+    newest = {}
+    for pid, modified, path in files:
+        if pid not in newest or modified > newest[pid][0]:
+            newest[pid] = (modified, path)
+
+    snapshots = []
+    for pid, modified, path in files:
+        try:
+            with open(path) as f:
+                snapshots.append((pid, newest[pid][1] == path and _pid_alive(pid), json.load(f)))
+        except (OSError, ValueError) as e:
+            logger.warning(f'Skipping unreadable metrics file {path}: {e}')
+    return merge_snapshots(snapshots)
+
+
+def add_cache_hit_ratio(snapshot):
+    """Derive cache_hit_ratio{cache} from the merged cache_requests_total counters"""
+    family = snapshot.get(CACHE_REQUESTS.name)
+    if not family:
+        return snapshot
+    totals = {}
+    for (cache, result), value in family['values']:
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (value if result == 'hit' else 0), lookups + value)
+    snapshot['cache_hit_ratio'] = {
+        'type': 'gauge',
+        'help': 'Share of application cache lookups that were hits',
+        'labelnames': ['cache'],
+        'buckets': [],
+        'values': [[[cache], hits / lookups] for cache, (hits, lookups) in totals.items() if lookups],
+    }
+    return snapshot
+
+
+def generate_latest():
+    return render(add_cache_hit_ratio(collect()))
+
+
+def observe_request(view, method, status, duration, query_count, db_time):
+    REQUEST_LATENCY.observe(duration, view=view, method=method, status=status)
+    DB_QUERIES.inc(query_count, view=view)
+    DB_QUERY_TIME.inc(db_time, view=view)
+
+
+def observe_connection(connection):
+    connected_at = getattr(connection, '_metrics_connected_at', None)
+    if connection.connection is not None and connected_at is not None:
+        DB_CONNECTION_AGE.set(time.monotonic() - connected_at, alias=connection.alias)
+
+
+def _connection_created(sender, connection, **kwargs):
+    connection._metrics_connected_at = time.monotonic()
+
+
+connection_created.connect(_connection_created)
+atexit.register(flush, force=True)
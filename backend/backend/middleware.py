@@ -0,0 +1,173 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from . import metrics
+from .request_metrics import request_metrics
+
+
+class QueryTracker:
+    """execute_wrapper that counts and times the queries of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_sql = None
+        self.slowest_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.total_time += elapsed
+            if elapsed > self.slowest_time:
+                self.slowest_time = elapsed
+                self.slowest_sql = sql
+
+
+class QueryTimingMiddleware:
+    """
+    Record query count, DB time, render time and the slowest query of every
+    request, add them as a Server-Timing header, and aggregate them per view
+    in backend.request_metrics and the Prometheus registry in backend.metrics. Uses a connection execute wrapper rather
+    than DEBUG query logging, so it is cheap enough to leave on. Runs in
+    sync or async mode to match the handler, so an ASGI deployment keeps a
+    fully async middleware chain.
+
+    Streaming responses (the payment export) run most of their queries while
+    the body is iterated, after this middleware has returned. Their content
+    is wrapped so the queries are still tracked and the request is recorded
+    once the stream is exhausted or closed. Their headers are sent before
+    that, so they get no Server-Timing header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REQUEST_METRICS_ENABLED:
+            return self.get_response(request)
+
+        tracker = QueryTracker()
+        request._render_time = 0.0
+        started = time.perf_counter()
+        with connection.execute_wrapper(tracker):
+            response = self.get_response(request)
+        if response.streaming:
+            return self.time_stream(request, response, tracker, started)
+        duration = time.perf_counter() - started
+        self.record(request, response, tracker, duration)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return await self.get_response(request)
+
+        tracker = QueryTracker()
+        request._render_time = 0.0
+        # Connections are per thread: the ORM, even when called from async
+        # code, runs in the request's thread-sensitive worker thread, so the
+        # wrapper is installed on that thread's connection
+        await sync_to_async(self.add_wrapper)(tracker)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration = time.perf_counter() - started
+            await sync_to_async(self.remove_wrapper)(tracker)
+        if response.streaming:
+            return self.time_stream(request, response, tracker, started)
+        await sync_to_async(self.record)(request, response, tracker, duration)
+        return response
+
+    def time_stream(self, request, response, tracker, started):
+        """Track the queries run while the body streams; record when it ends"""
+        content = response.streaming_content
+
+        def stream():
+            try:
+                with connection.execute_wrapper(tracker):
+                    yield from content
+            finally:
+                self.record(request, response, tracker, time.perf_counter() - started)
+
+        async def astream():
+            try:
+                await sync_to_async(self.add_wrapper)(tracker)
+                try:
+                    async for chunk in content:
+                        yield chunk
+                finally:
+                    await sync_to_async(self.remove_wrapper)(tracker)
+            finally:
+                await sync_to_async(self.record)(request, response, tracker, time.perf_counter() - started)
+
+        # A sync body is iterated in one thread (under ASGI, the
+        # thread-sensitive worker), so the wrapper goes on that thread's
+        # connection from inside the generator
+        response.streaming_content = astream() if response.is_async else stream()
+        return response
+
+    # Called through sync_to_async, so `connection` is the worker thread's
+    def add_wrapper(self, tracker):
+        connection.execute_wrappers.append(tracker)
+
+    def remove_wrapper(self, tracker):
+        connection.execute_wrappers.remove(tracker)
+
+    def record(self, request, response, tracker, duration):
+        """Add the Server-Timing header and record the request's metrics"""
+        if not response.streaming:
+            response['Server-Timing'] = (
+                f'db;dur={tracker.total_time * 1000:.1f};desc="{tracker.count} queries", '
+                f'render;dur={request._render_time * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+
+        match = getattr(request, 'resolver_match', None)
+        metrics.observe_request(
+            match.view_name if match is not None else 'unmatched',
+            request.method,
+            response.status_code,
+            duration,
+            tracker.count,
+            tracker.total_time
+        )
+        metrics.observe_connection(connection)
+        metrics.flush()
+
+        if match is not None:
+            request_metrics.record(
+                match.view_name,
+                duration=duration,
+                query_count=tracker.count,
+                db_time=tracker.total_time,
+                render_time=request._render_time,
+                slowest_query=tracker.slowest_sql,
+                slowest_query_time=tracker.slowest_time
+            )
+
+    def process_template_response(self, request, response):
+        # DRF Responses are rendered (serialized to JSON) after the view
+        # returns; time that step separately from the view itself
+        render = response.render
+
+        def timed_render():
+            started = time.perf_counter()
+            try:
+                return render()
+            finally:
+                request._render_time = getattr(request, '_render_time', 0.0) + time.perf_counter() - started
+
+        response.render = timed_render
+        return response
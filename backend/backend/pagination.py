@@ -0,0 +1,110 @@
+import base64
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.settings import api_settings
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+class KeysetPagination:
+    """
+    Cursor (keyset) pagination for function views.
+
+    Pages are selected with a WHERE clause on the ordering columns of the
+    last row seen instead of an OFFSET, so a deep page costs the same as the
+    first one. The last ordering field must be unique (usually the primary
+    key) and none of the fields may be NULL.
+    """
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def __init__(self, ordering, page_size=None, max_page_size=None):
+        self.ordering = tuple(ordering)
+        if page_size is not None:
+            self.page_size = page_size
+        if max_page_size is not None:
+            self.max_page_size = max_page_size
+        self.next_cursor = None
+
+    def get_page_size(self, request):
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def encode_cursor(self, obj):
+        values = [str(getattr(obj, field.lstrip('-'))) for field in self.ordering]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def get_ordering_fields(self, queryset):
+        """Model field (or annotation output field) behind each ordering column"""
+        fields = []
+        for name in self.ordering:
+            name = name.lstrip('-')
+            try:
+                fields.append(queryset.model._meta.get_field(name))
+            except FieldDoesNotExist:
+                fields.append(queryset.query.annotations[name].output_field)
+        return fields
+
+    def decode_cursor(self, cursor, fields):
+        """
+        The cursor's values converted with each ordering field's to_python,
+        so a tampered cursor is rejected here instead of failing in the query
+        """
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise InvalidCursor('Invalid cursor')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor('Invalid cursor')
+        if not all(isinstance(value, str) for value in values):
+            raise InvalidCursor('Invalid cursor')
+        try:
+            values = [field.to_python(value) for field, value in zip(fields, values)]
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor('Invalid cursor')
+        if None in values:
+            raise InvalidCursor('Invalid cursor')
+        return values
+
+    def get_keyset_filter(self, values):
+        """
+        Rows strictly after the cursor in the current ordering, e.g. for
+        ('-payment_date', '-id'): date < d OR (date = d AND id < i).
+        The leading inclusive bound lets the database use a range scan.
+        """
+        first = self.ordering[0]
+        condition = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]})
+
+        after = Q()
+        for index, field in enumerate(self.ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{field.lstrip("-")}__{lookup}': values[index]})
+            for previous, value in zip(self.ordering[:index], values[:index]):
+                step &= Q(**{previous.lstrip('-'): value})
+            after |= step
+        return condition & after
+
+    def paginate_queryset(self, queryset, request):
+        """Return one page of results and remember the cursor for the next one"""
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = self.decode_cursor(cursor, self.get_ordering_fields(queryset))
+            queryset = queryset.filter(self.get_keyset_filter(values))
+
+        # Fetch one extra row to find out whether there is a next page
+        results = list(queryset[:page_size + 1])
+        has_next = len(results) > page_size
+        results = results[:page_size]
+        self.next_cursor = self.encode_cursor(results[-1]) if has_next else None
+        return results
@@ -0,0 +1,97 @@
+"""
+In-memory per-view request metrics.
+
+QueryTimingMiddleware records one sample per request (total time, query
+count, DB time, render time, slowest query) under the resolved view name.
+Each view keeps its most recent samples in a bounded reservoir, so memory
+stays fixed and percentiles reflect recent traffic. Kept per process.
+"""
+import threading
+from collections import deque
+from django.conf import settings
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class ViewMetrics:
+    """Counters and recent samples for one view"""
+
+    def __init__(self, sample_size):
+        self.requests = 0
+        self.queries = 0
+        self.durations = deque(maxlen=sample_size)
+        self.query_counts = deque(maxlen=sample_size)
+        self.db_times = deque(maxlen=sample_size)
+        self.render_times = deque(maxlen=sample_size)
+        self.slowest_query = None
+        self.slowest_query_time = 0.0
+
+    def add(self, duration, query_count, db_time, render_time, slowest_query, slowest_query_time):
+        self.requests += 1
+        self.queries += query_count
+        self.durations.append(duration)
+        self.query_counts.append(query_count)
+        self.db_times.append(db_time)
+        self.render_times.append(render_time)
+        if slowest_query and slowest_query_time > self.slowest_query_time:
+            self.slowest_query = slowest_query
+            self.slowest_query_time = slowest_query_time
+
+    def summary(self):
+        def distribution(values, scale=1):
+            return {
+                name: round(value * scale, 3) if value is not None else None
+                for name, value in (
+                    ('p50', percentile(values, 0.5)),
+                    ('p95', percentile(values, 0.95)),
+                    ('p99', percentile(values, 0.99)),
+                    ('max', max(values) if values else None),
+                )
+            }
+
+        return {
+            'requests': self.requests,
+            'queries': self.queries,
+            'duration_ms': distribution(self.durations, 1000),
+            'db_time_ms': distribution(self.db_times, 1000),
+            'render_time_ms': distribution(self.render_times, 1000),
+            'query_count': distribution(self.query_counts),
+            'slowest_query': {
+                'sql': self.slowest_query,
+                'duration_ms': round(self.slowest_query_time * 1000, 3)
+            } if self.slowest_query else None
+        }
+
+
+class RequestMetrics:
+    """Thread-safe registry of ViewMetrics keyed by view name"""
+
+    def __init__(self, sample_size=None):
+        self.sample_size = sample_size
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view_name, **sample):
+        with self._lock:
+            metrics = self._views.get(view_name)
+            if metrics is None:
+                metrics = self._views[view_name] = ViewMetrics(
+                    self.sample_size or settings.REQUEST_METRICS_SAMPLE_SIZE
+                )
+            metrics.add(**sample)
+
+    def summary(self):
+        with self._lock:
+            return {name: metrics.summary() for name, metrics in sorted(self._views.items())}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+request_metrics = RequestMetrics()
@@ -51,18 +51,21 @@ DJANGO_APPS = [
 
 THIRD_PARTY_APPS = [
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
 ]
 
 LOCAL_APPS = [
     'user_accounts',
     'shops',
-    'admin_dashboard'
+    'admin_dashboard',
+    'jobs',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'backend.middleware.QueryTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -131,7 +134,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'user_accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -143,6 +146,85 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cache (local memory per worker by default; set CACHE_BACKEND to
+# django.core.cache.backends.filebased.FileBasedCache to share across workers)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='mall-rent-cache'),
+    }
+}
+
+# Token -> user cache for CachedTokenAuthentication. Leave the alias empty for
+# a bounded in-process LRU, or name one of CACHES to share it between workers.
+# Logout and deactivation only clear the cache of the process that handled
+# them, so with the in-process LRU another worker keeps accepting a revoked
+# token until its entry expires: keep that TTL to a few seconds, which still
+# spares the lookup for bursts of requests. A shared cache is cleared for
+# every worker and can keep entries longer.
+TOKEN_AUTH_CACHE_ALIAS = config('TOKEN_AUTH_CACHE_ALIAS', default='')
+TOKEN_AUTH_CACHE_SIZE = config('TOKEN_AUTH_CACHE_SIZE', default=10000, cast=int)
+TOKEN_AUTH_CACHE_TTL = config('TOKEN_AUTH_CACHE_TTL', default=300 if TOKEN_AUTH_CACHE_ALIAS else 5, cast=int)
+
+# Worker pool for password hashing in the async login/register views
+# (0 workers means one per CPU); requests beyond workers + queue limit get 503
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=0, cast=int)
+PASSWORD_HASHING_QUEUE_LIMIT = config('PASSWORD_HASHING_QUEUE_LIMIT', default=32, cast=int)
+
+# Per-view query count/timing metrics (Server-Timing header and
+# /api/admin/request-metrics/); samples kept per view for percentiles
+REQUEST_METRICS_ENABLED = config('REQUEST_METRICS_ENABLED', default=True, cast=bool)
+REQUEST_METRICS_SAMPLE_SIZE = config('REQUEST_METRICS_SAMPLE_SIZE', default=1000, cast=int)
+
+# /health/ready/ background checks: seconds between probes, and the slowest
+# database round trip / cache set+get that still counts as ready
+HEALTH_CHECK_INTERVAL = config('HEALTH_CHECK_INTERVAL', default=5.0, cast=float)
+HEALTH_DB_LATENCY_THRESHOLD_MS = config('HEALTH_DB_LATENCY_THRESHOLD_MS', default=500, cast=float)
+HEALTH_CACHE_LATENCY_THRESHOLD_MS = config('HEALTH_CACHE_LATENCY_THRESHOLD_MS', default=200, cast=float)
+
+# Prometheus /metrics. Under gunicorn with several workers point this at an
+# empty directory shared by the workers so /metrics reports all of them
+METRICS_MULTIPROC_DIR = config('METRICS_MULTIPROC_DIR', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=1.0, cast=float)
+
+# Background jobs (python manage.py run_workers): worker threads per
+# process, idle poll interval, attempts per job, base retry delay in seconds
+# (doubled after each failure) and how long a job may run before another
+# worker assumes its worker died and takes it over
+JOB_WORKER_CONCURRENCY = config('JOB_WORKER_CONCURRENCY', default=4, cast=int)
+JOB_POLL_INTERVAL = config('JOB_POLL_INTERVAL', default=1.0, cast=float)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=3, cast=int)
+JOB_RETRY_BACKOFF = config('JOB_RETRY_BACKOFF', default=10, cast=int)
+JOB_LEASE_SECONDS = config('JOB_LEASE_SECONDS', default=600, cast=int)
+
+# Payments of a removed tenant moved to the archive per job (each batch is
+# one short transaction)
+PAYMENT_ARCHIVE_BATCH_SIZE = config('PAYMENT_ARCHIVE_BATCH_SIZE', default=1000, cast=int)
+
+# Seconds the public available-shops listing may be served from cache
+AVAILABLE_SHOPS_CACHE_TIMEOUT = config('AVAILABLE_SHOPS_CACHE_TIMEOUT', default=300, cast=int)
+
+# Upper bound in seconds on how long a cached aging report is served; reports
+# are also dropped at midnight and whenever a shop or payment changes
+AGING_REPORT_CACHE_TIMEOUT = config('AGING_REPORT_CACHE_TIMEOUT', default=300, cast=int)
+
+# Seconds the tenants' pay-delay histogram behind the cash-flow forecast is
+# reused before it is recomputed from the payment history
+FORECAST_DELAY_CACHE_TIMEOUT = config('FORECAST_DELAY_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Default page size for the keyset-paginated tenant payment history
+# (clients may ask for up to 200 rows with ?page_size=)
+PAYMENT_HISTORY_PAGE_SIZE = config('PAYMENT_HISTORY_PAGE_SIZE', default=50, cast=int)
+
+# Default page size for /api/shops/overdue/ (up to 500 with ?page_size=)
+OVERDUE_SHOPS_PAGE_SIZE = config('OVERDUE_SHOPS_PAGE_SIZE', default=100, cast=int)
+
+# Most tenants accepted by one /api/admin/register-tenants/ batch
+TENANT_BATCH_LIMIT = config('TENANT_BATCH_LIMIT', default=1000, cast=int)
+
+# Default page size for the cursor-paginated admin tenant list
+TENANT_LIST_PAGE_SIZE = config('TENANT_LIST_PAGE_SIZE', default=100, cast=int)
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
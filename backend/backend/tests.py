@@ -0,0 +1,45 @@
+from django.test import TestCase
+from .health import ReadinessProber, stop_prober
+
+
+class HealthProbeTests(TestCase):
+    """Test suite for the liveness and readiness probes"""
+
+    def setUp(self):
+        stop_prober()
+        self.addCleanup(stop_prober)
+
+    def test_liveness_skips_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/health/live/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'alive')
+
+    def test_readiness(self):
+        response = self.client.get('/health/ready/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'ready')
+        self.assertEqual(set(data['checks']), {'database', 'migrations', 'cache'})
+        self.assertTrue(all(check['ok'] for check in data['checks'].values()))
+
+    def test_readiness_is_served_from_cache(self):
+        self.client.get('/health/ready/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/health/ready/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_slow_database_is_not_ready(self):
+        with self.settings(HEALTH_DB_LATENCY_THRESHOLD_MS=-1):
+            response = self.client.get('/health/ready/')
+        self.assertEqual(response.status_code, 503)
+        data = response.json()
+        self.assertEqual(data['status'], 'not ready')
+        self.assertFalse(data['checks']['database']['ok'])
+        self.assertTrue(data['checks']['cache']['ok'])
+
+    def test_stale_result_is_not_ready(self):
+        prober = ReadinessProber(interval=1, db_threshold_ms=None, cache_threshold_ms=None)
+        self.assertTrue(prober.probe()['ready'])
+        prober._result['monotonic'] -= 60
+        self.assertFalse(prober.result()['ready'])
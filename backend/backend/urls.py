@@ -24,8 +24,13 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('user_accounts.urls')),
     path('health/', health_views.health_check, name='health_check'),
+    path('health/live/', health_views.liveness, name='liveness'),
+    path('health/ready/', health_views.readiness, name='readiness'),
+    path('health/cache/', health_views.cache_stats, name='cache_stats'),
+    path('metrics', health_views.metrics, name='metrics'),
     path('api/admin/', include('admin_dashboard.urls')),
     path('api/shops/', include('shops.urls')),
+    path('api/jobs/', include('jobs.urls')),
 ]
 
 # Serve media files in development
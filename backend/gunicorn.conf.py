@@ -0,0 +1,20 @@
+"""
+gunicorn settings, picked up automatically when gunicorn is started from
+this directory.
+
+With METRICS_MULTIPROC_DIR set, workers share their /metrics values through
+that directory; it is emptied when the server starts so totals from an
+earlier run are not added to this one.
+"""
+import os
+from decouple import config
+
+
+def on_starting(server):
+    directory = config('METRICS_MULTIPROC_DIR', default='')
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for filename in os.listdir(directory):
+        if filename.endswith(('.json', '.json.tmp')):
+            os.remove(os.path.join(directory, filename))
@@ -0,0 +1,52 @@
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from jobs.queue import WorkerPool, registered_tasks, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help='Jobs run at the same time, one thread each'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help='Seconds an idle worker waits before looking for new jobs'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Run the jobs that are due now, then exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['burst']:
+            ran = run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs'))
+            return
+
+        pool = WorkerPool(options['concurrency'], options['poll_interval'])
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            stopping.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write(
+            f"Starting {options['concurrency']} workers for tasks: {', '.join(registered_tasks())}"
+        )
+        pool.start()
+        stopping.wait()
+        self.stdout.write('Stopping; waiting for running jobs to finish')
+        pool.stop()
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
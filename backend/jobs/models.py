@@ -0,0 +1,50 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by the run_workers command.
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number
+    of workers can poll the table without handing the same job out twice.
+    """
+    
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Not picked up before this time; pushed back after each failed attempt
+    run_after = models.DateTimeField()
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # Worker holding the job and when it took it; a job still running
+    # JOB_LEASE_SECONDS later is assumed lost with its worker and handed out again
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Job {self.id} {self.name} - {self.status}"
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The claim query: due queued jobs, oldest first
+            models.Index(fields=['run_after', 'id'], condition=models.Q(status='queued'), name='job_queued_run_after_idx'),
+            models.Index(fields=['locked_at'], condition=models.Q(status='running'), name='job_running_locked_at_idx'),
+        ]
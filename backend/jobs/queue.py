@@ -0,0 +1,252 @@
+"""
+Database-backed job queue.
+
+Tasks are plain functions registered with @task('name') in an app's
+tasks.py. enqueue() adds a Job row in the caller's transaction, so a job
+only becomes visible to workers once the request that queued it commits.
+
+Workers (the run_workers command) claim one due job at a time with
+SELECT ... FOR UPDATE SKIP LOCKED: concurrent workers skip rows another
+worker is claiming instead of waiting on them. The claim is committed
+before the task runs, and the task runs in its own transaction, so a
+failing task leaves nothing half-done. A failed attempt is retried after
+JOB_RETRY_BACKOFF * 2**(attempts - 1) seconds until max_attempts is
+reached; raise PermanentJobError to fail at once.
+
+While a task runs, a heartbeat renews the job's lease every third of
+JOB_LEASE_SECONDS. Only a job whose worker died stops being renewed and is
+handed to another worker, so tasks may still run twice after a crash and
+must be safe to repeat.
+
+Results can carry one-time values such as temporary passwords: name their
+keys in @task(one_time_keys=...) and take_result() hands them out once,
+then blanks them in the stored result.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a task when retrying cannot help, e.g. its input is invalid"""
+
+
+def task(name, max_attempts=None, one_time_keys=()):
+    """
+    Register the decorated function as the task `name`; it receives the
+    job's payload. Values under one_time_keys, anywhere in the result, are
+    only shown to the first reader.
+    """
+    def register(function):
+        if name in _tasks and _tasks[name][0] is not function:
+            raise ValueError(f'Task {name} is already registered')
+        _tasks[name] = (function, max_attempts, frozenset(one_time_keys))
+        return function
+    return register
+
+
+def registered_tasks():
+    return sorted(_tasks)
+
+
+def enqueue(name, payload=None, max_attempts=None, delay=0):
+    """Queue a run of task `name`; the payload must be JSON-serialisable"""
+    if name not in _tasks:
+        raise ValueError(f'Unknown task {name}')
+    default_attempts = _tasks[name][1] or settings.JOB_MAX_ATTEMPTS
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        max_attempts=max_attempts or default_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay)
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim(worker):
+    """
+    Take the oldest due job, or a running job whose lease ran out; None if
+    there is none. A job whose lease ran out on its last attempt most likely
+    killed its worker, so it is failed rather than run again.
+    """
+    while True:
+        now = timezone.now()
+        lease_expired = now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        with transaction.atomic():
+            job = Job.objects.select_for_update(skip_locked=True).filter(
+                Q(status=Job.QUEUED, run_after__lte=now) | Q(status=Job.RUNNING, locked_at__lt=lease_expired)
+            ).order_by('run_after', 'id').first()
+            if job is None:
+                return None
+            if job.status == Job.RUNNING and job.attempts >= job.max_attempts:
+                job.status = Job.FAILED
+                job.error = f'Lease expired on attempt {job.attempts} of {job.max_attempts}; the worker was lost'
+                job.locked_by = ''
+                job.locked_at = None
+                job.finished_at = now
+                job.save(update_fields=['status', 'error', 'locked_by', 'locked_at', 'finished_at'])
+                logger.error(f'Job {job.id} {job.name} failed: {job.error}')
+                continue
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.locked_by = worker
+            job.locked_at = now
+            job.started_at = job.started_at or now
+            job.save(update_fields=['status', 'attempts', 'locked_by', 'locked_at', 'started_at'])
+        return job
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome"""
+    entry = _tasks.get(job.name)
+    try:
+        if entry is None:
+            raise PermanentJobError(f'Unknown task {job.name}')
+        with _Heartbeat(job), transaction.atomic():
+            result = entry[0](job.payload)
+    except Exception as e:
+        retry = not isinstance(e, PermanentJobError) and job.attempts < job.max_attempts
+        job.error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        job.locked_by = ''
+        job.locked_at = None
+        if retry:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            )
+            logger.warning(f'Job {job.id} {job.name} failed, attempt {job.attempts} of {job.max_attempts}: {job.error}')
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+            logger.error(f'Job {job.id} {job.name} failed: {job.error}')
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.error = ''
+        job.locked_by = ''
+        job.locked_at = None
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'locked_by', 'locked_at', 'run_after', 'finished_at'])
+    return job
+
+
+class _Heartbeat:
+    """Renews a running job's lease from a side thread until the task returns"""
+
+    def __init__(self, job):
+        self.job = job
+        self.interval = settings.JOB_LEASE_SECONDS / 3
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'job-heartbeat-{job.id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                Job.objects.filter(
+                    id=self.job.id, status=Job.RUNNING, locked_by=self.job.locked_by
+                ).update(locked_at=timezone.now())
+        except Exception:
+            logger.exception(f'Could not renew the lease of job {self.job.id}')
+        finally:
+            # The heartbeat has its own connection; don't leak it
+            connection.close()
+
+
+def _redact(value, keys):
+    if isinstance(value, dict):
+        return {key: None if key in keys else _redact(item, keys) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item, keys) for item in value]
+    return value
+
+
+def take_result(job_id):
+    """
+    The job, with its result as stored; one-time values are then blanked
+    in the database so later reads do not see them. None if there is no
+    such job.
+    """
+    with transaction.atomic():
+        job = Job.objects.select_for_update().filter(id=job_id).first()
+        if job is None:
+            return None
+        keys = _tasks[job.name][2] if job.name in _tasks else frozenset()
+        if job.status == Job.SUCCEEDED and keys and job.result is not None:
+            redacted = _redact(job.result, keys)
+            if redacted != job.result:
+                Job.objects.filter(id=job.id).update(result=redacted)
+    return job
+
+
+def run_pending(worker=None, limit=None):
+    """Claim and run due jobs until none are left (or `limit` have run); returns how many ran"""
+    worker = worker or worker_name()
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        run_job(job)
+        ran += 1
+    return ran
+
+
+class WorkerPool:
+    """`concurrency` threads, each polling for jobs every `poll_interval` seconds until stopped"""
+
+    def __init__(self, concurrency, poll_interval):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.concurrency):
+            thread = threading.Thread(target=self._run, name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop taking new jobs and wait for the running ones to finish"""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        worker = worker_name()
+        try:
+            while not self._stopped.is_set():
+                close_old_connections()
+                try:
+                    ran = run_pending(worker, limit=1)
+                except Exception:
+                    # Database unavailable or similar; back off and try again
+                    logger.exception('Job worker could not claim a job')
+                    ran = 0
+                if not ran:
+                    self._stopped.wait(self.poll_interval)
+        finally:
+            connection.close()
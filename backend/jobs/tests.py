@@ -0,0 +1,233 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import skipUnless
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .models import Job
+from .queue import PermanentJobError, WorkerPool, claim, enqueue, run_pending, task
+
+calls = []
+calls_lock = threading.Lock()
+
+
+@task('tests.add')
+def add(payload):
+    with calls_lock:
+        calls.append(payload)
+    return {'sum': payload['a'] + payload['b']}
+
+
+@task('tests.flaky')
+def flaky(payload):
+    # Fails until it has been attempted payload['failures'] times
+    job = Job.objects.get(id=payload['job_id'])
+    if job.attempts <= payload['failures']:
+        raise RuntimeError(f'attempt {job.attempts} failed')
+    return {'attempts': job.attempts}
+
+
+@task('tests.secret', one_time_keys=('secret',))
+def secret(payload):
+    return {'items': [{'name': 'a', 'secret': 's3cret'}]}
+
+
+@task('tests.slow')
+def slow(payload):
+    # Sees the heartbeat's commits: the claim's locked_at, then a renewed one
+    job = Job.objects.get(id=payload['job_id'])
+    time.sleep(payload['seconds'])
+    return {'renewed': Job.objects.get(id=job.id).locked_at > job.locked_at}
+
+
+@task('tests.invalid')
+def invalid(payload):
+    raise PermanentJobError('Bad input')
+
+
+class JobQueueTests(TestCase):
+    """Test suite for the database job queue"""
+
+    def setUp(self):
+        calls.clear()
+
+    def make_due(self, job):
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+
+    def test_runs_queued_job(self):
+        job = enqueue('tests.add', {'a': 2, 'b': 3})
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {'sum': 5})
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(run_pending(), 0)
+
+    def test_unknown_task_is_rejected(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+
+    def test_failed_attempts_are_retried_with_backoff(self):
+        job = enqueue('tests.flaky', max_attempts=3)
+        job.payload = {'job_id': job.id, 'failures': 2}
+        job.save()
+
+        with self.settings(JOB_RETRY_BACKOFF=10):
+            run_pending()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+            self.assertIn('attempt 1 failed', job.error)
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+            # Not due yet
+            self.assertEqual(run_pending(), 0)
+
+            self.make_due(job)
+            run_pending()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.QUEUED, 2))
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=15))
+
+            self.make_due(job)
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.SUCCEEDED, 3))
+        self.assertEqual(job.result, {'attempts': 3})
+
+    def test_gives_up_after_max_attempts(self):
+        job = enqueue('tests.flaky', max_attempts=2)
+        job.payload = {'job_id': job.id, 'failures': 5}
+        job.save()
+        run_pending()
+        self.make_due(job)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_permanent_error_is_not_retried(self):
+        job = enqueue('tests.invalid')
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertIn('Bad input', job.error)
+
+    def test_expired_lease_is_reclaimed(self):
+        job = enqueue('tests.add', {'a': 1, 'b': 1})
+        self.assertEqual(claim('dead-worker').id, job.id)
+        self.assertIsNone(claim('other-worker'))
+
+        with self.settings(JOB_LEASE_SECONDS=60):
+            Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(seconds=61))
+            reclaimed = claim('other-worker')
+        self.assertEqual(reclaimed.id, job.id)
+        self.assertEqual((reclaimed.locked_by, reclaimed.attempts), ('other-worker', 2))
+
+    def test_expired_lease_on_last_attempt_fails_the_job(self):
+        job = enqueue('tests.add', {'a': 1, 'b': 1}, max_attempts=2)
+        later = enqueue('tests.add', {'a': 2, 'b': 2})
+        Job.objects.filter(id=job.id).update(status=Job.RUNNING, attempts=2, locked_by='dead-worker')
+
+        with self.settings(JOB_LEASE_SECONDS=60):
+            Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(seconds=61))
+            claimed = claim('other-worker')
+        self.assertEqual(claimed.id, later.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.FAILED, 2, ''))
+        self.assertIn('Lease expired', job.error)
+        self.assertEqual(calls, [])
+
+    def admin_client(self):
+        client = APIClient()
+        admin = get_user_model().objects.create(
+            email='admin@example.com', username='admin', user_type='admin', is_staff=True
+        )
+        client.force_authenticate(user=admin)
+        return client
+
+    def test_status_endpoint(self):
+        client = self.admin_client()
+        job = enqueue('tests.add', {'a': 1, 'b': 2})
+        response = client.get(f'/api/jobs/{job.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], Job.QUEUED)
+
+        run_pending()
+        data = client.get(f'/api/jobs/{job.id}/').json()
+        self.assertEqual((data['status'], data['result']), (Job.SUCCEEDED, {'sum': 3}))
+        self.assertEqual(client.get('/api/jobs/999999/').status_code, 404)
+
+    def test_status_endpoint_requires_admin(self):
+        job = enqueue('tests.add', {'a': 1, 'b': 2})
+        client = APIClient()
+        self.assertIn(client.get(f'/api/jobs/{job.id}/').status_code, (401, 403))
+
+        tenant = get_user_model().objects.create(email='tenant@example.com', username='tenant')
+        client.force_authenticate(user=tenant)
+        self.assertEqual(client.get(f'/api/jobs/{job.id}/').status_code, 403)
+
+    def test_one_time_values_are_returned_once(self):
+        client = self.admin_client()
+        job = enqueue('tests.secret')
+        run_pending()
+
+        first = client.get(f'/api/jobs/{job.id}/').json()
+        self.assertEqual(first['result']['items'][0]['secret'], 's3cret')
+        second = client.get(f'/api/jobs/{job.id}/').json()
+        self.assertEqual(second['result']['items'][0], {'name': 'a', 'secret': None})
+        job.refresh_from_db()
+        self.assertIsNone(job.result['items'][0]['secret'])
+
+@skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED is exercised against PostgreSQL')
+class ConcurrentWorkerTests(TransactionTestCase):
+    """Test that concurrent workers never run the same job twice"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_claim_skips_locked_rows(self):
+        first = enqueue('tests.add', {'a': 1, 'b': 1})
+        second = enqueue('tests.add', {'a': 2, 'b': 2})
+        claimed = []
+
+        def other_worker():
+            try:
+                claimed.append(claim('other-worker'))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            # Hold the lock a claiming worker would have on the first job
+            Job.objects.select_for_update().get(id=first.id)
+            thread = threading.Thread(target=other_worker)
+            thread.start()
+            thread.join(timeout=10)
+        self.assertFalse(thread.is_alive(), 'claim blocked on a locked row')
+        self.assertEqual(claimed[0].id, second.id)
+
+    def test_pool_runs_every_job_once(self):
+        for index in range(40):
+            enqueue('tests.add', {'a': index, 'b': 0})
+
+        pool = WorkerPool(concurrency=4, poll_interval=0.05)
+        pool.start()
+        deadline = timezone.now() + timedelta(seconds=30)
+        while Job.objects.exclude(status=Job.SUCCEEDED).exists() and timezone.now() < deadline:
+            time.sleep(0.05)
+        pool.stop()
+
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 40)
+        self.assertEqual(sorted(payload['a'] for payload in calls), list(range(40)))
+
+    def test_heartbeat_renews_lease(self):
+        job = enqueue('tests.slow')
+        Job.objects.filter(id=job.id).update(payload={'job_id': job.id, 'seconds': 0.5})
+
+        with self.settings(JOB_LEASE_SECONDS=0.3):
+            self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.SUCCEEDED, {'renewed': True}))
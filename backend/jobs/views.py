@@ -0,0 +1,53 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework import status
+from .queue import take_result
+
+
+def wants_async(request):
+    """True when the client asked for the work to be queued (RFC 7240 Prefer: respond-async)"""
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
+def job_status_url(job):
+    return f'/api/jobs/{job.id}/'
+
+
+def accepted(job, message):
+    """202 response pointing the client at the job to poll"""
+    response = Response({
+        'message': message,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': job_status_url(job)
+    }, status=status.HTTP_202_ACCEPTED)
+    response['Location'] = job_status_url(job)
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def job_status(request, job_id):
+    """
+    State of a background job; result holds the task's response once it
+    has succeeded and error the last failure. One-time values in the
+    result, such as temporary passwords, are only returned on the first
+    read after the job succeeds.
+    """
+    job = take_result(job_id)
+    if job is None:
+        return Response({'message': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at
+    })
@@ -1,6 +1,10 @@
 from django.contrib import admin
-from .models import Shop, Payment
+from .models import Shop, Payment, PaymentArchive, MonthlyRevenue, DailyRevenue, PaymentIdempotencyKey
 
 # Register your models here.
 admin.site.register(Shop)
 admin.site.register(Payment)
+admin.site.register(MonthlyRevenue)
+admin.site.register(DailyRevenue)
+admin.site.register(PaymentIdempotencyKey)
+admin.site.register(PaymentArchive)
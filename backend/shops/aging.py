@@ -0,0 +1,162 @@
+"""
+Receivables aging report.
+
+Arrears of occupied shops are bucketed by days past the due date
+(0-30, 31-60, 61-90, 90+) and summed per floor and shop type in one
+GROUP BY. Balances only move when a payment arrives or a shop changes, and
+days overdue only move at midnight, so reports are cached under today's
+date and a generation number that shop signals and the statement import
+bump. With the local-memory backend each worker keeps its own counter, so
+AGING_REPORT_CACHE_TIMEOUT bounds how stale another worker's copy can get.
+"""
+import csv
+import io
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, Sum, Value, When
+from django.utils import timezone
+from backend.cache_stats import get_cache_stats
+from .models import Shop
+
+AGING_BUCKETS = ('0-30', '31-60', '61-90', '90+')
+AGING_GENERATION_KEY = 'shops:aging:generation'
+
+aging_report_stats = get_cache_stats('aging_report')
+
+
+def aging_queryset(today, tenant_id=None):
+    """Shops in arrears, annotated with their aging bucket"""
+    shops = Shop.objects.filter(is_occupied=True, balance__gt=0, next_due_date__lt=today)
+    if tenant_id is not None:
+        shops = shops.filter(tenant_id=tenant_id)
+    return shops.annotate(bucket=Case(
+        When(next_due_date__gte=today - timedelta(days=30), then=Value('0-30')),
+        When(next_due_date__gte=today - timedelta(days=60), then=Value('31-60')),
+        When(next_due_date__gte=today - timedelta(days=90), then=Value('61-90')),
+        default=Value('90+'),
+        output_field=CharField()
+    ))
+
+
+def _empty_buckets():
+    return {bucket: {'shops': 0, 'balance': 0.0} for bucket in AGING_BUCKETS}
+
+
+def _summarise(buckets):
+    for bucket in buckets.values():
+        bucket['balance'] = round(bucket['balance'], 2)
+    return {
+        'buckets': buckets,
+        'total_shops': sum(bucket['shops'] for bucket in buckets.values()),
+        'total_balance': round(sum(bucket['balance'] for bucket in buckets.values()), 2)
+    }
+
+
+def build_aging_report(today, tenant_id=None):
+    grouped = aging_queryset(today, tenant_id).values(
+        'floor_number', 'shop_type', 'bucket'
+    ).annotate(
+        shop_count=Count('id'),
+        balance_total=Sum('balance')
+    ).order_by('floor_number', 'shop_type')
+
+    rows = {}
+    totals = _empty_buckets()
+    for group in grouped:
+        buckets = rows.setdefault((group['floor_number'], group['shop_type']), _empty_buckets())
+        for target in (buckets[group['bucket']], totals[group['bucket']]):
+            target['shops'] += group['shop_count']
+            target['balance'] += float(group['balance_total'])
+
+    report = {
+        'as_of': today.isoformat(),
+        'buckets': list(AGING_BUCKETS),
+        'rows': [
+            {'floor_number': floor_number, 'shop_type': shop_type, **_summarise(buckets)}
+            for (floor_number, shop_type), buckets in rows.items()
+        ],
+        'totals': _summarise(totals)
+    }
+
+    if tenant_id is not None:
+        report['tenant_id'] = tenant_id
+        report['shops'] = [
+            {
+                'id': shop.id,
+                'shop_number': shop.shop_number,
+                'floor_number': shop.floor_number,
+                'shop_type': shop.shop_type,
+                'balance': float(shop.balance),
+                'next_due_date': shop.next_due_date.isoformat(),
+                'days_overdue': (today - shop.next_due_date).days,
+                'bucket': shop.bucket
+            }
+            for shop in aging_queryset(today, tenant_id).order_by('next_due_date', 'id')
+        ]
+    return report
+
+
+def _generation():
+    generation = cache.get(AGING_GENERATION_KEY)
+    if generation is None:
+        cache.add(AGING_GENERATION_KEY, 0, None)
+        generation = cache.get(AGING_GENERATION_KEY, 0)
+    return generation
+
+
+def get_aging_report(tenant_id=None):
+    """Today's report, cached until midnight, the timeout or the next invalidation"""
+    now = timezone.localtime()
+    today = now.date()
+    key = f"shops:aging:{_generation()}:{today.isoformat()}:{'all' if tenant_id is None else tenant_id}"
+    report = cache.get(key)
+    if report is not None:
+        aging_report_stats.hit()
+        return report
+
+    aging_report_stats.miss()
+    report = build_aging_report(today, tenant_id)
+    midnight = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+    timeout = min(settings.AGING_REPORT_CACHE_TIMEOUT, int((midnight - now).total_seconds()))
+    cache.set(key, report, max(1, timeout))
+    return report
+
+
+def _bump_generation():
+    try:
+        cache.incr(AGING_GENERATION_KEY)
+    except ValueError:
+        cache.add(AGING_GENERATION_KEY, 1, None)
+
+
+def invalidate_aging_report():
+    # Now and again on commit, like the available-shops listing
+    _bump_generation()
+    transaction.on_commit(_bump_generation)
+
+
+def iter_aging_csv(report):
+    """One line per floor and shop type, shop count and balance per bucket, then totals"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    header = ['floor_number', 'shop_type']
+    for bucket in AGING_BUCKETS:
+        header += [f'{bucket} shops', f'{bucket} balance']
+    writer.writerow(header + ['total_shops', 'total_balance'])
+    yield flush()
+
+    for row in report['rows'] + [{'floor_number': 'Total', 'shop_type': '', **report['totals']}]:
+        line = [row['floor_number'], row['shop_type']]
+        for bucket in AGING_BUCKETS:
+            line += [row['buckets'][bucket]['shops'], f"{row['buckets'][bucket]['balance']:.2f}"]
+        writer.writerow(line + [row['total_shops'], f"{row['total_balance']:.2f}"])
+        yield flush()
@@ -0,0 +1,30 @@
+"""
+Archiving the payment history of removed tenants.
+
+Deleting a long-standing tenant used to cascade through their whole
+ledger in one transaction. Removal is now a soft delete, and their
+payments are moved to PaymentArchive by the archive_tenant_payments job in
+batches of PAYMENT_ARCHIVE_BATCH_SIZE. Each batch is its own short
+transaction touching only that tenant's rows, so make_payment traffic
+carries on meanwhile. The revenue rollups are unaffected; their rebuild
+commands read the archive as well as the ledger.
+"""
+from .models import Payment, PaymentArchive
+
+
+def archive_payments(tenant_id, batch_size):
+    """Move up to batch_size of the tenant's oldest payments to the archive; returns how many moved"""
+    rows = list(
+        Payment.objects.select_for_update().filter(tenant_id=tenant_id).order_by('id').values_list(
+            *PaymentArchive.COPIED_FIELDS
+        )[:batch_size]
+    )
+    if not rows:
+        return 0
+    # ignore_conflicts makes a retried batch harmless
+    PaymentArchive.objects.bulk_create(
+        [PaymentArchive(**dict(zip(PaymentArchive.COPIED_FIELDS, row))) for row in rows],
+        ignore_conflicts=True
+    )
+    Payment.objects.filter(id__in=[row[0] for row in rows]).delete()
+    return len(rows)
@@ -0,0 +1,70 @@
+"""
+Cache for the public available-shops listing.
+
+The serialized listing is kept in Django's default cache together with an
+ETag and the time it was built. Shop signals invalidate it whenever a vacant
+shop changes or a shop's occupancy changes. With the local-memory backend
+each worker has its own copy, so the timeout bounds how stale another
+worker's copy can get; a file-based backend shares one copy per host.
+"""
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from backend.cache_stats import get_cache_stats
+from .models import Shop
+
+AVAILABLE_SHOPS_CACHE_KEY = 'shops:available'
+
+available_shops_stats = get_cache_stats('available_shops')
+
+
+def build_available_shops():
+    shops = Shop.objects.filter(is_occupied=False).order_by('shop_number').values_list(
+        'id', 'shop_number', 'monthly_rent', 'shop_type', 'floor_number'
+    )
+    shop_ids = []
+    shops_data = []
+    for shop_id, shop_number, monthly_rent, shop_type, floor_number in shops:
+        shop_ids.append(shop_id)
+        shops_data.append({
+            'shop_number': shop_number,
+            'monthly_rent': float(monthly_rent),
+            'shop_type': shop_type,
+            'floor_number': floor_number
+        })
+
+    digest = hashlib.sha256(json.dumps(shops_data, sort_keys=True).encode()).hexdigest()
+    return {
+        'shops': shops_data,
+        'shop_ids': frozenset(shop_ids),
+        'etag': f'"{digest[:32]}"',
+        # HTTP dates have one-second resolution
+        'last_modified': timezone.now().replace(microsecond=0)
+    }
+
+
+def get_available_shops():
+    """Return the cached listing entry, building it on a miss"""
+    entry = cache.get(AVAILABLE_SHOPS_CACHE_KEY)
+    if entry is not None:
+        available_shops_stats.hit()
+        return entry
+
+    available_shops_stats.miss()
+    entry = build_available_shops()
+    cache.set(AVAILABLE_SHOPS_CACHE_KEY, entry, settings.AVAILABLE_SHOPS_CACHE_TIMEOUT)
+    return entry
+
+
+def invalidate_available_shops():
+    cache.delete(AVAILABLE_SHOPS_CACHE_KEY)
+
+
+def is_listed(shop):
+    """Whether a change to this shop can affect the cached listing"""
+    if not shop.is_occupied:
+        return True
+    entry = cache.get(AVAILABLE_SHOPS_CACHE_KEY)
+    return entry is not None and shop.pk in entry['shop_ids']
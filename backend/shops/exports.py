@@ -0,0 +1,115 @@
+"""
+Streaming export of the Payment ledger.
+
+Rows are read through a server-side cursor with .iterator(chunk_size=...)
+and rendered one line at a time, so memory use stays flat no matter how
+many payments are exported. Used by the admin export endpoint and the
+export_payments management command.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Payment
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('payment_date', 'payment_date'),
+    ('payment_month', 'payment_month'),
+    ('shop_number', 'shop__shop_number'),
+    ('tenant_id', 'tenant_id'),
+    ('tenant_email', 'tenant__email'),
+    ('amount', 'amount'),
+    ('payment_method', 'payment_method'),
+    ('status', 'status'),
+    ('reference', 'reference'),
+    ('balance_before', 'balance_before'),
+    ('balance_after', 'balance_after'),
+]
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _start_of_day(value):
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+def filter_payments(date_from=None, date_to=None, shop=None, tenant=None, method=None):
+    """
+    Build the export queryset from raw filter values.
+    Dates are "YYYY-MM-DD" and inclusive; shop is a shop number and tenant a
+    tenant id. Raises ValueError on malformed input.
+    """
+    payments = Payment.objects.all()
+
+    if date_from:
+        parsed = parse_date(date_from)
+        if not parsed:
+            raise ValueError('Invalid from date, expected YYYY-MM-DD')
+        payments = payments.filter(payment_date__gte=_start_of_day(parsed))
+
+    if date_to:
+        parsed = parse_date(date_to)
+        if not parsed:
+            raise ValueError('Invalid to date, expected YYYY-MM-DD')
+        payments = payments.filter(payment_date__lt=_start_of_day(parsed + timedelta(days=1)))
+
+    if shop:
+        payments = payments.filter(shop__shop_number=shop)
+
+    if tenant:
+        try:
+            payments = payments.filter(tenant_id=int(tenant))
+        except (TypeError, ValueError):
+            raise ValueError('Invalid tenant id')
+
+    if method:
+        if method not in dict(Payment.PAYMENT_METHOD_CHOICES):
+            raise ValueError('Invalid payment method')
+        payments = payments.filter(payment_method=method)
+
+    return payments.order_by('payment_date', 'id')
+
+
+def _iter_rows(payments, chunk_size):
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    return payments.values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return str(value)  # Decimals stay exact
+
+
+class _Echo:
+    """File-like object whose write() just returns the line for streaming"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(payments, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the ledger as CSV lines, header first"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in _iter_rows(payments, chunk_size):
+        yield writer.writerow([_export_value(value) for value in row])
+
+
+def iter_ndjson(payments, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the ledger as newline-delimited JSON objects"""
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for row in _iter_rows(payments, chunk_size):
+        yield json.dumps(dict(zip(names, (_export_value(value) for value in row)))) + '\n'
+
+
+def iter_export(payments, export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    if export_format == 'ndjson':
+        return iter_ndjson(payments, chunk_size)
+    return iter_csv(payments, chunk_size)
@@ -0,0 +1,203 @@
+"""
+Bulk payment import from bank and mobile-money statements.
+
+A batch of statement lines is matched to shops by shop number, validated
+row by row, and written in one transaction: payments with bulk_create and
+each affected shop's balance with a single bulk_update, shops being locked
+and processed in id order. Used by the admin import endpoint and the
+import_payments management command.
+
+A row whose reference was already recorded for the same shop and payment
+method, in the database or earlier in the batch, is rejected as a
+duplicate, so re-importing a statement does not pay twice. Payments are
+dated when they are imported.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from decimal import InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+from .aging import invalidate_aging_report
+from .metrics import count_payments
+from .models import Shop, Payment, MonthlyRevenue, DailyRevenue
+from .rent_schedule import MAX_AMOUNT, apply_payment, to_amount
+
+IMPORT_COLUMNS = ('shop_number', 'amount', 'payment_method', 'reference')
+
+# A single payment may cover at most this many months of rent, which keeps
+# the advanced due date in a sane range
+MAX_PREPAID_MONTHS = 120
+
+
+def parse_csv(text):
+    """Read statement rows from CSV text with a header line"""
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def parse_json(text):
+    """Read statement rows from a JSON list or a {"payments": [...]} object"""
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get('payments')
+    if not isinstance(data, list):
+        raise ValueError('Expected a list of payments')
+    return data
+
+
+def parse_statement(text, file_format):
+    if file_format == 'json':
+        return parse_json(text)
+    return parse_csv(text)
+
+
+def _validate_row(row):
+    """Return (shop_number, amount, method, reference) or raise ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+
+    shop_number = str(row.get('shop_number') or '').strip()
+    if not shop_number:
+        raise ValueError('Missing shop number')
+
+    try:
+        amount = to_amount(row.get('amount'))
+    except InvalidOperation:
+        raise ValueError('Invalid amount')
+    if not amount.is_finite() or not amount > 0:
+        raise ValueError('Invalid amount')
+    if amount > MAX_AMOUNT:
+        raise ValueError(f'Amount exceeds {MAX_AMOUNT}')
+
+    method = row.get('payment_method')
+    if method not in dict(Payment.PAYMENT_METHOD_CHOICES):
+        raise ValueError('Invalid payment method')
+
+    return shop_number, amount, method, str(row.get('reference') or '')[:100]
+
+
+def _rejected(index, error):
+    return {'row': index + 1, 'status': 'rejected', 'error': error}
+
+
+def _check_shop_payment(shop, state, amount):
+    """Raise ValueError if `amount` cannot be applied to the shop's current state"""
+    if amount > shop.monthly_rent * MAX_PREPAID_MONTHS:
+        raise ValueError(f'Amount exceeds {MAX_PREPAID_MONTHS} months of rent')
+    if state.total_paid + amount > MAX_AMOUNT:
+        raise ValueError(f'Total paid for shop {shop.shop_number} would exceed {MAX_AMOUNT}')
+
+
+def import_payments(rows):
+    """
+    Import statement rows and return a per-row report:
+    {'created': n, 'rejected': n, 'results': [{'row', 'status', ...}]}
+    Rows are numbered from 1 in the order given.
+    """
+    results = [None] * len(rows)
+    rows_by_shop = defaultdict(list)
+    seen_references = set()
+
+    for index, row in enumerate(rows):
+        try:
+            shop_number, amount, method, reference = _validate_row(row)
+        except ValueError as e:
+            results[index] = _rejected(index, str(e))
+            continue
+        if reference:
+            if (shop_number, method, reference) in seen_references:
+                results[index] = _rejected(index, f'Duplicate reference {reference}')
+                continue
+            seen_references.add((shop_number, method, reference))
+        rows_by_shop[shop_number].append((index, amount, method, reference))
+
+    payments = []
+    with transaction.atomic():
+        # Lock every target shop once, in id order so concurrent imports and
+        # make_payment calls cannot deadlock against each other
+        shops = Shop.objects.select_for_update().filter(
+            shop_number__in=rows_by_shop.keys()
+        ).order_by('id')
+        shops_by_number = {shop.shop_number: shop for shop in shops}
+        # Read while the shops are locked, so a concurrent import of the
+        # same statement waits and then sees these references
+        recorded_references = set(Payment.objects.filter(
+            shop_id__in=[shop.id for shop in shops],
+            reference__in={reference for _, _, reference in seen_references}
+        ).values_list('shop_id', 'payment_method', 'reference')) if seen_references else set()
+
+        for shop_number, shop_rows in rows_by_shop.items():
+            if shop_number not in shops_by_number:
+                for index, *_ in shop_rows:
+                    results[index] = _rejected(index, f'Shop {shop_number} does not exist')
+                continue
+            if not shops_by_number[shop_number].is_occupied:
+                for index, *_ in shop_rows:
+                    results[index] = _rejected(index, f'Shop {shop_number} is not occupied')
+
+        now = timezone.now()
+        payment_month = timezone.localdate(now).strftime('%Y-%m')
+        month = timezone.localdate(now).replace(day=1)
+        today = timezone.localdate(now)
+
+        updated_shops = []
+        for shop in shops:
+            if not shop.is_occupied:
+                continue
+            # Apply this shop's payments in statement order, in memory
+            state = shop.rent_state
+            for index, amount, method, reference in rows_by_shop[shop.shop_number]:
+                if (shop.id, method, reference) in recorded_references:
+                    results[index] = _rejected(index, f'Duplicate reference {reference}')
+                    continue
+                try:
+                    _check_shop_payment(shop, state, amount)
+                    paid = apply_payment(shop.monthly_rent, state, amount, today=today)
+                except ValueError as e:
+                    # apply_payment raises when the due date would leave the calendar
+                    results[index] = _rejected(index, str(e))
+                    continue
+                balance_before = state.balance if state.balance else shop.monthly_rent
+                due_date = state.next_due_date
+                state = paid
+                payments.append((index, Payment(
+                    shop=shop,
+                    tenant_id=shop.tenant_id,
+                    amount=amount,
+                    payment_method=method,
+                    payment_month=payment_month,
+                    month=month,
+                    status='completed',
+                    reference=reference,
+                    balance_before=balance_before,
+                    balance_after=state.balance,
+                    due_date=due_date
+                )))
+            shop.balance, shop.next_due_date, shop.total_paid = state
+            shop.updated_at = now
+            updated_shops.append(shop)
+
+        Payment.objects.bulk_create([payment for _, payment in payments])
+        Shop.objects.bulk_update(updated_shops, ['balance', 'next_due_date', 'total_paid', 'updated_at'])
+        MonthlyRevenue.record_payments([payment for _, payment in payments])
+        count_payments([payment for _, payment in payments], source='import')
+        # bulk_update sends no signals
+        invalidate_aging_report()
+        # Last, so the hot per-day rows are locked only until the commit
+        DailyRevenue.record_payments([payment for _, payment in payments])
+
+    for index, payment in payments:
+        results[index] = {
+            'row': index + 1,
+            'status': 'created',
+            'payment_id': payment.id,
+            'shop_number': payment.shop.shop_number,
+            'balance_after': float(payment.balance_after)
+        }
+
+    return {
+        'created': len(payments),
+        'rejected': len(results) - len(payments),
+        'results': results
+    }
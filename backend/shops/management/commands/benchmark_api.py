@@ -0,0 +1,243 @@
+import importlib
+import json
+import statistics
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from admin_dashboard.models import ProfileChangeRequest
+from backend.middleware import QueryTracker
+from jobs.models import Job
+from shops.models import Shop, Payment, MonthlyRevenue
+from user_accounts.models import User
+from .seed_mall import SCALES, SEED_ADMIN_EMAIL, SEED_EMAIL_DOMAIN, SEED_PASSWORD
+
+# Every route in these URLconfs must have a benchmark case below
+BENCHMARKED_URLCONFS = ('shops.urls', 'user_accounts.urls', 'admin_dashboard.urls', 'jobs.urls')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def route_labels():
+    """'<app>:<url name>' for every route in BENCHMARKED_URLCONFS"""
+    labels = []
+    for module in BENCHMARKED_URLCONFS:
+        app = module.split('.')[0]
+        for pattern in importlib.import_module(module).urlpatterns:
+            labels.append(f'{app}:{pattern.name}')
+    return labels
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and query count of every API route against a seeded mall'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, nargs='+', default=['small'],
+                            help='Seed and benchmark each of these scales in turn')
+        parser.add_argument('--no-seed', action='store_true',
+                            help='Benchmark the data already in the database (seed_mall must have run)')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per route')
+        parser.add_argument('--skip', nargs='*', default=[], help='Route labels to leave out, e.g. admin_dashboard:export_payments')
+        parser.add_argument('--output', help='JSON file to write (defaults to api-benchmark-<timestamp>.json)')
+        parser.add_argument('--compare', help='Earlier results file to print p50 changes against')
+
+    def handle(self, *args, **options):
+        runs = []
+        scales = [None] if options['no_seed'] else options['scale']
+        for scale in scales:
+            if scale is not None:
+                self.stdout.write(f'Seeding {scale} mall...')
+                call_command('seed_mall', scale=scale, clear=True, stdout=self.stdout)
+            runs.append(self.benchmark(scale, options['requests'], set(options['skip'])))
+
+        results = {'generated_at': timezone.now().isoformat(), 'runs': runs}
+        output = options['output'] or f"api-benchmark-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {output}'))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f), results)
+
+    def dataset(self):
+        return {
+            'tenants': User.objects.filter(user_type='tenant').count(),
+            'shops': Shop.objects.count(),
+            'payments': Payment.objects.count(),
+            'monthly_revenue_rows': MonthlyRevenue.objects.count(),
+            'profile_requests': ProfileChangeRequest.objects.count(),
+        }
+
+    def cases(self):
+        """(label, method, path, body, token) for every route"""
+        try:
+            admin = User.objects.get(email=SEED_ADMIN_EMAIL)
+        except User.DoesNotExist:
+            raise CommandError('No seeded data found, run seed_mall first')
+
+        # The busiest tenant makes the worst case for per-tenant routes
+        tenant = User.objects.filter(
+            user_type='tenant', email__endswith=f'@{SEED_EMAIL_DOMAIN}'
+        ).annotate(payment_count=Count('payment')).order_by('-payment_count', 'id').first()
+        shop = tenant.shops.filter(is_occupied=True).order_by('id').first()
+        vacant = Shop.objects.filter(is_occupied=False).order_by('id').first()
+        pending = ProfileChangeRequest.objects.filter(status='pending').order_by('id').first()
+        request_id = pending.id if pending else 0
+        job = Job.objects.order_by('-id').first()
+        job_id = job.id if job else 0
+        admin_token = Token.objects.get_or_create(user=admin)[0].key
+        tenant_token = Token.objects.get_or_create(user=tenant)[0].key
+
+        new_user = {
+            'email': f'benchmark@{SEED_EMAIL_DOMAIN}',
+            'username': 'benchmark_user',
+            'first_name': 'Bench',
+            'last_name': 'Mark',
+            'password': 'Benchmark-pass-123',
+            'password_confirm': 'Benchmark-pass-123',
+        }
+        login = {'email': tenant.email, 'password': SEED_PASSWORD}
+        payment = {'shop_id': shop.id, 'tenant_id': tenant.id, 'amount': '1000.00', 'payment_method': 'cash'}
+        statement = {'payments': [
+            {'shop_number': shop.shop_number, 'amount': '1000.00', 'payment_method': 'bank_transfer', 'reference': 'BENCH'}
+        ] * 10}
+        new_tenant = {
+            'email': f'new-tenant@{SEED_EMAIL_DOMAIN}',
+            'username': 'benchmark_tenant',
+            'first_name': 'New',
+            'last_name': 'Tenant',
+            'shop_numbers': [vacant.shop_number] if vacant else [],
+        }
+        vacant_numbers = Shop.objects.filter(is_occupied=False).order_by('id').values_list('shop_number', flat=True)[:20]
+        new_tenants = {'tenants': [
+            {
+                'email': f'new-tenant-{index}@{SEED_EMAIL_DOMAIN}',
+                'username': f'benchmark_tenant_{index}',
+                'first_name': 'New',
+                'last_name': f'Tenant {index}',
+                'shop_numbers': [shop_number],
+            }
+            for index, shop_number in enumerate(vacant_numbers)
+        ]}
+
+        return [
+            ('shops:available_shops', 'get', '/api/shops/available-shops/', None, None),
+            ('shops:tenant_shops', 'get', f'/api/shops/tenant/{tenant.id}/shops/', None, None),
+            ('shops:make_payment', 'post', '/api/shops/payment/make/', payment, None),
+            ('shops:payment_history', 'get', f'/api/shops/tenant/{tenant.id}/payment-history/', None, None),
+            ('shops:overdue_shops', 'get', '/api/shops/overdue/', None, None),
+            ('user_accounts:register', 'post', '/api/auth/register/', new_user, None),
+            ('user_accounts:login', 'post', '/api/auth/login/', login, None),
+            ('user_accounts:async_register', 'post', '/api/auth/async/register/', new_user, None),
+            ('user_accounts:async_login', 'post', '/api/auth/async/login/', login, None),
+            ('user_accounts:logout', 'post', '/api/auth/logout/', None, tenant_token),
+            ('user_accounts:profile', 'get', '/api/auth/profile/', None, tenant_token),
+            ('user_accounts:check_email', 'post', '/api/auth/check-email/', {'email': tenant.email}, None),
+            ('admin_dashboard:dashboard_stats', 'get', '/api/admin/stats/', None, None),
+            ('admin_dashboard:tenant_list', 'get', '/api/admin/tenants/', None, None),
+            ('admin_dashboard:register_tenant', 'post', '/api/admin/register-tenant/', new_tenant, None),
+            ('admin_dashboard:register_tenants', 'post', '/api/admin/register-tenants/', new_tenants, admin_token),
+            ('admin_dashboard:profile_requests', 'get', '/api/admin/profile-requests/', None, None),
+            ('admin_dashboard:approve_request', 'post', f'/api/admin/profile-requests/{request_id}/approve/', None, None),
+            ('admin_dashboard:reject_request', 'post', f'/api/admin/profile-requests/{request_id}/reject/', None, None),
+            ('admin_dashboard:payment_history', 'get', '/api/admin/payment-history/', None, None),
+            ('admin_dashboard:export_payments', 'get', '/api/admin/payments/export/', None, admin_token),
+            ('admin_dashboard:import_payments', 'post', '/api/admin/payments/import/', statement, admin_token),
+            ('admin_dashboard:delete_tenant', 'delete', f'/api/admin/tenants/{tenant.id}/delete/', None, None),
+            ('admin_dashboard:aging_report', 'get', '/api/admin/aging-report/', None, None),
+            ('admin_dashboard:revenue_series', 'get', '/api/admin/revenue-series/?granularity=week', None, None),
+            ('admin_dashboard:cash_flow_forecast', 'get', '/api/admin/cash-flow-forecast/', None, None),
+            ('admin_dashboard:enhanced_analytics', 'get', '/api/admin/enhanced-analytics/', None, None),
+            ('admin_dashboard:request_metrics', 'get', '/api/admin/request-metrics/', None, admin_token),
+            ('jobs:job_status', 'get', f'/api/jobs/{job_id}/', None, admin_token),
+        ]
+
+    def request(self, client, method, path, body, token):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        if body is None:
+            response = getattr(client, method)(path, **headers)
+        else:
+            response = getattr(client, method)(path, data=json.dumps(body), content_type='application/json', **headers)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        return response.status_code, size
+
+    def measure(self, client, method, path, body, token):
+        """Time one request and count its queries; writes are rolled back"""
+        tracker = QueryTracker()
+        with transaction.atomic():
+            with connection.execute_wrapper(tracker):
+                started = time.perf_counter()
+                status_code, size = self.request(client, method, path, body, token)
+                elapsed = time.perf_counter() - started
+            # Roll back every request so each one sees the same data
+            transaction.set_rollback(True)
+        return elapsed, tracker.count, status_code, size
+
+    def benchmark(self, scale, requests, skip):
+        cases = self.cases()
+        covered = {case[0] for case in cases}
+        for label in route_labels():
+            if label not in covered:
+                self.stderr.write(f'No benchmark case for {label}')
+
+        client = Client()
+        dataset = self.dataset()
+        self.stdout.write(f"\n{scale or 'current data'}: " + ', '.join(f'{count} {name}' for name, count in dataset.items()))
+
+        endpoints = []
+        for label, method, path, body, token in cases:
+            if label in skip:
+                continue
+            samples = [self.measure(client, method, path, body, token) for _ in range(requests)]
+            latencies = [sample[0] for sample in samples]
+            queries = [sample[1] for sample in samples]
+            result = {
+                'route': label,
+                'method': method.upper(),
+                'path': path,
+                'status': sorted({sample[2] for sample in samples}),
+                'requests': requests,
+                'bytes': samples[-1][3],
+                'first_ms': round(latencies[0] * 1000, 2),
+                'p50_ms': round(statistics.median(latencies) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+                'max_ms': round(max(latencies) * 1000, 2),
+                'queries': max(queries),
+            }
+            endpoints.append(result)
+            self.stdout.write(
+                f"{label:<40} {result['p50_ms']:>10} ms p50 {result['p95_ms']:>10} ms p95 "
+                f"{result['queries']:>5} queries   {','.join(map(str, result['status']))}"
+            )
+
+        return {'scale': scale, 'dataset': dataset, 'endpoints': endpoints}
+
+    def compare(self, before, after):
+        """Print the p50 and query count change of each route between two result files"""
+        previous = {
+            (run['scale'], endpoint['route']): endpoint
+            for run in before['runs'] for endpoint in run['endpoints']
+        }
+        self.stdout.write('\nChange against earlier run:')
+        for run in after['runs']:
+            for endpoint in run['endpoints']:
+                old = previous.get((run['scale'], endpoint['route']))
+                if old is None:
+                    continue
+                change = (endpoint['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0
+                self.stdout.write(
+                    f"{run['scale'] or 'current data'} {endpoint['route']:<40} "
+                    f"p50 {old['p50_ms']:>10} -> {endpoint['p50_ms']:>10} ms ({change:+.0f}%)   "
+                    f"queries {old['queries']} -> {endpoint['queries']}"
+                )
@@ -0,0 +1,109 @@
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from shops.models import Shop
+from shops.rent_schedule import RentState, apply_payment, apply_payments
+
+
+def random_case(rng, today):
+    """A (monthly_rent, state, amount) mixing partial, exact-multiple and many-month payments"""
+    rent_cents = rng.randint(100_000, 500_000_000)
+    monthly_rent = Decimal(rent_cents).scaleb(-2)
+    choice = rng.random()
+    if choice < 0.1:
+        next_due_date = None
+    elif choice < 0.4:
+        next_due_date = date(today.year - 1, rng.randint(1, 12), 1) + relativedelta(day=31)
+    else:
+        next_due_date = date(today.year - 1, 1, 1) + relativedelta(days=rng.randint(0, 730))
+    state = RentState(
+        balance=Decimal(rng.randint(-rent_cents, 3 * rent_cents)).scaleb(-2),
+        next_due_date=next_due_date,
+        total_paid=Decimal(rng.randint(0, 1_000_000_000)).scaleb(-2)
+    )
+    amount = rng.choice([
+        Decimal(rng.randint(1, 5 * rent_cents)).scaleb(-2),
+        monthly_rent * rng.randint(1, 36),
+        state.balance + monthly_rent * rng.randint(0, 3),
+    ])
+    return monthly_rent, state, max(amount, Decimal('0.01'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure rent schedule engine throughput and concurrent make_payment throughput '
+        'against one shop. The concurrent run records real payments; use a seeded database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', type=int, default=20000, help='Payments applied by the engine benchmark')
+        parser.add_argument('--workers', type=int, default=20, help='Concurrent make_payment clients (0 to skip)')
+        parser.add_argument('--payments', type=int, default=10, help='Payments per client')
+        parser.add_argument('--amount', default='250', help='Amount of each concurrent payment')
+        parser.add_argument('--shop', help='Shop number to pay for (defaults to the first occupied shop)')
+
+    def handle(self, *args, **options):
+        self.engine(options['cases'])
+        if options['workers'] > 0:
+            self.concurrent(options['workers'], options['payments'], options['amount'], options['shop'])
+
+    def engine(self, count):
+        today = date.today()
+        rng = random.Random(11)
+        cases = [random_case(rng, today) for _ in range(count)]
+
+        started = time.perf_counter()
+        for monthly_rent, state, amount in cases:
+            apply_payment(monthly_rent, state, amount, today)
+        single = time.perf_counter() - started
+
+        rents, states, amounts = zip(*cases) if cases else ((), (), ())
+        started = time.perf_counter()
+        apply_payments(rents, states, amounts, today)
+        batch = time.perf_counter() - started
+
+        self.stdout.write(
+            f'apply_payment: {count / single:,.0f} payments/s, '
+            f'apply_payments: {count / batch:,.0f} payments/s'
+        )
+
+    def concurrent(self, workers, payments, amount, shop_number):
+        shops = Shop.objects.filter(is_occupied=True, tenant__isnull=False)
+        shop = (shops.filter(shop_number=shop_number) if shop_number else shops.order_by('id')).first()
+        if shop is None:
+            raise CommandError('No occupied shop to pay for; run seed_mall first')
+        body = json.dumps({
+            'shop_id': shop.id,
+            'tenant_id': shop.tenant_id,
+            'amount': amount,
+            'payment_method': 'mobile_money'
+        })
+
+        def worker(index):
+            client = Client()
+            try:
+                return [
+                    client.post('/api/shops/payment/make/', data=body, content_type='application/json').status_code
+                    for _ in range(payments)
+                ]
+            finally:
+                connection.close()
+
+        total = workers * payments
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            statuses = [code for codes in pool.map(worker, range(workers)) for code in codes]
+        elapsed = time.perf_counter() - started
+
+        failed = sum(1 for code in statuses if code != 201)
+        self.stdout.write(
+            f'{total} concurrent payments for shop {shop.shop_number} in {elapsed:.2f}s '
+            f'({total / elapsed:.0f} payments/s, {failed} failed)'
+        )
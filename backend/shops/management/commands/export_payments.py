@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from shops.exports import EXPORT_FORMATS, DEFAULT_CHUNK_SIZE, filter_payments, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream the Payment ledger as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv', dest='export_format')
+        parser.add_argument('--from', dest='date_from', help='First payment date to include (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last payment date to include (YYYY-MM-DD)')
+        parser.add_argument('--shop', help='Shop number')
+        parser.add_argument('--tenant', help='Tenant id')
+        parser.add_argument('--method', help='Payment method')
+        parser.add_argument('--output', help='File to write to (defaults to stdout)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows fetched per round trip from the server-side cursor')
+
+    def handle(self, *args, **options):
+        try:
+            payments = filter_payments(
+                date_from=options['date_from'],
+                date_to=options['date_to'],
+                shop=options['shop'],
+                tenant=options['tenant'],
+                method=options['method']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        lines = iter_export(payments, options['export_format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
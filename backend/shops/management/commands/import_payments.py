@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from shops.imports import parse_statement, import_payments
+
+
+class Command(BaseCommand):
+    help = 'Import payments from a CSV or JSON bank/mobile-money statement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Statement file with shop_number, amount, payment_method and reference')
+        parser.add_argument('--format', choices=('csv', 'json'), dest='file_format',
+                            help='Statement format (defaults to the file extension)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or ('json' if path.lower().endswith('.json') else 'csv')
+
+        try:
+            with open(path, encoding='utf-8-sig') as statement:
+                rows = parse_statement(statement.read(), file_format)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read statement: {e}')
+
+        report = import_payments(rows)
+
+        for result in report['results']:
+            if result['status'] == 'rejected':
+                self.stderr.write(f"Row {result['row']}: {result['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} payments, rejected {report['rejected']}"
+        ))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from shops.models import Payment, PaymentArchive, DailyRevenue
+from shops.revenue import lock_ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyRevenue rollup from the Payment ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rollup rows written per INSERT'
+        )
+
+    def handle(self, *args, **options):
+        # Read the ledger and swap the whole table in one transaction, so
+        # readers never see a partial rollup
+        with transaction.atomic():
+            lock_ledger()
+
+            # Archived payments of removed tenants still count as revenue
+            totals = {}
+            for model in (Payment, PaymentArchive):
+                buckets = model.objects.filter(status='completed').order_by().values_list(
+                    TruncDate('payment_date', tzinfo=timezone.get_current_timezone()),
+                    'payment_method'
+                ).annotate(
+                    total_amount=Sum('amount'),
+                    payment_count=Count('id')
+                )
+                for day, payment_method, total_amount, payment_count in buckets.iterator():
+                    amount, count = totals.get((day, payment_method), (0, 0))
+                    totals[(day, payment_method)] = (amount + total_amount, count + payment_count)
+
+            rows = [
+                DailyRevenue(
+                    day=day,
+                    payment_method=payment_method,
+                    total_amount=total_amount,
+                    payment_count=payment_count
+                )
+                for (day, payment_method), (total_amount, payment_count) in totals.items()
+            ]
+
+            DailyRevenue.objects.all().delete()
+            DailyRevenue.objects.bulk_create(rows, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(rows)} daily revenue rows'))
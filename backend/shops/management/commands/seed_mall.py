@@ -0,0 +1,199 @@
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, time as day_time, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from admin_dashboard.models import ProfileChangeRequest
+from shops.models import Shop, Payment, MonthlyRevenue
+from user_accounts.models import User
+
+# Seeded rows are recognisable by these markers so --clear only removes them
+SEED_EMAIL_DOMAIN = 'seed-mall.test'
+SEED_SHOP_PREFIX = 'SM'
+SEED_ADMIN_EMAIL = f'admin@{SEED_EMAIL_DOMAIN}'
+SEED_PASSWORD = 'seed-mall-password'
+
+SCALES = {
+    'small': {'shops': 200, 'tenants': 120, 'payments': 20000, 'profile_requests': 200},
+    'medium': {'shops': 1000, 'tenants': 600, 'payments': 250000, 'profile_requests': 1000},
+    'large': {'shops': 5000, 'tenants': 3000, 'payments': 2000000, 'profile_requests': 5000},
+}
+
+SHOP_TYPES = ['General', 'Clothing', 'Electronics', 'Restaurant', 'Salon', 'Pharmacy', 'Supermarket']
+FLOORS = 5
+
+
+def seed_email(index):
+    return f'tenant{index}@{SEED_EMAIL_DOMAIN}'
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic mall (tenants, shops, payments, profile requests) with bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small', help='Preset sizes to start from')
+        parser.add_argument('--shops', type=int, help='Number of shops (overrides the scale)')
+        parser.add_argument('--tenants', type=int, help='Number of tenants (overrides the scale)')
+        parser.add_argument('--payments', type=int, help='Number of payments (overrides the scale)')
+        parser.add_argument('--profile-requests', type=int, help='Number of profile change requests (overrides the scale)')
+        parser.add_argument('--months', type=int, default=24, help='How many months of payment history to spread over')
+        parser.add_argument('--occupancy', type=float, default=0.85, help='Fraction of shops that are let')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows written per INSERT')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for repeatable data')
+        parser.add_argument('--clear', action='store_true', help='Remove previously seeded data first')
+
+    def handle(self, *args, **options):
+        sizes = dict(SCALES[options['scale']])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            if options['clear']:
+                self.clear()
+            elif Shop.objects.filter(shop_number__startswith=SEED_SHOP_PREFIX).exists():
+                self.stderr.write('Seeded data already exists, pass --clear to replace it')
+                return
+
+            tenants = self.create_tenants(sizes['tenants'])
+            shops = self.create_shops(sizes['shops'], tenants, options['occupancy'])
+            payment_count = self.create_payments(shops, sizes['payments'], options['months'])
+            request_count = self.create_profile_requests(tenants, sizes['profile_requests'])
+            call_command('rebuild_monthly_revenue', batch_size=self.batch_size, stdout=self.stdout)
+            call_command('rebuild_daily_revenue', batch_size=self.batch_size, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(tenants)} tenants, {len(shops)} shops, {payment_count} payments and '
+            f'{request_count} profile requests in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def clear(self):
+        seeded_users = User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}')
+        Payment.objects.filter(shop__shop_number__startswith=SEED_SHOP_PREFIX).delete()
+        MonthlyRevenue.objects.filter(shop__shop_number__startswith=SEED_SHOP_PREFIX).delete()
+        Shop.objects.filter(shop_number__startswith=SEED_SHOP_PREFIX).delete()
+        ProfileChangeRequest.objects.filter(tenant__in=seeded_users).delete()
+        seeded_users.delete()
+
+    def create_tenants(self, count):
+        # Hash once: every seeded account shares the same password
+        password = make_password(SEED_PASSWORD)
+        User.objects.create(
+            email=SEED_ADMIN_EMAIL,
+            username='seed_admin',
+            first_name='Seed',
+            last_name='Admin',
+            user_type='admin',
+            is_staff=True,
+            password=password
+        )
+        tenants = [
+            User(
+                email=seed_email(index),
+                username=f'seed_tenant{index}',
+                first_name='Tenant',
+                last_name=str(index),
+                phone_number=f'07{index:08d}',
+                user_type='tenant',
+                password=password
+            )
+            for index in range(count)
+        ]
+        return User.objects.bulk_create(tenants, batch_size=self.batch_size)
+
+    def create_shops(self, count, tenants, occupancy):
+        today = timezone.localdate()
+        shops = []
+        for index in range(count):
+            # Round-robin so every tenant gets a shop before anyone gets a second
+            tenant = tenants[index % len(tenants)] if tenants and self.random.random() < occupancy else None
+            monthly_rent = Decimal(self.random.randrange(200, 2000) * 500)
+            shops.append(Shop(
+                shop_number=f'{SEED_SHOP_PREFIX}{index:06d}',
+                tenant=tenant,
+                monthly_rent=monthly_rent,
+                shop_type=self.random.choice(SHOP_TYPES),
+                floor_number=index % FLOORS + 1,
+                is_occupied=tenant is not None,
+                balance=monthly_rent if tenant else 0,
+                next_due_date=today + timedelta(days=self.random.randint(-120, 30)) if tenant else None
+            ))
+        return Shop.objects.bulk_create(shops, batch_size=self.batch_size)
+
+    def create_payments(self, shops, count, months):
+        occupied = [shop for shop in shops if shop.is_occupied]
+        if not occupied or not count:
+            return 0
+
+        today = timezone.localdate()
+        days = [today - timedelta(days=offset) for offset in range(months * 30, -1, -1)]
+        per_shop = count / len(occupied)
+        methods = [choice for choice, _ in Payment.PAYMENT_METHOD_CHOICES]
+        total_paid = defaultdict(Decimal)
+        # Each tenant pays up to this many days after the due date, so the
+        # forecast has a spread of pay-delay histories to work with
+        lateness = {shop.tenant_id: self.random.choice([3, 10, 40, 75, 120]) for shop in occupied}
+
+        created = 0
+        for day_index, day in enumerate(days):
+            day_count = int(count * (day_index + 1) / len(days)) - created
+            payments = []
+            for _ in range(day_count):
+                shop = self.random.choice(occupied)
+                # Size payments so each shop pays roughly its rent every month
+                amount = (shop.monthly_rent * months / Decimal(per_shop)
+                          * Decimal(self.random.uniform(0.5, 1.5))).quantize(Decimal('0.01'))
+                amount = max(amount, Decimal('1.00'))
+                payment_status = self.random.choices(['completed', 'pending', 'failed'], [95, 3, 2])[0]
+                if payment_status == 'completed':
+                    total_paid[shop.id] += amount
+                payments.append(Payment(
+                    shop=shop,
+                    tenant_id=shop.tenant_id,
+                    amount=amount,
+                    payment_method=self.random.choice(methods),
+                    payment_month=day.strftime('%Y-%m'),
+                    month=day.replace(day=1),
+                    status=payment_status,
+                    reference=shop.shop_number,
+                    balance_before=shop.monthly_rent,
+                    balance_after=max(shop.monthly_rent - amount, Decimal('0.00')),
+                    due_date=day - timedelta(days=self.random.randint(-5, lateness[shop.tenant_id]))
+                ))
+            if not payments:
+                continue
+
+            payments = Payment.objects.bulk_create(payments, batch_size=self.batch_size)
+            # payment_date is auto_now_add, so bulk_create stamps it with now;
+            # backdate the day's rows with one UPDATE
+            paid_at = timezone.make_aware(datetime.combine(day, day_time(self.random.randint(8, 19))))
+            Payment.objects.filter(id__in=[payment.id for payment in payments]).update(payment_date=paid_at)
+            created += len(payments)
+
+        for shop in occupied:
+            shop.total_paid = total_paid[shop.id]
+        Shop.objects.bulk_update(occupied, ['total_paid'], batch_size=self.batch_size)
+        return created
+
+    def create_profile_requests(self, tenants, count):
+        if not tenants:
+            return 0
+        requests = []
+        for index in range(count):
+            tenant = self.random.choice(tenants)
+            requests.append(ProfileChangeRequest(
+                tenant=tenant,
+                requested_changes={'phone_number': f'07{self.random.randrange(10 ** 8):08d}'},
+                reason='Changed phone number',
+                status=self.random.choices(['pending', 'approved', 'rejected'], [60, 30, 10])[0]
+            ))
+        return len(ProfileChangeRequest.objects.bulk_create(requests, batch_size=self.batch_size))
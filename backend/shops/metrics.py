@@ -0,0 +1,20 @@
+"""Payment counters exported at /metrics"""
+from django.db import transaction
+from backend.metrics import registry
+
+PAYMENTS_PROCESSED = registry.counter(
+    'payments_processed_total', 'Payments recorded, by method and source (api or import)', ['method', 'source']
+)
+PAYMENT_AMOUNT = registry.counter(
+    'payment_amount_total', 'Sum of recorded payment amounts, by method', ['method']
+)
+
+
+def count_payments(payments, source):
+    """Count payments once the transaction that records them commits"""
+    def record():
+        for payment in payments:
+            PAYMENTS_PROCESSED.inc(method=payment.payment_method, source=source)
+            PAYMENT_AMOUNT.inc(float(payment.amount), method=payment.payment_method)
+
+    transaction.on_commit(record)
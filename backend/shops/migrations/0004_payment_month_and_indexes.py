@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:22
+
+from datetime import datetime
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_payment_month(apps, schema_editor):
+    """Fill the month column from payment_month, falling back to payment_date"""
+    Payment = apps.get_model('shops', 'Payment')
+    batch = []
+    for payment in Payment.objects.filter(month__isnull=True).only('id', 'payment_month', 'payment_date').iterator(chunk_size=2000):
+        try:
+            payment.month = datetime.strptime(payment.payment_month, '%Y-%m').date()
+        except ValueError:
+            payment.month = timezone.localdate(payment.payment_date).replace(day=1)
+        batch.append(payment)
+        if len(batch) >= 2000:
+            Payment.objects.bulk_update(batch, ['month'])
+            batch = []
+    if batch:
+        Payment.objects.bulk_update(batch, ['month'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0003_monthlyrevenue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='month',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_payment_month, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['tenant', 'status', '-payment_date'], name='payment_tenant_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['shop', 'status', '-payment_date'], name='payment_shop_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'completed')), fields=['-payment_date'], name='payment_completed_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'completed')), fields=['month'], name='payment_completed_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(condition=models.Q(('is_occupied', True)), fields=['tenant'], name='shop_occupied_tenant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(condition=models.Q(('is_occupied', False)), fields=['shop_number'], name='shop_vacant_number_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0005_paymentidempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(fields=['is_occupied', 'next_due_date'], name='shop_occupied_due_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0007_dailyrevenue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='due_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
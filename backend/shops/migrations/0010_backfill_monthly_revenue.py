@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_monthly_revenue(apps, schema_editor):
+    """
+    Rebuild MonthlyRevenue from the ledger and the archive, as the
+    rebuild_monthly_revenue command does. The table was created empty, so
+    until now it only held payments made after 0003 was applied.
+    """
+    MonthlyRevenue = apps.get_model('shops', 'MonthlyRevenue')
+    totals = {}
+    for model_name in ('Payment', 'PaymentArchive'):
+        buckets = apps.get_model('shops', model_name).objects.filter(
+            status='completed', month__isnull=False
+        ).order_by().values_list('month', 'tenant_id', 'shop_id', 'payment_method').annotate(
+            total_amount=Sum('amount'),
+            payment_count=Count('id')
+        )
+        for *key, total_amount, payment_count in buckets.iterator():
+            amount, count = totals.get(tuple(key), (0, 0))
+            totals[tuple(key)] = (amount + total_amount, count + payment_count)
+
+    MonthlyRevenue.objects.all().delete()
+    MonthlyRevenue.objects.bulk_create([
+        MonthlyRevenue(
+            month=month,
+            tenant_id=tenant_id,
+            shop_id=shop_id,
+            payment_method=payment_method,
+            total_amount=total_amount,
+            payment_count=payment_count
+        )
+        for (month, tenant_id, shop_id, payment_method), (total_amount, payment_count) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0009_paymentarchive'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_monthly_revenue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_revenue(apps, schema_editor):
+    """
+    Rebuild DailyRevenue from the ledger and the archive, as the
+    rebuild_daily_revenue command does. The table was created empty, so
+    the revenue series showed nothing before 0007 was applied.
+    """
+    DailyRevenue = apps.get_model('shops', 'DailyRevenue')
+    totals = {}
+    for model_name in ('Payment', 'PaymentArchive'):
+        buckets = apps.get_model('shops', model_name).objects.filter(status='completed').order_by().values_list(
+            TruncDate('payment_date', tzinfo=timezone.get_current_timezone()),
+            'payment_method'
+        ).annotate(
+            total_amount=Sum('amount'),
+            payment_count=Count('id')
+        )
+        for day, payment_method, total_amount, payment_count in buckets.iterator():
+            amount, count = totals.get((day, payment_method), (0, 0))
+            totals[(day, payment_method)] = (amount + total_amount, count + payment_count)
+
+    DailyRevenue.objects.all().delete()
+    DailyRevenue.objects.bulk_create([
+        DailyRevenue(
+            day=day,
+            payment_method=payment_method,
+            total_amount=total_amount,
+            payment_count=payment_count
+        )
+        for (day, payment_method), (total_amount, payment_count) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0010_backfill_monthly_revenue'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_revenue, migrations.RunPython.noop),
+    ]
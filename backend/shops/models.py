@@ -1,11 +1,67 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import ExtractDay
+from django.utils import timezone
+from collections import defaultdict
 from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+from decimal import Decimal
+from .rent_schedule import RentState, apply_payment
+
+
+def month_from_string(value):
+    """Parse a "YYYY-MM" payment month into the first day of that month"""
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except (TypeError, ValueError):
+        return None
+
+
+class ShopQuerySet(models.QuerySet):
+
+    def with_payment_status(self, today=None):
+        """
+        Annotate payment_state (no_payments, paid_in_advance, overdue,
+        due_today or due, in the order get_payment_status checks them) and
+        days_overdue (0 unless overdue) so arrears can be filtered, sorted
+        and counted in SQL
+        """
+        today = today or timezone.localdate()
+        overdue = models.Q(balance__gt=0, next_due_date__lt=today)
+        return self.annotate(
+            payment_state=models.Case(
+                models.When(next_due_date__isnull=True, then=models.Value(Shop.NO_PAYMENTS)),
+                models.When(balance__lte=0, then=models.Value(Shop.PAID_IN_ADVANCE)),
+                models.When(next_due_date__lt=today, then=models.Value(Shop.OVERDUE)),
+                models.When(next_due_date=today, then=models.Value(Shop.DUE_TODAY)),
+                default=models.Value(Shop.DUE),
+                output_field=models.CharField()
+            ),
+            days_overdue=models.Case(
+                models.When(overdue, then=ExtractDay(models.Value(today) - models.F('next_due_date'))),
+                default=models.Value(0),
+                output_field=models.IntegerField()
+            )
+        )
+
+    def overdue(self, min_days=1, today=None):
+        """Occupied shops at least min_days overdue; served by shop_occupied_due_date_idx"""
+        today = today or timezone.localdate()
+        return self.filter(
+            is_occupied=True,
+            balance__gt=0,
+            next_due_date__lte=today - timedelta(days=min_days)
+        ).with_payment_status(today)
+
 
 class Shop(models.Model):
     """Model representing a shop in the mall"""
     
+    NO_PAYMENTS = 'no_payments'
+    PAID_IN_ADVANCE = 'paid_in_advance'
+    OVERDUE = 'overdue'
+    DUE_TODAY = 'due_today'
+    DUE = 'due'
+    
     shop_number = models.CharField(max_length=10, unique=True)
     tenant = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
@@ -27,40 +83,26 @@ class Shop(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ShopQuerySet.as_manager()
+    
     def __str__(self):
         return f"Shop {self.shop_number}"
     
+    @property
+    def rent_state(self):
+        return RentState(self.balance, self.next_due_date, self.total_paid)
+    
     def update_balance_and_due_date(self, payment_amount):
         """
         Update balance and due date after a payment
         Handles overpayments by advancing the due date
         """
-        from decimal import Decimal
-        payment_amount = Decimal(str(payment_amount))
-        
-        # Add payment to total paid
-        self.total_paid += payment_amount
-        
-        # Calculate new balance (negative balance means advance payment)
-        if not self.next_due_date:
-            # First payment - set initial due date to next month
-            self.next_due_date = datetime.now().date() + relativedelta(months=1)
-            self.balance = self.monthly_rent - payment_amount
-        else:
-            # Reduce balance
-            self.balance -= payment_amount
-            
-            # If overpaid (balance is negative), advance due date
-            while self.balance <= 0 and abs(self.balance) >= self.monthly_rent:
-                months_paid = int(abs(self.balance) // self.monthly_rent)
-                self.next_due_date += relativedelta(months=months_paid)
-                self.balance += (months_paid * self.monthly_rent)
-            
-            # If there's still negative balance but less than monthly rent, just advance one month
-            if self.balance < 0:
-                self.next_due_date += relativedelta(months=1)
-                self.balance = self.monthly_rent + self.balance  # balance is negative
-        
+        self.balance, self.next_due_date, self.total_paid = apply_payment(
+            self.monthly_rent,
+            self.rent_state,
+            payment_amount,
+            today=datetime.now().date()
+        )
         self.save()
     
     def get_payment_status(self):
@@ -82,6 +124,14 @@ class Shop(models.Model):
     
     class Meta:
         ordering = ['shop_number']
+        indexes = [
+            # tenant_shops and the analytics views only look at occupied shops
+            models.Index(fields=['tenant'], condition=models.Q(is_occupied=True), name='shop_occupied_tenant_idx'),
+            # available_shops lists vacant shops by shop number
+            models.Index(fields=['shop_number'], condition=models.Q(is_occupied=False), name='shop_vacant_number_idx'),
+            # overdue_shops walks occupied shops by due date
+            models.Index(fields=['is_occupied', 'next_due_date'], name='shop_occupied_due_date_idx'),
+        ]
 
 
 class Payment(models.Model):
@@ -105,17 +155,245 @@ class Payment(models.Model):
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES)
     payment_date = models.DateTimeField(auto_now_add=True)
     payment_month = models.CharField(max_length=7)  # Format: "2024-11"
+    month = models.DateField(null=True, blank=True)  # First day of payment_month, indexed for month filters
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='completed')
     reference = models.CharField(max_length=100, blank=True)
     
     # Additional tracking
     balance_before = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     balance_after = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # The shop's next due date when the payment arrived; compared with
+    # payment_date for each tenant's pay-delay history
+    due_date = models.DateField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"Payment {self.amount} for Shop {self.shop.shop_number} - {self.payment_month}"
     
+    def save(self, *args, **kwargs):
+        # Keep the indexed month column in step with payment_month
+        if not self.month:
+            self.month = month_from_string(self.payment_month) or timezone.localdate().replace(day=1)
+        super().save(*args, **kwargs)
+    
+    class Meta:
+        ordering = ['-payment_date']
+        indexes = [
+            # tenant_shops, payment_history and analytics filter on these
+            models.Index(fields=['tenant', 'status', '-payment_date'], name='payment_tenant_status_date_idx'),
+            models.Index(fields=['shop', 'status', '-payment_date'], name='payment_shop_status_date_idx'),
+            # Only completed payments count as revenue
+            models.Index(fields=['-payment_date'], condition=models.Q(status='completed'), name='payment_completed_date_idx'),
+            models.Index(fields=['month'], condition=models.Q(status='completed'), name='payment_completed_month_idx'),
+        ]
+
+
+class PaymentIdempotencyKey(models.Model):
+    """
+    Client-supplied Idempotency-Key for make_payment.
+    Stores the original response so a retried request is answered from
+    here instead of creating a second payment.
+    """
+    
+    key = models.CharField(max_length=255, unique=True)
+    request_fingerprint = models.CharField(max_length=64)
+    payment = models.OneToOneField(
+        Payment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='idempotency_key'
+    )
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Idempotency key {self.key}"
+
+class PaymentArchive(models.Model):
+    """
+    Completed and failed payments of removed tenants, moved out of the live
+    ledger in batches by the archive_tenant_payments job. Keeps the original
+    id and what the revenue rollups are rebuilt from; the tenant and shop
+    are plain references without constraints so nothing cascades into here.
+    """
+    
+    id = models.BigIntegerField(primary_key=True)  # The Payment's id
+    shop = models.ForeignKey(Shop, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    tenant = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_method = models.CharField(max_length=20, choices=Payment.PAYMENT_METHOD_CHOICES)
+    payment_date = models.DateTimeField()
+    month = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=Payment.STATUS_CHOICES)
+    reference = models.CharField(max_length=100, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    # Columns copied from Payment, in this model's field order
+    COPIED_FIELDS = ('id', 'shop_id', 'tenant_id', 'amount', 'payment_method', 'payment_date', 'month', 'status', 'reference')
+    
+    def __str__(self):
+        return f"Archived payment {self.id} {self.amount}"
+    
+    class Meta:
+        ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['tenant', '-payment_date'], name='payment_archive_tenant_idx'),
+        ]
+
+
+class MonthlyRevenue(models.Model):
+    """
+    Rollup of completed payments per month, tenant, shop and payment method.
+    Kept current by make_payment and rebuilt from the ledger with the
+    rebuild_monthly_revenue management command.
+    """
+    
+    month = models.DateField()  # First day of the month
+    tenant = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='monthly_revenue'
+    )
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='monthly_revenue')
+    payment_method = models.CharField(max_length=20, choices=Payment.PAYMENT_METHOD_CHOICES)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payment_count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.month:%Y-%m} Shop {self.shop_id} {self.payment_method}: {self.total_amount}"
+    
+    @classmethod
+    def current_month(cls):
+        return timezone.localdate().replace(day=1)
+    
+    @classmethod
+    def record_payment(cls, payment):
+        """
+        Add a completed payment to its rollup row.
+        Call inside the transaction that creates the payment.
+        """
+        row, _ = cls.objects.get_or_create(
+            month=payment.month,
+            tenant_id=payment.tenant_id,
+            shop_id=payment.shop_id,
+            payment_method=payment.payment_method
+        )
+        cls.objects.filter(pk=row.pk).update(
+            total_amount=models.F('total_amount') + payment.amount,
+            payment_count=models.F('payment_count') + 1
+        )
+    
+    @classmethod
+    def record_payments(cls, payments):
+        """
+        Add a batch of completed payments to the rollup with one read and
+        at most one bulk update and one bulk insert.
+        Call inside the transaction that creates the payments, with the
+        payments' shops already locked.
+        """
+        totals = defaultdict(lambda: [Decimal('0'), 0])
+        for payment in payments:
+            bucket = totals[(payment.month, payment.tenant_id, payment.shop_id, payment.payment_method)]
+            bucket[0] += payment.amount
+            bucket[1] += 1
+        if not totals:
+            return
+        
+        existing = cls.objects.select_for_update().filter(
+            month__in={key[0] for key in totals},
+            shop_id__in={key[2] for key in totals}
+        )
+        to_update = []
+        for row in existing:
+            key = (row.month, row.tenant_id, row.shop_id, row.payment_method)
+            if key in totals:
+                amount, count = totals.pop(key)
+                row.total_amount += amount
+                row.payment_count += count
+                to_update.append(row)
+        
+        cls.objects.bulk_update(to_update, ['total_amount', 'payment_count'])
+        cls.objects.bulk_create([
+            cls(
+                month=month,
+                tenant_id=tenant_id,
+                shop_id=shop_id,
+                payment_method=payment_method,
+                total_amount=amount,
+                payment_count=count
+            )
+            for (month, tenant_id, shop_id, payment_method), (amount, count) in totals.items()
+        ])
+    
+    class Meta:
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'tenant', 'shop', 'payment_method'],
+                name='unique_monthly_revenue_bucket'
+            ),
+        ]
+
+
+class DailyRevenue(models.Model):
+    """
+    Completed payments collected per day and payment method, by payment date.
+    Backs the revenue time series; kept current by make_payment and the
+    statement import and rebuilt with the rebuild_daily_revenue command.
+    """
+    
+    day = models.DateField()
+    payment_method = models.CharField(max_length=20, choices=Payment.PAYMENT_METHOD_CHOICES)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payment_count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.day} {self.payment_method}: {self.total_amount}"
+    
+    @classmethod
+    def record_payment(cls, payment):
+        """
+        Add a completed payment to its day's row.
+        Call inside the transaction that creates the payment, as its last
+        write: every payment of the day updates the same row, and its lock
+        is held until that transaction commits.
+        """
+        cls.record_payments([payment])
+    
+    @classmethod
+    def record_payments(cls, payments):
+        """
+        Add a batch of completed payments: one INSERT ... ON CONFLICT DO
+        NOTHING for missing rows, then one UPDATE per day and method. A
+        batch rarely spans more than a few, and the rows are updated in
+        sorted order so concurrent batches cannot deadlock.
+        """
+        totals = defaultdict(lambda: [Decimal('0'), 0])
+        for payment in payments:
+            bucket = totals[(timezone.localdate(payment.payment_date), payment.payment_method)]
+            bucket[0] += payment.amount
+            bucket[1] += 1
+        if not totals:
+            return
+        
+        cls.objects.bulk_create(
+            [cls(day=day, payment_method=payment_method) for day, payment_method in totals],
+            ignore_conflicts=True
+        )
+        for (day, payment_method), (amount, count) in sorted(totals.items()):
+            cls.objects.filter(day=day, payment_method=payment_method).update(
+                total_amount=models.F('total_amount') + amount,
+                payment_count=models.F('payment_count') + count
+            )
+    
     class Meta:
-        ordering = ['-payment_date']
\ No newline at end of file
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'payment_method'], name='unique_daily_revenue_bucket'),
+        ]
@@ -0,0 +1,67 @@
+"""
+Rent schedule engine.
+
+Pure, side-effect-free functions that apply a payment to a shop's rent
+state (balance, next due date, total paid) with exact Decimal arithmetic.
+Used by Shop.update_balance_and_due_date and by batch recomputations that
+work on many shops at once.
+"""
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+
+CENT = Decimal('0.01')
+
+# Largest value the numeric(10, 2) money columns hold
+MAX_AMOUNT = Decimal('99999999.99')
+
+RentState = namedtuple('RentState', ['balance', 'next_due_date', 'total_paid'])
+
+
+def to_amount(value):
+    """Convert a user-supplied amount to an exact two-place Decimal"""
+    return Decimal(str(value)).quantize(CENT)
+
+
+def apply_payment(monthly_rent, state, amount, today=None):
+    """
+    Return the RentState after paying `amount` against `state`.
+
+    A negative balance means rent paid in advance: every whole month of
+    credit moves the due date forward a month, and any remaining part month
+    also advances it once, leaving that part of the next month outstanding.
+    The first payment on a shop with no due date starts the schedule a month
+    from `today`.
+    """
+    monthly_rent = Decimal(monthly_rent)
+    amount = Decimal(amount)
+    total_paid = state.total_paid + amount
+
+    if not state.next_due_date:
+        today = today or date.today()
+        return RentState(monthly_rent - amount, today + relativedelta(months=1), total_paid)
+
+    balance = state.balance - amount
+    next_due_date = state.next_due_date
+
+    if balance < 0:
+        whole_months = -balance // monthly_rent
+        balance += whole_months * monthly_rent
+        # Whole months and the part month are added as two steps, which
+        # keeps month-end due dates where the original schedule put them
+        if whole_months:
+            next_due_date += relativedelta(months=int(whole_months))
+        if balance < 0:
+            next_due_date += relativedelta(months=1)
+            balance += monthly_rent
+
+    return RentState(balance, next_due_date, total_paid)
+
+
+def apply_payments(monthly_rents, states, amounts, today=None):
+    """Apply one payment per shop over parallel sequences of shops"""
+    return [
+        apply_payment(monthly_rent, state, amount, today)
+        for monthly_rent, state, amount in zip(monthly_rents, states, amounts)
+    ]
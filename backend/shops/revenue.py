@@ -0,0 +1,126 @@
+"""
+Revenue time series.
+
+Series are read from the DailyRevenue rollup (one row per day and payment
+method), never from the Payment ledger, so a multi-year curve is a GROUP BY
+over at most a few thousand rows however many payments there are. Weeks
+start on Monday and are labelled with that Monday; months are labelled
+with their first day. Periods without payments are returned as zeros so
+charts get an unbroken axis.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.db import connection
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from .models import DailyRevenue, Payment, PaymentArchive
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# How far back a series goes when no start date is given
+DEFAULT_SPANS = {'day': 90, 'week': 52, 'month': 24}
+
+# Upper bound on the number of points in one response
+MAX_POINTS = {'day': 3660, 'week': 1000, 'month': 600}
+
+
+def lock_ledger():
+    """
+    Hold back new and archived payments until the current transaction ends,
+    so a rollup rebuilt from the ledger counts none of them twice or misses
+    them. On PostgreSQL, SHARE mode still lets readers through. The archive
+    is locked first: an archive batch writes it before it deletes from the
+    ledger. Other databases are left unlocked.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {PaymentArchive._meta.db_table}, {Payment._meta.db_table} IN SHARE MODE'
+            )
+
+
+def period_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return start + relativedelta(months=1)
+    return start + timedelta(days=1)
+
+
+def default_start(end, granularity):
+    span = DEFAULT_SPANS[granularity]
+    start = period_start(end, granularity)
+    if granularity == 'month':
+        return start - relativedelta(months=span - 1)
+    step = 7 if granularity == 'week' else 1
+    return start - timedelta(days=step * (span - 1))
+
+
+def count_periods(start, end, granularity):
+    start = period_start(start, granularity)
+    end = period_start(end, granularity)
+    if granularity == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    step = 7 if granularity == 'week' else 1
+    return (end - start).days // step + 1
+
+
+def build_revenue_series(granularity, start, end):
+    """
+    Collections per period from start to end inclusive, split by payment
+    method. start is moved back to the beginning of its period.
+    """
+    start = period_start(start, granularity)
+    rows = DailyRevenue.objects.filter(day__gte=start, day__lte=end)
+    if granularity == 'week':
+        rows = rows.annotate(period=TruncWeek('day'))
+    elif granularity == 'month':
+        rows = rows.annotate(period=TruncMonth('day'))
+    else:
+        rows = rows.annotate(period=F('day'))
+    grouped = rows.order_by().values('period', 'payment_method').annotate(
+        amount=Sum('total_amount'),
+        count=Sum('payment_count')
+    )
+
+    totals = defaultdict(dict)
+    for group in grouped:
+        totals[group['period']][group['payment_method']] = (group['amount'], group['count'])
+
+    methods = [method for method, _ in Payment.PAYMENT_METHOD_CHOICES]
+    points = []
+    period = start
+    while period <= end:
+        by_method = totals.get(period, {})
+        points.append({
+            'period': period.isoformat(),
+            'total_amount': float(sum((amount for amount, _ in by_method.values()), Decimal('0'))),
+            'payment_count': sum(count for _, count in by_method.values()),
+            'by_method': {
+                method: {
+                    'amount': float(by_method.get(method, (0, 0))[0]),
+                    'count': by_method.get(method, (0, 0))[1]
+                }
+                for method in methods
+            }
+        })
+        period = next_period(period, granularity)
+
+    return {
+        'granularity': granularity,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'total_amount': round(sum(point['total_amount'] for point in points), 2),
+        'payment_count': sum(point['payment_count'] for point in points),
+        'series': points
+    }
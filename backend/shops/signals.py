@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .aging import invalidate_aging_report
+from .cache import invalidate_available_shops, is_listed
+from .models import Shop
+
+
+def _invalidate():
+    # Drop the listing now and again once the transaction commits, so a
+    # request that refilled it from pre-commit data cannot pin stale shops
+    invalidate_available_shops()
+    transaction.on_commit(invalidate_available_shops)
+
+
+@receiver(post_save, sender=Shop)
+def shop_saved(sender, instance, **kwargs):
+    # Any balance, due date or occupancy change can move the aging report
+    invalidate_aging_report()
+    # Payments on occupied shops save the shop too but never change the listing
+    if is_listed(instance):
+        _invalidate()
+
+
+@receiver(post_delete, sender=Shop)
+def shop_deleted(sender, instance, **kwargs):
+    invalidate_aging_report()
+    if is_listed(instance):
+        _invalidate()
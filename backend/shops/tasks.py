@@ -0,0 +1,22 @@
+from django.conf import settings
+from jobs.queue import enqueue, task
+from .archive import archive_payments
+from .models import Payment
+
+
+@task('archive_tenant_payments')
+def archive_tenant_payments(payload):
+    """Archive one batch, then queue the next one while payments remain"""
+    moved = archive_payments(payload['tenant_id'], settings.PAYMENT_ARCHIVE_BATCH_SIZE)
+    result = {
+        'tenant_id': payload['tenant_id'],
+        'archived': moved,
+        'total_archived': payload.get('total_archived', 0) + moved
+    }
+    if Payment.objects.filter(tenant_id=payload['tenant_id']).exists():
+        job = enqueue('archive_tenant_payments', {
+            'tenant_id': payload['tenant_id'],
+            'total_archived': result['total_archived']
+        })
+        result['next_job_id'] = job.id
+    return result
@@ -1,5 +1,956 @@
-from django.test import TestCase
+import base64
+import importlib
+import json
+import os
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from decimal import Decimal
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+from unittest import skipUnless
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from admin_dashboard.models import ProfileChangeRequest
+from backend import metrics
+from user_accounts.models import User
+from .models import Shop, Payment, MonthlyRevenue, DailyRevenue, PaymentIdempotencyKey
+from .rent_schedule import RentState, apply_payment, apply_payments
+from .imports import import_payments
+from .cache import available_shops_stats
+from .management.commands.benchmark_api import route_labels
 
-class SimpleTest(TestCase):
-    def test_addition(self):
-        self.assertEqual(1 + 1, 2)
+
+class ShopTestMixin:
+    """Helpers for creating tenants and shops"""
+
+    def create_tenant(self, index=1):
+        return User.objects.create(
+            email=f'tenant{index}@example.com',
+            username=f'tenant{index}',
+            first_name='Tenant',
+            last_name=str(index),
+            user_type='tenant'
+        )
+
+    def create_shop(self, shop_number, tenant=None, monthly_rent=Decimal('500000.00')):
+        return Shop.objects.create(
+            shop_number=shop_number,
+            tenant=tenant,
+            monthly_rent=monthly_rent,
+            balance=monthly_rent if tenant else 0,
+            is_occupied=tenant is not None
+        )
+
+
+def legacy_apply_payment(monthly_rent, state, amount, today):
+    """The original loop-based Shop.update_balance_and_due_date, kept as a reference"""
+    balance, next_due_date, total_paid = state
+    total_paid += amount
+    if not next_due_date:
+        return RentState(monthly_rent - amount, today + relativedelta(months=1), total_paid)
+    balance -= amount
+    while balance <= 0 and abs(balance) >= monthly_rent:
+        months_paid = int(abs(balance) // monthly_rent)
+        next_due_date += relativedelta(months=months_paid)
+        balance += (months_paid * monthly_rent)
+    if balance < 0:
+        next_due_date += relativedelta(months=1)
+        balance = monthly_rent + balance
+    return RentState(balance, next_due_date, total_paid)
+
+
+class RentScheduleTests(TestCase):
+    """Property tests comparing the rent schedule engine with the original loop"""
+
+    today = date(2025, 1, 31)
+
+    def random_due_date(self, rng):
+        choice = rng.random()
+        if choice < 0.1:
+            return None
+        if choice < 0.4:
+            # Month-end dates are where month arithmetic can drift
+            return date(2024, rng.randint(1, 12), 1) + relativedelta(day=31)
+        return date(2024, 1, 1) + relativedelta(days=rng.randint(0, 730))
+
+    def random_case(self, rng):
+        rent_cents = rng.randint(100_000, 500_000_000)
+        monthly_rent = Decimal(rent_cents).scaleb(-2)
+        state = RentState(
+            balance=Decimal(rng.randint(-rent_cents, 3 * rent_cents)).scaleb(-2),
+            next_due_date=self.random_due_date(rng),
+            total_paid=Decimal(rng.randint(0, 1_000_000_000)).scaleb(-2)
+        )
+        # Mix partial, exact-multiple and many-months payments
+        amount = rng.choice([
+            Decimal(rng.randint(1, 5 * rent_cents)).scaleb(-2),
+            monthly_rent * rng.randint(1, 36),
+            state.balance + monthly_rent * rng.randint(0, 3),
+        ])
+        return monthly_rent, state, max(amount, Decimal('0.01'))
+
+    def test_matches_original_behaviour(self):
+        """Test random payments give exactly the same state as the original loop"""
+        rng = random.Random(20250131)
+        for _ in range(5000):
+            monthly_rent, state, amount = self.random_case(rng)
+            self.assertEqual(
+                apply_payment(monthly_rent, state, amount, today=self.today),
+                legacy_apply_payment(monthly_rent, state, amount, self.today),
+                msg=f'rent={monthly_rent} state={state} amount={amount}'
+            )
+
+    def test_advance_payment_properties(self):
+        """Test that the remaining balance is below one month's rent after an advance payment"""
+        rng = random.Random(7)
+        for _ in range(2000):
+            monthly_rent, state, amount = self.random_case(rng)
+            if not state.next_due_date:
+                continue
+            result = apply_payment(monthly_rent, state, amount)
+            self.assertEqual(result.total_paid, state.total_paid + amount)
+            if state.balance - amount < 0:
+                self.assertGreaterEqual(result.balance, 0)
+                self.assertLess(result.balance, monthly_rent)
+                self.assertGreater(result.next_due_date, state.next_due_date)
+
+    def test_batch_matches_single(self):
+        """Test that the batch form gives the same result per shop"""
+        rng = random.Random(3)
+        cases = [self.random_case(rng) for _ in range(100)]
+        rents, states, amounts = zip(*cases)
+        self.assertEqual(
+            apply_payments(rents, states, amounts, today=self.today),
+            [apply_payment(r, s, a, today=self.today) for r, s, a in cases]
+        )
+
+    def test_benchmark_command(self):
+        """Test that benchmark_payments reports engine throughput"""
+        out = StringIO()
+        call_command('benchmark_payments', cases=100, workers=0, stdout=out)
+        self.assertIn('apply_payment:', out.getvalue())
+
+
+class MonthlyRevenueTests(ShopTestMixin, TestCase):
+    """Test suite for the monthly revenue rollup"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.payment_url = '/api/shops/payment/make/'
+        self.tenant = self.create_tenant()
+        self.shop = self.create_shop('A001', tenant=self.tenant)
+
+    def pay(self, amount, method='mobile_money'):
+        return self.client.post(self.payment_url, {
+            'shop_id': self.shop.id,
+            'tenant_id': self.tenant.id,
+            'amount': amount,
+            'payment_method': method
+        }, format='json')
+
+    def test_make_payment_updates_rollup(self):
+        """Test that each payment is added to its month/shop/method bucket"""
+        self.pay(100000)
+        self.pay(50000)
+        self.pay(25000, method='cash')
+
+        row = MonthlyRevenue.objects.get(shop=self.shop, payment_method='mobile_money')
+        self.assertEqual(row.month, MonthlyRevenue.current_month())
+        self.assertEqual(row.tenant, self.tenant)
+        self.assertEqual(row.total_amount, Decimal('150000.00'))
+        self.assertEqual(row.payment_count, 2)
+        self.assertEqual(MonthlyRevenue.objects.count(), 2)
+
+    def test_rebuild_command_matches_incremental_rollup(self):
+        """Test that rebuilding from the ledger gives the same rollup"""
+        self.pay(100000)
+        self.pay(25000, method='cash')
+        # Payments that are not completed never count as revenue
+        Payment.objects.create(
+            shop=self.shop,
+            tenant=self.tenant,
+            amount=Decimal('999.00'),
+            payment_method='cash',
+            payment_month='2025-01',
+            status='failed'
+        )
+        fields = ('month', 'tenant_id', 'shop_id', 'payment_method', 'total_amount', 'payment_count')
+        incremental = sorted(MonthlyRevenue.objects.values_list(*fields))
+
+        MonthlyRevenue.objects.all().delete()
+        call_command('rebuild_monthly_revenue', stdout=StringIO())
+
+        self.assertEqual(sorted(MonthlyRevenue.objects.values_list(*fields)), incremental)
+
+    def test_migration_backfills_rollup(self):
+        """Test that the backfill migration rebuilds the rollup from the ledger"""
+        self.pay(100000)
+        self.pay(25000, method='cash')
+        fields = ('month', 'tenant_id', 'shop_id', 'payment_method', 'total_amount', 'payment_count')
+        incremental = sorted(MonthlyRevenue.objects.values_list(*fields))
+
+        MonthlyRevenue.objects.all().delete()
+        migration = importlib.import_module('shops.migrations.0010_backfill_monthly_revenue')
+        migration.backfill_monthly_revenue(apps, None)
+
+        self.assertEqual(sorted(MonthlyRevenue.objects.values_list(*fields)), incremental)
+
+    def test_make_payment_updates_daily_rollup(self):
+        """Test that each payment is added to its day/method bucket"""
+        self.pay(100000)
+        self.pay(50000)
+        self.pay(25000, method='cash')
+
+        rows = DailyRevenue.objects.order_by('payment_method').values_list(
+            'day', 'payment_method', 'total_amount', 'payment_count'
+        )
+        today = timezone.localdate()
+        self.assertEqual(list(rows), [
+            (today, 'cash', Decimal('25000.00'), 1),
+            (today, 'mobile_money', Decimal('150000.00'), 2),
+        ])
+
+    def test_rebuild_daily_command_matches_incremental_rollup(self):
+        """Test that rebuilding the daily rollup from the ledger gives the same rows"""
+        self.pay(100000)
+        self.pay(25000, method='cash')
+        fields = ('day', 'payment_method', 'total_amount', 'payment_count')
+        incremental = sorted(DailyRevenue.objects.values_list(*fields))
+
+        DailyRevenue.objects.all().delete()
+        call_command('rebuild_daily_revenue', stdout=StringIO())
+
+        self.assertEqual(sorted(DailyRevenue.objects.values_list(*fields)), incremental)
+
+    def test_migration_backfills_daily_rollup(self):
+        """Test that the backfill migration rebuilds the daily rollup from the ledger"""
+        self.pay(100000)
+        self.pay(25000, method='cash')
+        fields = ('day', 'payment_method', 'total_amount', 'payment_count')
+        incremental = sorted(DailyRevenue.objects.values_list(*fields))
+
+        DailyRevenue.objects.all().delete()
+        migration = importlib.import_module('shops.migrations.0011_backfill_daily_revenue')
+        migration.backfill_daily_revenue(apps, None)
+
+        self.assertEqual(sorted(DailyRevenue.objects.values_list(*fields)), incremental)
+
+    def test_dashboard_reads_rollup(self):
+        """Test that dashboard_stats reports this month's revenue from the rollup"""
+        self.pay(100000)
+        response = self.client.get('/api/admin/stats/')
+        self.assertEqual(response.data['monthly_revenue'], 100000.0)
+
+
+class IdempotentPaymentTests(ShopTestMixin, TestCase):
+    """Test suite for Idempotency-Key handling in make_payment"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/shops/payment/make/'
+        self.tenant = self.create_tenant()
+        self.shop = self.create_shop('A001', tenant=self.tenant)
+        self.data = {
+            'shop_id': self.shop.id,
+            'tenant_id': self.tenant.id,
+            'amount': 100000,
+            'payment_method': 'mobile_money'
+        }
+
+    def test_retry_returns_original_response(self):
+        """Test that a retried request does not record a second payment"""
+        first = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Payment.objects.count(), 1)
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.total_paid, Decimal('100000.00'))
+
+    def test_key_reused_for_different_payment(self):
+        """Test that reusing a key with a different body is rejected"""
+        self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        response = self.client.post(
+            self.url, {**self.data, 'amount': 5}, format='json', HTTP_IDEMPOTENCY_KEY='key-1'
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_failed_payment_does_not_consume_key(self):
+        """Test that a key is only stored once its payment has succeeded"""
+        response = self.client.post(
+            self.url, {**self.data, 'tenant_id': 0}, format='json', HTTP_IDEMPOTENCY_KEY='key-1'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(PaymentIdempotencyKey.objects.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Row locking is exercised against PostgreSQL')
+class ConcurrentPaymentTests(ShopTestMixin, TransactionTestCase):
+    """Stress test make_payment with many concurrent payments for one shop"""
+
+    workers = 20
+    payments_per_worker = 10
+    amount = 250
+
+    def setUp(self):
+        self.url = '/api/shops/payment/make/'
+        self.tenant = self.create_tenant()
+        self.shop = self.create_shop('A001', tenant=self.tenant, monthly_rent=Decimal('1000.00'))
+        self.reference_shop = self.create_shop('A002', tenant=self.tenant, monthly_rent=Decimal('1000.00'))
+
+    def pay(self, shop, client):
+        return client.post(self.url, {
+            'shop_id': shop.id,
+            'tenant_id': self.tenant.id,
+            'amount': self.amount,
+            'payment_method': 'mobile_money'
+        }, format='json')
+
+    def worker(self, index):
+        client = APIClient()
+        try:
+            return [
+                self.pay(self.shop, client).status_code
+                for _ in range(self.payments_per_worker)
+            ]
+        finally:
+            connection.close()
+
+    def test_concurrent_payments_are_serialized(self):
+        """Test that no concurrent payment is lost"""
+        total = self.workers * self.payments_per_worker
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            statuses = [code for codes in pool.map(self.worker, range(self.workers)) for code in codes]
+
+        self.assertEqual(statuses, [201] * total)
+
+        # The same payments applied one at a time must give the same state
+        client = APIClient()
+        for _ in range(total):
+            self.pay(self.reference_shop, client)
+
+        self.shop.refresh_from_db()
+        self.reference_shop.refresh_from_db()
+        self.assertEqual(Payment.objects.filter(shop=self.shop).count(), total)
+        self.assertEqual(self.shop.total_paid, Decimal(self.amount * total))
+        self.assertEqual(self.shop.balance, self.reference_shop.balance)
+        self.assertEqual(self.shop.next_due_date, self.reference_shop.next_due_date)
+        revenue = MonthlyRevenue.objects.get(shop=self.shop)
+        self.assertEqual(revenue.payment_count, total)
+
+    def test_benchmark_command(self):
+        """Test that benchmark_payments reports concurrent make_payment throughput"""
+        out = StringIO()
+        call_command('benchmark_payments', cases=10, workers=2, payments=2, shop='A001', stdout=out)
+        self.assertIn('4 concurrent payments for shop A001', out.getvalue())
+        self.assertIn('0 failed', out.getvalue())
+        self.assertEqual(Payment.objects.filter(shop=self.shop).count(), 4)
+
+
+class BulkImportTests(ShopTestMixin, TestCase):
+    """Test suite for bulk payment import"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.tenant = self.create_tenant()
+        self.shops = [self.create_shop(f'A{index:03d}', tenant=self.tenant) for index in range(3)]
+        self.create_shop('V001')
+
+    def test_report_per_row(self):
+        """Test that valid rows are imported and invalid ones reported"""
+        report = import_payments([
+            {'shop_number': 'A000', 'amount': '250000', 'payment_method': 'bank_transfer', 'reference': 'TX1'},
+            {'shop_number': 'ZZZ', 'amount': '100', 'payment_method': 'cash'},
+            {'shop_number': 'V001', 'amount': '100', 'payment_method': 'cash'},
+            {'shop_number': 'A001', 'amount': '-5', 'payment_method': 'cash'},
+            {'shop_number': 'A001', 'amount': '100', 'payment_method': 'cheque'},
+        ])
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['rejected'], 4)
+        self.assertEqual([r['status'] for r in report['results']],
+                         ['created', 'rejected', 'rejected', 'rejected', 'rejected'])
+        self.assertIn('does not exist', report['results'][1]['error'])
+        self.assertIn('not occupied', report['results'][2]['error'])
+
+        payment = Payment.objects.get()
+        self.assertEqual(payment.reference, 'TX1')
+        self.assertEqual(payment.month, MonthlyRevenue.current_month())
+        self.assertEqual(MonthlyRevenue.objects.get().total_amount, Decimal('250000.00'))
+
+    def test_rejects_unusable_amounts(self):
+        """Test that non-finite and oversized amounts are rejected row by row"""
+        cheap = self.create_shop('C000', tenant=self.tenant, monthly_rent=Decimal('1000.00'))
+        report = import_payments([
+            {'shop_number': 'A000', 'amount': 'NaN', 'payment_method': 'cash'},
+            {'shop_number': 'A000', 'amount': 'Infinity', 'payment_method': 'cash'},
+            {'shop_number': 'A000', 'amount': '1e12', 'payment_method': 'cash'},
+            {'shop_number': 'C000', 'amount': '1e7', 'payment_method': 'cash'},
+            {'shop_number': 'C000', 'amount': '1000', 'payment_method': 'cash'},
+        ])
+        self.assertEqual([r['status'] for r in report['results']], ['rejected'] * 4 + ['created'])
+        self.assertIn('months of rent', report['results'][3]['error'])
+        cheap.refresh_from_db()
+        self.assertEqual(cheap.total_paid, Decimal('1000.00'))
+
+    def test_rejects_duplicate_references(self):
+        """Test that a reference already recorded, or repeated in the batch, is not paid twice"""
+        row = {'shop_number': 'A000', 'amount': '1000', 'payment_method': 'bank_transfer', 'reference': 'TX9'}
+        report = import_payments([row, row, {**row, 'payment_method': 'mobile_money'}, {**row, 'shop_number': 'A001'}])
+        self.assertEqual([r['status'] for r in report['results']], ['created', 'rejected', 'created', 'created'])
+        self.assertIn('Duplicate reference', report['results'][1]['error'])
+
+        report = import_payments([row, {**row, 'reference': 'TX10'}])
+        self.assertEqual([r['status'] for r in report['results']], ['rejected', 'created'])
+        self.assertEqual(Payment.objects.filter(reference='TX9').count(), 3)
+
+    def test_matches_individual_payments(self):
+        """Test that a batch leaves shops as the same payments made one by one would"""
+        amounts = ['100000', '700000', '333333.33', '1500000']
+        twin = self.create_shop('B000', tenant=self.tenant)
+        for amount in amounts:
+            self.client.post('/api/shops/payment/make/', {
+                'shop_id': twin.id, 'tenant_id': self.tenant.id,
+                'amount': amount, 'payment_method': 'cash'
+            }, format='json')
+
+        import_payments([
+            {'shop_number': 'A000', 'amount': amount, 'payment_method': 'cash'} for amount in amounts
+        ])
+
+        shop = Shop.objects.get(shop_number='A000')
+        twin.refresh_from_db()
+        self.assertEqual(shop.rent_state, twin.rent_state)
+        self.assertEqual(
+            list(shop.payments.order_by('id').values_list('balance_before', 'balance_after')),
+            list(twin.payments.order_by('id').values_list('balance_before', 'balance_after'))
+        )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Test that the batch is written with a fixed number of queries"""
+        def rows(count):
+            return [
+                {'shop_number': shop.shop_number, 'amount': '1000', 'payment_method': 'cash'}
+                for shop in self.shops for _ in range(count)
+            ]
+
+        with CaptureQueriesContext(connection) as small:
+            import_payments(rows(1))
+        with CaptureQueriesContext(connection) as large:
+            import_payments(rows(50))
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(Payment.objects.count(), 3 * 51)
+
+
+class AvailableShopsCacheTests(ShopTestMixin, TestCase):
+    """Test suite for the cached available shops listing"""
+
+    def setUp(self):
+        cache.clear()
+        available_shops_stats.reset()
+        self.client = APIClient()
+        self.url = '/api/shops/available-shops/'
+        self.vacant = self.create_shop('B001')
+        self.tenant = self.create_tenant()
+        self.occupied = self.create_shop('A001', tenant=self.tenant)
+
+    def test_second_request_is_a_cache_hit(self):
+        """Test that a repeated request is served without touching the database"""
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual([s['shop_number'] for s in first.data['shops']], ['B001'])
+        self.assertEqual(available_shops_stats.snapshot()['hits'], 1)
+        self.assertEqual(available_shops_stats.snapshot()['misses'], 1)
+
+    def test_vacant_shop_change_invalidates(self):
+        """Test that saving or deleting a listed shop drops the cached listing"""
+        self.client.get(self.url)
+        self.vacant.monthly_rent = Decimal('750000.00')
+        self.vacant.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['shops'][0]['monthly_rent'], 750000.0)
+
+        self.vacant.delete()
+        self.assertEqual(self.client.get(self.url).data['shops'], [])
+
+    def test_occupying_a_shop_invalidates(self):
+        self.client.get(self.url)
+        self.vacant.tenant = self.tenant
+        self.vacant.is_occupied = True
+        self.vacant.save()
+        self.assertEqual(self.client.get(self.url).data['shops'], [])
+
+    def test_payment_keeps_cache(self):
+        """Test that payments on occupied shops do not invalidate the listing"""
+        self.client.get(self.url)
+        self.client.post('/api/shops/payment/make/', {
+            'shop_id': self.occupied.id, 'tenant_id': self.tenant.id,
+            'amount': 1000, 'payment_method': 'cash'
+        }, format='json')
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_conditional_requests(self):
+        """Test that clients can revalidate with ETag or Last-Modified"""
+        response = self.client.get(self.url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_stats_endpoint(self):
+        self.client.get(self.url)
+        response = self.client.get('/health/cache/')
+        self.assertEqual(response.json()['caches']['available_shops']['misses'], 1)
+
+
+class PaymentStatusAnnotationTests(ShopTestMixin, TestCase):
+    """Test the SQL payment status annotation and the overdue shops endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/shops/overdue/'
+        self.today = date.today()
+        self.tenant = self.create_tenant()
+
+    def create_due_shop(self, shop_number, days_overdue, balance=Decimal('500000.00')):
+        shop = self.create_shop(shop_number, tenant=self.tenant)
+        shop.balance = balance
+        shop.next_due_date = self.today - timedelta(days=days_overdue) if days_overdue is not None else None
+        shop.save()
+        return shop
+
+    def test_annotation_matches_get_payment_status(self):
+        self.create_due_shop('A001', None)
+        self.create_due_shop('A002', 10, balance=Decimal('0'))
+        self.create_due_shop('A003', 12)
+        self.create_due_shop('A004', 0)
+        self.create_due_shop('A005', -5)
+        labels = {
+            Shop.NO_PAYMENTS: 'No payments yet',
+            Shop.PAID_IN_ADVANCE: 'Paid in advance',
+            Shop.OVERDUE: 'Overdue by 12 days',
+            Shop.DUE_TODAY: 'Due today',
+            Shop.DUE: 'Due in 5 days',
+        }
+        shops = Shop.objects.with_payment_status(self.today).order_by('shop_number')
+        self.assertEqual(
+            [(shop.payment_state, shop.days_overdue) for shop in shops],
+            [(Shop.NO_PAYMENTS, 0), (Shop.PAID_IN_ADVANCE, 0), (Shop.OVERDUE, 12), (Shop.DUE_TODAY, 0), (Shop.DUE, 0)]
+        )
+        for shop in shops:
+            self.assertEqual(shop.get_payment_status(), labels[shop.payment_state])
+
+    def test_overdue_shops(self):
+        self.create_due_shop('A001', 45)
+        self.create_due_shop('A002', 5)
+        self.create_due_shop('A003', 90)
+        self.create_due_shop('A004', 60, balance=Decimal('0'))
+        self.create_due_shop('A005', -3)
+        vacant = self.create_due_shop('B001', 100)
+        Shop.objects.filter(id=vacant.id).update(is_occupied=False, tenant=None)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'min_days': 30})
+        self.assertEqual(response.status_code, 200)
+        shops = response.json()['shops']
+        self.assertEqual([shop['shop_number'] for shop in shops], ['A003', 'A001'])
+        self.assertEqual([shop['days_overdue'] for shop in shops], [90, 45])
+        self.assertEqual(shops[0]['tenant_email'], self.tenant.email)
+
+        response = self.client.get(self.url)
+        self.assertEqual([shop['shop_number'] for shop in response.json()['shops']], ['A003', 'A001', 'A002'])
+
+    def test_overdue_shops_pagination(self):
+        for index in range(5):
+            self.create_due_shop(f'A{index:03d}', 10 + index)
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(self.url, params).json()
+            seen += [shop['days_overdue'] for shop in data['shops']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, [14, 13, 12, 11, 10])
+
+    def test_invalid_min_days(self):
+        for value in ('0', '-3', 'soon'):
+            response = self.client.get(self.url, {'min_days': value})
+            self.assertEqual(response.status_code, 400)
+
+
+class TenantShopsTests(ShopTestMixin, TestCase):
+    """Test suite for the tenant shops endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.tenant = self.create_tenant()
+        self.url = f'/api/shops/tenant/{self.tenant.id}/shops/'
+
+    def add_shop(self, shop_number, payments=7):
+        shop = self.create_shop(shop_number, tenant=self.tenant)
+        Payment.objects.bulk_create([
+            Payment(
+                shop=shop, tenant=self.tenant, amount=Decimal(index + 1),
+                payment_method='cash', payment_month='2025-01', month=date(2025, 1, 1)
+            )
+            for index in range(payments)
+        ])
+        return shop
+
+    def test_recent_payments_per_shop(self):
+        """Test that each shop lists its own five most recent completed payments"""
+        self.add_shop('A001')
+        self.add_shop('A002', payments=2)
+        response = self.client.get(self.url)
+
+        first, second = response.data['shops']
+        self.assertEqual([p['amount'] for p in first['recent_payments']], [7.0, 6.0, 5.0, 4.0, 3.0])
+        self.assertEqual([p['amount'] for p in second['recent_payments']], [2.0, 1.0])
+
+    def test_previous_tenants_payments_are_hidden(self):
+        """Test that a shop's new tenant does not see payments of the tenant before"""
+        shop = self.add_shop('A001', payments=3)
+        previous = self.tenant
+        self.tenant = self.create_tenant(index=2)
+        Shop.objects.filter(id=shop.id).update(tenant=self.tenant)
+        Payment.objects.create(
+            shop=shop, tenant=self.tenant, amount=Decimal('9'), payment_method='cash', payment_month='2025-02'
+        )
+
+        response = self.client.get(f'/api/shops/tenant/{self.tenant.id}/shops/')
+        self.assertEqual([p['amount'] for p in response.data['shops'][0]['recent_payments']], [9.0])
+        self.assertEqual(Payment.objects.filter(shop=shop, tenant=previous).count(), 3)
+
+    def test_two_queries_whatever_the_shop_count(self):
+        self.add_shop('A001')
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        for index in range(2, 10):
+            self.add_shop(f'A{index:03d}')
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['shops']), 9)
+
+
+class PaymentHistoryPaginationTests(ShopTestMixin, TestCase):
+    """Test suite for the keyset-paginated tenant payment history"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.tenant = self.create_tenant()
+        self.shop = self.create_shop('A001', tenant=self.tenant)
+        self.url = f'/api/shops/tenant/{self.tenant.id}/payment-history/'
+        self.payments = [
+            Payment.objects.create(
+                shop=self.shop,
+                tenant=self.tenant,
+                amount=Decimal(1000 + index),
+                payment_method='mobile_money',
+                payment_month='2025-01'
+            )
+            for index in range(25)
+        ]
+        # Identical timestamps must still page deterministically via the id
+        Payment.objects.filter(id__in=[p.id for p in self.payments[:10]]).update(
+            payment_date=self.payments[0].payment_date
+        )
+
+    def test_pages_cover_every_payment_once(self):
+        """Test that following next_cursor returns every payment exactly once, newest first"""
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 7}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['payments']), 7)
+            seen.extend(p['id'] for p in response.data['payments'])
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+
+        expected = list(
+            Payment.objects.filter(tenant=self.tenant).order_by('-payment_date', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_deep_page_is_a_single_query(self):
+        """Test that any page, including the shop numbers, costs one query"""
+        response = self.client.get(self.url, {'page_size': 20})
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'page_size': 20, 'cursor': response.data['next_cursor']})
+        self.assertEqual(len(response.data['payments']), 5)
+        self.assertEqual(response.data['payments'][0]['shop_number'], 'A001')
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        # Well-formed, but the values don't fit payment_date and id
+        for values in (['abc', 'x'], ['2025-01-01T00:00:00+00:00', 'x'], [1, 2]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+
+
+class ExportPaymentsCommandTests(ShopTestMixin, TestCase):
+    """Test suite for the export_payments management command"""
+
+    def test_export_to_stdout(self):
+        tenant = self.create_tenant()
+        shop = self.create_shop('A001', tenant=tenant)
+        Payment.objects.create(
+            shop=shop, tenant=tenant, amount=Decimal('1000.00'),
+            payment_method='cash', payment_month='2025-01'
+        )
+        out = StringIO()
+        call_command('export_payments', '--format', 'ndjson', '--shop', 'A001', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn('"amount": "1000.00"', lines[0])
+
+
+class SeedMallTests(TestCase):
+    """Test suite for the seed_mall and benchmark_api management commands"""
+
+    def seed(self):
+        call_command(
+            'seed_mall', '--shops', '40', '--tenants', '20', '--payments', '600',
+            '--profile-requests', '10', '--months', '3', stdout=StringIO(), stderr=StringIO()
+        )
+
+    def test_seed_mall(self):
+        self.seed()
+        self.assertEqual(User.objects.filter(user_type='tenant').count(), 20)
+        self.assertEqual(Shop.objects.count(), 40)
+        self.assertEqual(Payment.objects.count(), 600)
+        self.assertEqual(ProfileChangeRequest.objects.count(), 10)
+        # Payments are backdated over the requested months
+        self.assertGreater(Payment.objects.values('month').distinct().count(), 1)
+        self.assertEqual(
+            MonthlyRevenue.objects.aggregate(total=Sum('total_amount'))['total'],
+            Payment.objects.filter(status='completed').aggregate(total=Sum('amount'))['total']
+        )
+
+    def test_seed_mall_clear(self):
+        self.seed()
+        self.seed()
+        self.assertEqual(Shop.objects.count(), 40)
+        call_command('seed_mall', '--shops', '5', '--tenants', '5', '--payments', '10',
+                     '--profile-requests', '0', '--clear', stdout=StringIO())
+        self.assertEqual(Shop.objects.count(), 5)
+        self.assertEqual(Payment.objects.count(), 10)
+
+    def test_benchmark_covers_every_route(self):
+        self.seed()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            err = StringIO()
+            call_command('benchmark_api', '--no-seed', '--requests', '2', '--output', output,
+                         stdout=StringIO(), stderr=err)
+            with open(output) as f:
+                results = json.load(f)
+        self.assertEqual(err.getvalue(), '')
+        endpoints = results['runs'][0]['endpoints']
+        self.assertEqual({endpoint['route'] for endpoint in endpoints}, set(route_labels()))
+        for endpoint in endpoints:
+            self.assertTrue(all(code < 500 for code in endpoint['status']), endpoint)
+        # Writes are rolled back after every request
+        self.assertEqual(Payment.objects.count(), 600)
+
+
+class MetricsEndpointTests(ShopTestMixin, TestCase):
+    """Test suite for the Prometheus /metrics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def sample(self, name):
+        """Value of one exposition line, 0 when it is absent"""
+        text = self.client.get('/metrics').content.decode()
+        for line in text.splitlines():
+            if line.startswith(name + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0.0
+
+    def test_request_and_cache_metrics(self):
+        self.client.get('/api/shops/available-shops/')
+        self.client.get('/api/shops/available-shops/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="available_shops",method="GET",status="200",le="+Inf"}', text
+        )
+        self.assertIn('db_queries_total{view="available_shops"}', text)
+        self.assertIn('cache_hit_ratio{cache="available_shops"}', text)
+
+    def test_payment_counters(self):
+        tenant = self.create_tenant()
+        shop = self.create_shop('A001', tenant=tenant)
+        processed = 'payments_processed_total{method="cash",source="api"}'
+        amount = 'payment_amount_total{method="cash"}'
+        processed_before, amount_before = self.sample(processed), self.sample(amount)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/shops/payment/make/', {
+                'shop_id': shop.id, 'tenant_id': tenant.id, 'amount': 2500, 'payment_method': 'cash'
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.sample(processed), processed_before + 1)
+        self.assertEqual(self.sample(amount), amount_before + 2500)
+
+    def test_merges_worker_files(self):
+        """Counters from every worker are summed; gauges of exited workers are dropped"""
+        counter = 'payments_processed_total{method="cash",source="import"}'
+        local = self.sample(counter)
+        exited_worker = {
+            'payments_processed_total': {
+                'type': 'counter', 'help': '', 'labelnames': ['method', 'source'], 'buckets': [],
+                'values': [[['cash', 'import'], 7]]
+            },
+            'db_connection_age_seconds': {
+                'type': 'gauge', 'help': '', 'labelnames': ['alias'], 'buckets': [],
+                'values': [[['default'], 99.0]]
+            },
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            # No process has this pid, so the worker counts as exited
+            with open(os.path.join(directory, '4194305-0123456789ab.json'), 'w') as f:
+                json.dump(exited_worker, f)
+            with self.settings(METRICS_MULTIPROC_DIR=directory):
+                self.assertEqual(self.sample(counter), local + 7)
+                text = self.client.get('/metrics').content.decode()
+                self.assertIn(f'{{alias="default",pid="{os.getpid()}"}}', text)
+                self.assertNotIn('pid="4194305"', text)
+                self.assertTrue(os.path.exists(os.path.join(directory, metrics._process_file)))
+
+    def test_reused_pid_keeps_the_dead_workers_counters(self):
+        """A worker that got a dead worker's pid writes its own file, so totals don't drop"""
+        counter = 'payments_processed_total{method="cash",source="import"}'
+        local = self.sample(counter)
+        dead_worker = {
+            'payments_processed_total': {
+                'type': 'counter', 'help': '', 'labelnames': ['method', 'source'], 'buckets': [],
+                'values': [[['cash', 'import'], 5]]
+            },
+            'db_connection_age_seconds': {
+                'type': 'gauge', 'help': '', 'labelnames': ['alias'], 'buckets': [],
+                'values': [[['default'], 99.0]]
+            },
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            # Written by an earlier process with this same pid
+            path = os.path.join(directory, f'{os.getpid()}-0123456789ab.json')
+            with open(path, 'w') as f:
+                json.dump(dead_worker, f)
+            os.utime(path, (0, 0))
+            with self.settings(METRICS_MULTIPROC_DIR=directory):
+                self.assertEqual(self.sample(counter), local + 5)
+                self.assertEqual(self.sample(counter), local + 5)
+                text = self.client.get('/metrics').content.decode()
+                self.assertNotIn(' 99.0', text)
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Index plans are checked against PostgreSQL')
+class QueryPlanTests(ShopTestMixin, TestCase):
+    """Test that the hot Payment and Shop queries are served by their indexes"""
+
+    def setUp(self):
+        self.tenant = self.create_tenant()
+        self.shop = self.create_shop('A001', tenant=self.tenant)
+        self.create_shop('B001')
+        self.payment = Payment.objects.create(
+            shop=self.shop,
+            tenant=self.tenant,
+            amount=Decimal('1000.00'),
+            payment_method='cash',
+            payment_month='2025-01'
+        )
+
+        # Spread background payments over other shops, tenants and months so
+        # each hot query is selective, then refresh the planner statistics
+        # (other tests bulk-load rows too, which would otherwise skew them)
+        shops = [self.create_shop(f'C{index:03d}', tenant=self.create_tenant(index + 2)) for index in range(20)]
+        Payment.objects.bulk_create([
+            Payment(
+                shop=shops[index % 20],
+                tenant=shops[index % 20].tenant,
+                amount=Decimal('1000.00'),
+                payment_method='cash',
+                payment_month=f'2024-{index % 12 + 1:02d}',
+                month=date(2024, index % 12 + 1, 1),
+                status='completed' if index % 10 else 'pending'
+            )
+            for index in range(2000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Shop._meta.db_table}, {Payment._meta.db_table}')
+
+    def assertUsesIndex(self, queryset, index_name):
+        """Assert that the query plan uses the named index when scans are costed fairly"""
+        # Tiny test tables always favour a sequential scan, so rule it out
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                plan = queryset.explain()
+            finally:
+                cursor.execute('RESET enable_seqscan')
+        self.assertIn(index_name, plan, msg=f'Expected {index_name} in plan:\n{plan}')
+
+    def test_payment_month_is_populated(self):
+        """Test that the month column is derived from payment_month"""
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.month, date(2025, 1, 1))
+
+    def test_tenant_payment_history_plan(self):
+        queryset = Payment.objects.filter(tenant=self.tenant, status='completed').order_by('-payment_date')
+        self.assertUsesIndex(queryset, 'payment_tenant_status_date_idx')
+
+    def test_shop_recent_payments_plan(self):
+        queryset = Payment.objects.filter(shop=self.shop, status='completed').order_by('-payment_date')[:5]
+        self.assertUsesIndex(queryset, 'payment_shop_status_date_idx')
+
+    def test_completed_payments_by_month_plan(self):
+        queryset = Payment.objects.filter(status='completed', month=date(2025, 1, 1))
+        self.assertUsesIndex(queryset, 'payment_completed_month_idx')
+
+    def test_occupied_shops_by_tenant_plan(self):
+        queryset = Shop.objects.filter(tenant=self.tenant, is_occupied=True)
+        self.assertUsesIndex(queryset, 'shop_occupied_tenant_idx')
+
+    def test_overdue_shops_plan(self):
+        queryset = Shop.objects.overdue(30).order_by('next_due_date', 'id')
+        self.assertUsesIndex(queryset, 'shop_occupied_due_date_idx')
+
+    def test_vacant_shops_plan(self):
+        queryset = Shop.objects.filter(is_occupied=False).order_by('shop_number')
+        self.assertUsesIndex(queryset, 'shop_vacant_number_idx')
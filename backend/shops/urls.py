@@ -7,4 +7,5 @@ urlpatterns = [
     path('tenant/<int:tenant_id>/shops/', views.tenant_shops, name='tenant_shops'),
     path('payment/make/', views.make_payment, name='make_payment'),
     path('tenant/<int:tenant_id>/payment-history/', views.payment_history, name='payment_history'),
+    path('overdue/', views.overdue_shops, name='overdue_shops'),
 ]   
\ No newline at end of file
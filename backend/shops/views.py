@@ -1,29 +1,39 @@
 from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
-from shops.models import Shop, Payment
+from shops.models import Shop, Payment, MonthlyRevenue, DailyRevenue, PaymentIdempotencyKey
+from shops.rent_schedule import to_amount
+from shops.cache import get_available_shops
+from shops.metrics import count_payments
 from rest_framework.response import Response
 from rest_framework import status
+import hashlib
 from datetime import datetime
+from decimal import InvalidOperation
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from backend.pagination import KeysetPagination, InvalidCursor
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def available_shops(request):
-    """Get list of unoccupied shops available for assignment"""
-    shops = Shop.objects.filter(is_occupied=False).order_by('shop_number')
+    """
+    Get list of unoccupied shops available for assignment
+    Served from cache with ETag/Last-Modified so clients can revalidate
+    """
+    entry = get_available_shops()
+    last_modified = entry['last_modified'].timestamp()
     
-    shops_data = [
-        {
-            'shop_number': shop.shop_number,
-            'monthly_rent': float(shop.monthly_rent),
-            'shop_type': shop.shop_type,
-            'floor_number': shop.floor_number
-        }
-        for shop in shops
-    ]
+    response = get_conditional_response(request, etag=entry['etag'], last_modified=last_modified)
+    if response is None:
+        response = Response({'shops': entry['shops']})
     
-    return Response({'shops': shops_data})
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(last_modified)
+    return response
 
 
 @api_view(['GET'])
@@ -31,16 +41,22 @@ def available_shops(request):
 def tenant_shops(request, tenant_id):
     """Get all shops assigned to a specific tenant with payment details"""
     try:
-        shops = Shop.objects.filter(tenant_id=tenant_id, is_occupied=True)
+        # The last 5 completed payments of every shop come from one query;
+        # Django turns the sliced Prefetch into ROW_NUMBER() OVER (PARTITION BY shop).
+        # Only this tenant's: a previous tenant's payments stay on the shop
+        # until the archive job moves them
+        shops = Shop.objects.filter(tenant_id=tenant_id, is_occupied=True).with_payment_status().prefetch_related(
+            Prefetch(
+                'payments',
+                queryset=Payment.objects.filter(
+                    status='completed', tenant_id=tenant_id
+                ).order_by('-payment_date', '-id')[:5],
+                to_attr='recent_payments'
+            )
+        )
         
         shops_data = []
         for shop in shops:
-            # Get recent payments for this shop
-            recent_payments = Payment.objects.filter(
-                shop=shop, 
-                status='completed'
-            ).order_by('-payment_date')[:5]
-            
             shops_data.append({
                 'id': shop.id,
                 'shop_number': shop.shop_number,
@@ -51,6 +67,8 @@ def tenant_shops(request, tenant_id):
                 'balance': float(shop.balance),
                 'next_due_date': shop.next_due_date.isoformat() if shop.next_due_date else None,
                 'payment_status': shop.get_payment_status(),
+                'payment_state': shop.payment_state,
+                'days_overdue': shop.days_overdue,
                 'recent_payments': [
                     {
                         'id': p.id,
@@ -59,7 +77,7 @@ def tenant_shops(request, tenant_id):
                         'payment_method': p.payment_method,
                         'reference': p.reference
                     }
-                    for p in recent_payments
+                    for p in shop.recent_payments
                 ]
             })
         
@@ -77,13 +95,19 @@ def make_payment(request):
     """
     Process a rent payment for a shop
     Handles partial payments, overpayments, and updates balance/due dates
+    
+    The shop row is locked for the duration of the transaction so concurrent
+    payments for the same shop are applied one after the other. Clients may
+    send an Idempotency-Key header; a retry with the same key returns the
+    original response instead of recording the payment twice.
     """
     try:
         shop_id = request.data.get('shop_id')
-        amount = float(request.data.get('amount', 0))
+        amount = to_amount(request.data.get('amount', 0))
         payment_method = request.data.get('payment_method')
         reference = request.data.get('reference', '')
         tenant_id = request.data.get('tenant_id')
+        idempotency_key = request.headers.get('Idempotency-Key')
         
         # Validation
         if not shop_id or amount <= 0:
@@ -96,11 +120,30 @@ def make_payment(request):
                 'error': 'Invalid payment method'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get shop
-        shop = Shop.objects.get(id=shop_id, tenant_id=tenant_id)
-        
         # Use transaction to ensure data consistency
         with transaction.atomic():
+            if idempotency_key:
+                fingerprint = hashlib.sha256(
+                    f'{shop_id}|{tenant_id}|{amount}|{payment_method}|{reference}'.encode()
+                ).hexdigest()
+                # A concurrent retry with the same key blocks here until the
+                # first request commits, then reads its stored response
+                key_record, created = PaymentIdempotencyKey.objects.get_or_create(
+                    key=idempotency_key,
+                    defaults={'request_fingerprint': fingerprint}
+                )
+                if not created:
+                    if key_record.request_fingerprint != fingerprint:
+                        return Response({
+                            'error': 'Idempotency-Key was already used for a different payment'
+                        }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                    response = Response(key_record.response_body, status=status.HTTP_201_CREATED)
+                    response['Idempotent-Replayed'] = 'true'
+                    return response
+            
+            # Lock the shop so concurrent payments cannot overwrite each other
+            shop = Shop.objects.select_for_update().get(id=shop_id, tenant_id=tenant_id)
+            
             # Record balance before payment
             balance_before = shop.balance if shop.balance else shop.monthly_rent
             
@@ -113,7 +156,8 @@ def make_payment(request):
                 payment_month=datetime.now().strftime('%Y-%m'),
                 status='completed',
                 reference=reference,
-                balance_before=balance_before
+                balance_before=balance_before,
+                due_date=shop.next_due_date
             )
             
             # Update shop balance and due date
@@ -122,24 +166,44 @@ def make_payment(request):
             # Update payment with new balance
             payment.balance_after = shop.balance
             payment.save()
-        
-        return Response({
-            'message': 'Payment processed successfully',
-            'payment': {
-                'id': payment.id,
-                'amount': float(payment.amount),
-                'shop_number': shop.shop_number,
-                'balance_after': float(shop.balance),
-                'next_due_date': shop.next_due_date.isoformat() if shop.next_due_date else None,
-                'reference': payment.reference
+            
+            # Keep the revenue rollups in step with the ledger
+            MonthlyRevenue.record_payment(payment)
+            count_payments([payment], source='api')
+            
+            response_body = {
+                'message': 'Payment processed successfully',
+                'payment': {
+                    'id': payment.id,
+                    'amount': float(payment.amount),
+                    'shop_number': shop.shop_number,
+                    'balance_after': float(shop.balance),
+                    'next_due_date': shop.next_due_date.isoformat() if shop.next_due_date else None,
+                    'reference': payment.reference
+                }
             }
-        }, status=status.HTTP_201_CREATED)
+            
+            if idempotency_key:
+                key_record.payment = payment
+                key_record.response_body = response_body
+                key_record.save()
+            
+            # Every payment that day updates the same row; do it last so
+            # its lock is held only until the commit
+            DailyRevenue.record_payment(payment)
+        
+        return Response(response_body, status=status.HTTP_201_CREATED)
     
     except Shop.DoesNotExist:
         return Response({
             'error': 'Shop not found or not assigned to this tenant'
         }, status=status.HTTP_404_NOT_FOUND)
     
+    except InvalidOperation:
+        return Response({
+            'error': 'Invalid shop or amount'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
     except Exception as e:
         return Response({
             'error': f'Payment failed: {str(e)}'
@@ -149,12 +213,22 @@ def make_payment(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def payment_history(request, tenant_id):
-    """Get payment history for a specific tenant"""
+    """
+    Get payment history for a specific tenant, newest first.
+    Keyset-paginated on (payment_date, id): pass the returned next_cursor
+    back as ?cursor= to get the following page, ?page_size= to resize it.
+    """
     try:
         payments = Payment.objects.filter(
             tenant_id=tenant_id,
             status='completed'
-        ).order_by('-payment_date')
+        ).select_related('shop')
+        
+        paginator = KeysetPagination(
+            ordering=('-payment_date', '-id'),
+            page_size=settings.PAYMENT_HISTORY_PAGE_SIZE
+        )
+        page = paginator.paginate_queryset(payments, request)
         
         payments_data = [
             {
@@ -168,14 +242,75 @@ def payment_history(request, tenant_id):
                 'balance_before': float(p.balance_before),
                 'balance_after': float(p.balance_after)
             }
-            for p in payments
+            for p in page
         ]
         
         return Response({
-            'payments': payments_data
+            'payments': payments_data,
+            'next_cursor': paginator.next_cursor
         }, status=status.HTTP_200_OK)
     
+    except InvalidCursor as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
     except Exception as e:
         return Response({
             'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def overdue_shops(request):
+    """
+    Occupied shops in arrears, longest overdue first.
+    ?min_days= (default 1) sets how many days past the due date a shop must be.
+    Keyset-paginated on (next_due_date, id) like payment_history.
+    """
+    try:
+        min_days = int(request.query_params.get('min_days', 1))
+    except ValueError:
+        min_days = 0
+    if min_days < 1:
+        return Response({
+            'error': 'min_days must be a positive integer'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        shops = Shop.objects.overdue(min_days).select_related('tenant')
+        
+        paginator = KeysetPagination(
+            ordering=('next_due_date', 'id'),
+            page_size=settings.OVERDUE_SHOPS_PAGE_SIZE,
+            max_page_size=500
+        )
+        page = paginator.paginate_queryset(shops, request)
+        
+        shops_data = [
+            {
+                'id': shop.id,
+                'shop_number': shop.shop_number,
+                'shop_type': shop.shop_type,
+                'floor_number': shop.floor_number,
+                'tenant_id': shop.tenant_id,
+                'tenant_name': shop.tenant.full_name if shop.tenant else None,
+                'tenant_email': shop.tenant.email if shop.tenant else None,
+                'monthly_rent': float(shop.monthly_rent),
+                'balance': float(shop.balance),
+                'next_due_date': shop.next_due_date.isoformat(),
+                'payment_state': shop.payment_state,
+                'days_overdue': shop.days_overdue
+            }
+            for shop in page
+        ]
+        
+        return Response({
+            'shops': shops_data,
+            'next_cursor': paginator.next_cursor
+        }, status=status.HTTP_200_OK)
+    
+    except InvalidCursor as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,140 @@
+"""
+Token authentication with a token -> user cache.
+
+CachedTokenAuthentication is a drop-in replacement for DRF's
+TokenAuthentication that skips the authtoken_token/User lookup when the
+token was seen recently. Entries live in a bounded in-process LRU with a
+TTL, or in one of the Django CACHES when TOKEN_AUTH_CACHE_ALIAS is set.
+Signals in user_accounts.signals drop entries when a token is deleted
+(logout) or its user is saved (e.g. deactivated). They only reach the
+process that made the change: with the in-process LRU, other workers keep
+a revoked token for up to TOKEN_AUTH_CACHE_TTL seconds, which is why its
+default TTL is a few seconds. Set TOKEN_AUTH_CACHE_ALIAS to a shared cache
+to revoke everywhere at once.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from backend.cache_stats import get_cache_stats
+
+token_cache_stats = get_cache_stats('auth_tokens')
+
+
+class LocalTokenCache:
+    """Thread-safe LRU of token key -> Token (with its user) whose entries expire"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def set(self, key, token):
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in [key for key, (token, _) in self._entries.items() if token.user_id == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoTokenCache:
+    """Token cache stored in one of the configured Django caches"""
+
+    def __init__(self, alias, ttl):
+        self.alias = alias
+        self.ttl = ttl
+
+    def _cache_key(self, key):
+        # Never put raw tokens into cache keys
+        return 'auth_token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        return caches[self.alias].get(self._cache_key(key))
+
+    def set(self, key, token):
+        caches[self.alias].set(self._cache_key(key), token, self.ttl)
+
+    def delete(self, key):
+        caches[self.alias].delete(self._cache_key(key))
+
+    def delete_user(self, user_id):
+        from rest_framework.authtoken.models import Token
+        keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+        caches[self.alias].delete_many([self._cache_key(key) for key in keys])
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    global _token_cache
+    with _token_cache_lock:
+        if _token_cache is None:
+            if settings.TOKEN_AUTH_CACHE_ALIAS:
+                _token_cache = DjangoTokenCache(settings.TOKEN_AUTH_CACHE_ALIAS, settings.TOKEN_AUTH_CACHE_TTL)
+            else:
+                _token_cache = LocalTokenCache(settings.TOKEN_AUTH_CACHE_SIZE, settings.TOKEN_AUTH_CACHE_TTL)
+        return _token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that caches the token and its user between requests"""
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        token = token_cache.get(key)
+        if token is None:
+            token_cache_stats.miss()
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            token_cache.set(key, token)
+        else:
+            token_cache_stats.hit()
+
+        # Each request gets its own copies so views can't change the cached user
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
@@ -0,0 +1,56 @@
+"""
+Bounded worker pool for password hashing.
+
+PBKDF2 (and Argon2) deliberately burn CPU for hundreds of milliseconds.
+The async login/register views run that work here instead of on the event
+loop. hashlib releases the GIL while hashing, so a thread pool hashes in
+parallel. Admission is capped at workers + queue limit; beyond that
+callers get PoolSaturated straight away and can answer 503 rather than
+letting requests pile up.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+
+
+class PoolSaturated(Exception):
+    """Raised when every worker is busy and the queue is full"""
+
+
+class HashingPool:
+
+    def __init__(self, workers, queue_limit):
+        self.workers = workers
+        self.capacity = workers + queue_limit
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+
+    async def run(self, function, *args):
+        """Run function(*args) on the pool, or raise PoolSaturated if it is full"""
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, function, *args)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(
+                workers=settings.PASSWORD_HASHING_WORKERS or os.cpu_count() or 1,
+                queue_limit=settings.PASSWORD_HASHING_QUEUE_LIMIT
+            )
+        return _pool
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+import statistics
+import time
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, Argon2PasswordHasher
+from django.core.management.base import BaseCommand
+from user_accounts.hashing import HashingPool
+
+PASSWORD = 'benchmark-password'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = 'Compare login throughput and latency across PBKDF2 iteration counts and Argon2'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, nargs='+', default=[260000, 600000, 1000000],
+                            help='PBKDF2 iteration counts to compare')
+        parser.add_argument('--logins', type=int, default=200, help='Password checks per hasher')
+        parser.add_argument('--concurrency', type=int, default=32, help='Simultaneous login attempts')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Hashing pool workers')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def hashers(self, iterations):
+        for count in iterations:
+            hasher = type(f'PBKDF2x{count}', (PBKDF2PasswordHasher,), {'iterations': count})()
+            yield f'pbkdf2_sha256 x{count}', hasher
+        try:
+            import argon2  # noqa: F401
+        except ImportError:
+            self.stderr.write('argon2-cffi is not installed, skipping Argon2')
+        else:
+            yield 'argon2', Argon2PasswordHasher()
+
+    async def run_logins(self, hasher, encoded, logins, concurrency, workers):
+        """Verify the password `logins` times through a HashingPool, `concurrency` at a time"""
+        pool = HashingPool(workers=workers, queue_limit=concurrency)
+        clients = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def login():
+            async with clients:
+                started = time.perf_counter()
+                await pool.run(hasher.verify, PASSWORD, encoded)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        pool.shutdown()
+        return elapsed, latencies
+
+    def handle(self, *args, **options):
+        results = []
+        for name, hasher in self.hashers(options['iterations']):
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+            elapsed, latencies = asyncio.run(self.run_logins(
+                hasher, encoded, options['logins'], options['concurrency'], options['workers']
+            ))
+            result = {
+                'hasher': name,
+                'logins': options['logins'],
+                'workers': options['workers'],
+                'concurrency': options['concurrency'],
+                'logins_per_second': round(options['logins'] / elapsed, 1),
+                'p50_ms': round(statistics.median(latencies) * 1000, 1),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            }
+            results.append(result)
+            self.stdout.write(
+                f"{name:<24} {result['logins_per_second']:>8} logins/s   "
+                f"p50 {result['p50_ms']:>8} ms   p99 {result['p99_ms']:>8} ms"
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(results, output, indent=2)
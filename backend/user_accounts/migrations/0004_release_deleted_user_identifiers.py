@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def release_identifiers(apps, schema_editor):
+    """Rename the email and username of tenants removed before deletion freed them"""
+    User = apps.get_model('user_accounts', 'User')
+    email_length = User._meta.get_field('email').max_length
+    username_length = User._meta.get_field('username').max_length
+    users = list(User.objects.filter(deleted_at__isnull=False).exclude(email__startswith='deleted-'))
+    for user in users:
+        user.email = f'deleted-{user.id}-{user.email}'[:email_length]
+        user.username = f'deleted-{user.id}-{user.username}'[:username_length]
+    User.objects.bulk_update(users, ['email', 'username'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_accounts', '0003_user_deleted_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_identifiers, migrations.RunPython.noop),
+    ]
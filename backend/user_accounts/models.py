@@ -16,6 +16,9 @@ class User(AbstractUser):
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES, default='tenant')
     is_active = models.BooleanField(default=True)
     has_temporary_password = models.BooleanField(default=False)
+    # Set when an admin removes the tenant; the row stays so their payment
+    # history and revenue rollups keep pointing at someone
+    deleted_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -21,13 +21,16 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return attrs
     
     def create(self, validated_data):
-        print("Validated data:", validated_data)  # Debug print
         validated_data.pop('password_confirm')
         password = validated_data.pop('password')
+        # The async register view hashes on the worker pool and passes the result in
+        password_hash = validated_data.pop('password_hash', None)
         user = User(**validated_data)  # Create user instance first
-        user.set_password(password)
+        if password_hash:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save()
-        print("User created:", user)  # Debug print
         return user
 
 class UserLoginSerializer(serializers.Serializer):
@@ -59,10 +62,10 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class AdminTenantRegistrationSerializer(serializers.Serializer):
+class TenantDetailsSerializer(serializers.Serializer):
     """
-    Serializer for admin to register a tenant
-    Admin provides basic info, tenant sets password on first login
+    Fields an admin supplies for a new tenant, checked without touching the
+    database; the batch onboarding checks uniqueness and shops set-wise
     """
     # Basic tenant information
     email = serializers.EmailField()
@@ -80,6 +83,20 @@ class AdminTenantRegistrationSerializer(serializers.Serializer):
     # Date tenant joins (defaults to today if not provided)
     join_date = serializers.DateField(required=False)
     
+    def validate_shop_numbers(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one shop must be assigned")
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("A shop number is listed more than once")
+        return value
+
+
+class AdminTenantRegistrationSerializer(TenantDetailsSerializer):
+    """
+    Serializer for admin to register a tenant
+    Admin provides basic info, tenant sets password on first login
+    """
+    
     def validate_email(self, value):
         """Check if email already exists"""
         if User.objects.filter(email=value).exists():
@@ -100,19 +117,11 @@ class AdminTenantRegistrationSerializer(serializers.Serializer):
         """
         from shops.models import Shop
         
-        if not value:
-            raise serializers.ValidationError("At least one shop must be assigned")
-        
-        for shop_num in value:
-            try:
-                shop = Shop.objects.get(shop_number=shop_num)
-                if shop.is_occupied:
-                    raise serializers.ValidationError(
-                        f"Shop {shop_num} is already occupied by {shop.tenant.full_name}"
-                    )
-            except Shop.DoesNotExist:
-                raise serializers.ValidationError(f"Shop {shop_num} does not exist")
-        
+        value = super().validate_shop_numbers(value)
+        shops = Shop.objects.filter(shop_number__in=value).select_related('tenant')
+        error = shop_assignment_error(value, {shop.shop_number: shop for shop in shops})
+        if error:
+            raise serializers.ValidationError(error)
         return value
     
     def create(self, validated_data):
@@ -155,27 +164,72 @@ class AdminTenantRegistrationSerializer(serializers.Serializer):
             # Force a refresh to ensure the user ID is available
             user.refresh_from_db()
             
-            # Calculate initial due date (1 month from join date)
-            initial_due_date = user.date_joined.date() + relativedelta(months=1)
-        
+            # Lock the shops once; another admin may have taken one since validation
+            shops = Shop.objects.select_for_update(of=('self',)).filter(
+                shop_number__in=shop_numbers
+            ).select_related('tenant').order_by('id')
+            shops_by_number = {shop.shop_number: shop for shop in shops}
+            error = shop_assignment_error(shop_numbers, shops_by_number)
+            if error:
+                raise serializers.ValidationError({'shop_numbers': [error]})
+            
             # Assign shops to this tenant with proper initialization
-            assigned_shops = []
-            for shop_num in shop_numbers:
-                shop = Shop.objects.get(shop_number=shop_num)
-                shop.tenant = user
-                shop.is_occupied = True
-                
-                # Initialize payment tracking
-                shop.total_paid = 0
-                shop.balance = shop.monthly_rent  # Initial balance is the monthly rent
-                shop.next_due_date = initial_due_date  # Due 1 month from join date
-                
-                shop.save()
-                assigned_shops.append(shop)
+            assigned_shops = [shops_by_number[shop_num] for shop_num in shop_numbers]
+            assign_shops([(user, assigned_shops)])
         
         # Return user with additional info
         return {
             'user': user,
             'assigned_shops': assigned_shops,
             'temp_password': temp_password  # Admin should give this to tenant
-        }
\ No newline at end of file
+        }
+
+
+def shop_assignment_error(shop_numbers, shops_by_number):
+    """
+    Why the shops cannot be assigned, for the first problem shop in the
+    order given, or None. `shops_by_number` maps the shop numbers found to
+    their shops, with tenants loaded.
+    """
+    for shop_num in shop_numbers:
+        shop = shops_by_number.get(shop_num)
+        if shop is None:
+            return f"Shop {shop_num} does not exist"
+        if shop.is_occupied:
+            return f"Shop {shop_num} is already occupied by {shop.tenant.full_name if shop.tenant else 'another tenant'}"
+    return None
+
+
+def initial_due_date(user):
+    """First rent falls due a month after the tenant joins"""
+    return timezone.localdate(user.date_joined) + relativedelta(months=1)
+
+
+def assign_shops(assignments):
+    """Give each (user, shops) pair's shops to its new tenant with one bulk UPDATE"""
+    from shops.models import Shop
+    from shops.aging import invalidate_aging_report
+    from shops.cache import invalidate_available_shops
+    
+    now = timezone.now()
+    updated = []
+    for user, shops in assignments:
+        due_date = initial_due_date(user)
+        for shop in shops:
+            shop.tenant = user
+            shop.is_occupied = True
+            
+            # Initialize payment tracking
+            shop.total_paid = 0
+            shop.balance = shop.monthly_rent  # Initial balance is the monthly rent
+            shop.next_due_date = due_date  # Due 1 month from join date
+            shop.updated_at = now
+            updated.append(shop)
+    Shop.objects.bulk_update(
+        updated, ['tenant', 'is_occupied', 'total_paid', 'balance', 'next_due_date', 'updated_at']
+    )
+    
+    # bulk_update sends no signals: drop the caches the shop signals would
+    invalidate_aging_report()
+    invalidate_available_shops()
+    transaction.on_commit(invalidate_available_shops)
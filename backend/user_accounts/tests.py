@@ -1,6 +1,11 @@
+import io
+from contextlib import redirect_stdout
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from .authentication import LocalTokenCache, get_token_cache
+from .hashing import get_hashing_pool
 from .models import User
 
 class UserAccountsTests(TestCase):
@@ -82,4 +87,122 @@ class UserAccountsTests(TestCase):
         }
         
         response = self.client.post(self.register_url, incomplete_data, format='json')
-        self.assertEqual(response.status_code, 400)
\ No newline at end of file
+        self.assertEqual(response.status_code, 400)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test suite for the cached token authentication backend"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.client = APIClient()
+        self.profile_url = '/api/auth/profile/'
+        self.user = User.objects.create(
+            email='cached@example.com', username='cached', first_name='Cached', last_name='User'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_skip_token_lookup(self):
+        """Test that only the first request looks the token up"""
+        with self.assertNumQueries(1):
+            response = self.client.get(self.profile_url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url)
+        self.assertEqual(response.data['user']['email'], 'cached@example.com')
+
+    def test_logout_invalidates_token(self):
+        """Test that a token stops working as soon as logout deletes it"""
+        self.client.get(self.profile_url)
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(self.client.get(self.profile_url).status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.profile_url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.profile_url).status_code, 401)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token not-a-real-token')
+        self.assertEqual(self.client.get(self.profile_url).status_code, 401)
+
+    def test_local_cache_is_bounded_and_expires(self):
+        """Test LRU eviction and TTL expiry of the in-process cache"""
+        cache = LocalTokenCache(max_size=2, ttl=60)
+        cache.set('a', self.token)
+        cache.set('b', self.token)
+        cache.get('a')
+        cache.set('c', self.token)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+
+        expired = LocalTokenCache(max_size=2, ttl=-1)
+        expired.set('a', self.token)
+        self.assertIsNone(expired.get('a'))
+
+
+class AsyncAuthTests(TestCase):
+    """Test suite for the async login/register endpoints"""
+
+    def setUp(self):
+        self.register_url = '/api/auth/async/register/'
+        self.login_url = '/api/auth/async/login/'
+        self.user_data = {
+            'username': 'asyncuser',
+            'email': 'async@example.com',
+            'password': 'testpass123',
+            'password_confirm': 'testpass123',
+            'first_name': 'Async',
+            'last_name': 'User',
+            'phone_number': '0700123456'
+        }
+
+    def post(self, url, data):
+        return self.client.post(url, data, content_type='application/json')
+
+    def test_register_and_login(self):
+        """Test that a user registered asynchronously can log in asynchronously"""
+        response = self.post(self.register_url, self.user_data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['user']['email'], 'async@example.com')
+        self.assertTrue(User.objects.get(email='async@example.com').check_password('testpass123'))
+
+        response = self.post(self.login_url, {'email': 'async@example.com', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['user_type'], 'tenant')
+
+    def test_register_does_not_print_credentials(self):
+        """Test that registration writes neither the password nor its hash to stdout"""
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            self.post(self.register_url, self.user_data)
+        user = User.objects.get(email='async@example.com')
+        self.assertNotIn('testpass123', stdout.getvalue())
+        self.assertNotIn(user.password, stdout.getvalue())
+
+    def test_login_failures(self):
+        self.post(self.register_url, self.user_data)
+        self.assertEqual(self.post(self.login_url, {'email': 'async@example.com', 'password': 'nope'}).status_code, 401)
+        self.assertEqual(self.post(self.login_url, {'email': 'missing@example.com', 'password': 'x'}).status_code, 401)
+        self.assertEqual(self.post(self.login_url, {'email': 'async@example.com'}).status_code, 400)
+
+    def test_register_validation(self):
+        response = self.post(self.register_url, {**self.user_data, 'password_confirm': 'other'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('errors', response.json())
+
+    def test_saturated_pool_returns_503(self):
+        """Test that requests are shed with 503 once the pool is full"""
+        self.post(self.register_url, self.user_data)
+        pool = get_hashing_pool()
+        for _ in range(pool.capacity):
+            pool._slots.acquire()
+        try:
+            response = self.post(self.login_url, {'email': 'async@example.com', 'password': 'testpass123'})
+        finally:
+            for _ in range(pool.capacity):
+                pool._slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
@@ -6,6 +6,8 @@ app_name = 'user_accounts'
 urlpatterns = [
     path('register/', views.register, name='register'),
     path('login/', views.login, name='login'),
+    path('async/register/', views.async_register, name='async_register'),
+    path('async/login/', views.async_login, name='async_login'),
     path('logout/', views.logout, name='logout'),
     path('profile/', views.profile, name='profile'),
     path('check-email/', views.check_email, name='check_email'),
@@ -7,6 +7,13 @@ from django.contrib.auth import authenticate
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserSerializer
 from .models import User
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
+from .hashing import get_hashing_pool, PoolSaturated
+import json
 import logging
 
 # Create logger for this module
@@ -44,6 +51,22 @@ def register(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 
+def login_user_data(user):
+    """User details returned by a successful login"""
+    return {
+        'id': user.id,
+        'email': user.email,
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'full_name': user.get_full_name() if hasattr(user, 'get_full_name') else f"{user.first_name} {user.last_name}",
+        'phone_number': getattr(user, 'phone_number', ''),
+        'is_staff': user.is_staff,
+        'is_active': user.is_active,
+        'user_type': 'admin' if user.is_staff else 'tenant',
+    }
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def login(request):
@@ -81,18 +104,7 @@ def login(request):
                 user.save()
                 logger.info(f"User {email} changed temporary password")
             
-            user_data = {
-                'id': user.id,
-                'email': user.email,
-                'username': user.username,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'full_name': user.get_full_name() if hasattr(user, 'get_full_name') else f"{user.first_name} {user.last_name}",
-                'phone_number': getattr(user, 'phone_number', ''),
-                'is_staff': user.is_staff,
-                'is_active': user.is_active,
-                'user_type': 'admin' if user.is_staff else 'tenant',
-            }
+            user_data = login_user_data(user)
             
             logger.info(f"Successful login for user: {email} (is_staff: {user.is_staff})")
             
@@ -119,6 +131,136 @@ def login(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
 
+def _read_json(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _pool_saturated(email):
+    logger.warning(f"Password hashing pool saturated, rejecting request for: {email}")
+    response = JsonResponse({
+        'message': 'Server is busy. Please try again shortly.'
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = '1'
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def async_register(request):
+    """
+    Register a new user (async variant for ASGI deployments)
+    Same contract as register; the password is hashed on the worker pool
+    """
+    data = _read_json(request)
+    if data is None:
+        return JsonResponse({'message': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    email = data.get('email', 'unknown')
+    logger.info(f"Registration attempt for email: {email}")
+    
+    serializer = UserRegistrationSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        logger.warning(f"Registration validation failed for {email}: {serializer.errors}")
+        return JsonResponse({
+            'message': 'Registration failed',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        password_hash = await get_hashing_pool().run(make_password, serializer.validated_data['password'])
+        user = await sync_to_async(serializer.save)(password_hash=password_hash)
+        logger.info(f"User registered successfully: {email}")
+        return JsonResponse({
+            'message': 'User registered successfully',
+            'user': UserSerializer(user).data,
+        }, status=status.HTTP_201_CREATED)
+    except PoolSaturated:
+        return _pool_saturated(email)
+    except Exception as e:
+        logger.error(f"Registration error for {email}: {str(e)}")
+        return JsonResponse({
+            'message': 'Registration failed',
+            'errors': {'error': 'Internal server error'}
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@csrf_exempt
+@require_POST
+async def async_login(request):
+    """
+    Login user (async variant for ASGI deployments)
+    Same contract as login; the password check runs on the worker pool and
+    the request is answered 503 when the pool is saturated
+    """
+    data = _read_json(request)
+    if data is None:
+        return JsonResponse({'message': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    email = data.get('email', 'unknown')
+    password = data.get('password')
+    change_password = data.get('change_password', False)
+    
+    logger.info(f"Login attempt for email: {email}")
+    
+    # Validate input
+    if not email or not password:
+        return JsonResponse({
+            'message': 'Email and password are required',
+            'errors': {
+                'email': 'This field is required' if not email else None,
+                'password': 'This field is required' if not password else None,
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        user = await User.objects.aget(email=email)
+        
+        if not user.is_active:
+            logger.warning(f"Login attempt for inactive user: {email}")
+            return JsonResponse({
+                'message': 'Your account is not active. Please contact the administrator.'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        if await get_hashing_pool().run(user.check_password, password):
+            
+            # If user changed their password, update the flag
+            if change_password and user.has_temporary_password:
+                user.has_temporary_password = False
+                await user.asave()
+                logger.info(f"User {email} changed temporary password")
+            
+            logger.info(f"Successful login for user: {email} (is_staff: {user.is_staff})")
+            
+            return JsonResponse({
+                'message': 'Login successful',
+                'user': login_user_data(user),
+            }, status=status.HTTP_200_OK)
+        else:
+            logger.warning(f"Failed login attempt - invalid password for: {email}")
+            return JsonResponse({
+                'message': 'Invalid email or password'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+    
+    except User.DoesNotExist:
+        logger.warning(f"Failed login attempt - user not found: {email}")
+        return JsonResponse({
+            'message': 'Invalid email or password'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    
+    except PoolSaturated:
+        return _pool_saturated(email)
+    
+    except Exception as e:
+        logger.error(f"Login error for {email}: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'message': 'An error occurred during login. Please try again later.'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['POST'])
 def logout(request):
     """Logout user"""
@@ -32,10 +32,18 @@ const TenantManagement: React.FC = () => {
 
   const fetchTenants = async () => {
     try {
-      const response = await axios.get(
-        "http://localhost:8000/api/admin/tenants/"
-      );
-      setTenants(response.data.tenants);
+      // The list is cursor-paginated; follow next_cursor to load every tenant
+      const allTenants: Tenant[] = [];
+      let cursor: string | null = null;
+      do {
+        const response: { data: { tenants: Tenant[]; next_cursor: string | null } } =
+          await axios.get("http://localhost:8000/api/admin/tenants/", {
+            params: cursor ? { page_size: 500, cursor } : { page_size: 500 },
+          });
+        allTenants.push(...response.data.tenants);
+        cursor = response.data.next_cursor;
+      } while (cursor);
+      setTenants(allTenants);
     } catch (error) {
       console.error("Error fetching tenants:", error);
     } finally {